@@ -0,0 +1,47 @@
+"""
+django for pytest: settings.test is set up once, the django TestCases get test databases made on the database
+of the environment (DB_NAME, DB_HOST...) and are skipped when there is none to make them on
+"""
+import os
+import sys
+from pathlib import Path
+import pytest
+from decouple import config
+
+sys.path.append(str(Path(__file__).resolve().parent / 'django_project'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings.test')
+# whatever the environment or the .env doesn't say
+for name, default in [('SECRET_KEY', 'test'), ('DB_NAME', 'postgres'), ('DB_USER', 'postgres'),
+                      ('DB_PASSWORD', ''), ('DB_HOST', 'localhost')]:
+    os.environ.setdefault(name, config(name, default=default))
+
+import django
+django.setup()
+
+from django.db import DatabaseError
+from django.test import TransactionTestCase
+from django.test.utils import setup_test_environment, teardown_test_environment, setup_databases, teardown_databases
+
+# the old names of the test databases once they're made, the error when they couldn't be
+_databases = None
+
+def pytest_configure(config):
+    setup_test_environment()
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    global _databases
+    if not (item.cls and issubclass(item.cls, TransactionTestCase)):
+        return
+    if _databases is None:
+        try:
+            _databases = setup_databases(verbosity=0, interactive=False)
+        except DatabaseError as e:
+            _databases = e
+    if isinstance(_databases, DatabaseError):
+        pytest.skip(f'no database to test on: {_databases}')
+
+def pytest_unconfigure(config):
+    if _databases is not None and not isinstance(_databases, DatabaseError):
+        teardown_databases(_databases, verbosity=0)
+    teardown_test_environment()
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import EvaluationTemplate
+from .models import EvaluationTemplate, ProfessorAvailability
 
 admin.site.register(EvaluationTemplate)
+admin.site.register(ProfessorAvailability)
     
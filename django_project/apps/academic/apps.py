@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class OrganizationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.academic'
+
+    def ready(self):
+        from . import signals
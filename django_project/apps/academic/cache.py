@@ -0,0 +1,52 @@
+import threading
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+SCHEDULE_VERSION_KEY = 'academic:schedule_version'
+# the etags of the calendar feeds this process served lately, a client polling with one of them
+# gets its 304 without a query. a change made in another process reaches it once the entry runs out
+FEED_ETAG_SECONDS = 5 * 60
+feed_etags = LocMemCache('academic.feed_etags', {'TIMEOUT': FEED_ETAG_SECONDS})
+
+def get_schedule_version():
+    """
+    Version of the schedule data, anything cached out of the time slots goes under a key with it
+    so that bumping it is all the invalidation there is
+    """
+    return cache.get_or_set(SCHEDULE_VERSION_KEY, 1, timeout=None)
+
+def _bump():
+    feed_etags.clear()
+    try:
+        cache.incr(SCHEDULE_VERSION_KEY)
+    except ValueError:
+        # it got evicted, whatever was cached under the old one is unreachable anyway
+        cache.set(SCHEDULE_VERSION_KEY, 1, timeout=None)
+
+def bump_schedule_version():
+    # only once it's committed, or a request in between would cache the old data under the new version
+    transaction.on_commit(_bump)
+
+# (term, schedule) whose evaluation stats are due, per thread since the requests run in threads
+_stale = threading.local()
+
+def _refresh_stats():
+    from .models import EvaluationStat
+    stale, _stale.stats = getattr(_stale, 'stats', set()), set()
+    terms = {}
+    for term, schedule_id in stale:
+        terms.setdefault(term, set()).add(schedule_id)
+    for term, schedule_ids in terms.items():
+        EvaluationStat.objects.refresh(term, schedule_ids)
+
+def refresh_evaluation_stats(term, schedule_id):
+    """
+    Refresh the stats of a schedule once the evaluations written to it are committed.
+    deleting them all calls this for every evaluation, the first callback refreshes every schedule once
+    and the others find nothing left to do. if the transaction rolls back the schedules just get refreshed later
+    """
+    if not hasattr(_stale, 'stats'):
+        _stale.stats = set()
+    _stale.stats.add((term, schedule_id))
+    transaction.on_commit(_refresh_stats)
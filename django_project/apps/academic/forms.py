@@ -1,7 +1,13 @@
 from django import forms
 from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+from apps.core.forms import PreloadedModelChoiceField
 from apps.users.models import User
-from .models import Score, Schedule, Course
+from .models import Score, Schedule, Course, Class, Classroom, StudentScoreSummary
+from .scheduling import WEEKDAYS, parse_time_range
 
 def create_score_form_class(schedule_pk):
     schedule = Schedule.objects.select_related('course', '_class').get(pk=schedule_pk)
@@ -42,8 +48,9 @@ def create_score_form_class(schedule_pk):
                 Score.objects.bulk_update_or_create(
                     score_objects,
                     ['score'],  # Fields to update
-                    match_field='student'  # Field to match on for updates
+                    match_field=('student', 'course')  # Fields to match on for updates
                 )
+                StudentScoreSummary.objects.refresh(score.student_id for score in score_objects)
 
     return ScoreBulkCreateForm
     
@@ -53,9 +60,13 @@ class ScheduleForm(forms.ModelForm):
     last_name = forms.CharField(required=False)
     email = forms.CharField(required=False, widget=forms.HiddenInput())
     
+    # {(first_name, last_name): [professors]} when the formset looked them up for every row
+    professors = None
+
     class Meta:
         model = Schedule
         fields = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun', 'course', 'classroom']   
+        field_classes = {'course': PreloadedModelChoiceField, 'classroom': PreloadedModelChoiceField}
 
     def __init__(self, *args, request, **kwargs):
         super().__init__(*args, **kwargs)
@@ -66,22 +77,31 @@ class ScheduleForm(forms.ModelForm):
             self.fields['first_name'].initial = self.instance.professor.first_name
             self.fields['last_name'].initial = self.instance.professor.last_name
 
+    def _get_validation_exclusions(self):
+        # the preloaded choices are known to exist, checking each foreign key again is a query per row
+        exclude = super()._get_validation_exclusions()
+        exclude.update(name for name in ['course', 'classroom'] if self.fields[name].objects is not None)
+        return exclude
+
     def clean(self):
         data = self.cleaned_data
         if not data.get('first_name') and not data.get('last_name') and not data.get('email'):
             # they opt to not put professor
             return data
-        filters = {'first_name': data['first_name'], 'last_name': data['last_name']}
+        if self.professors is None:
+            professors = list(User.objects.filter(first_name=data['first_name'], last_name=data['last_name']))
+        else:
+            professors = self.professors.get((data['first_name'], data['last_name']), [])
         if data.get('email'):
-            filters['email'] = data['email']
-        try:
-            data['professor'] = User.objects.get(**filters)
-        except User.DoesNotExist:
+            professors = [professor for professor in professors if professor.email == data['email']]
+        if not professors:
             self.add_error('first_name', f'Professor with this name does not exist')
-        except User.MultipleObjectsReturned:
+        elif len(professors) > 1:
             # add an email field to filter the professor
             self.fields['email'].widget = forms.EmailInput()
             self.add_error('email', f'Multiple professors with the same name found. Please specify an email')
+        else:
+            data['professor'] = professors[0]
 
         return data
 
@@ -94,4 +114,192 @@ class ScheduleForm(forms.ModelForm):
             self.instance.professor = None
         if commit:
             self.instance.save()
-        return self.instance
\ No newline at end of file
+        return self.instance
+
+class ScheduleFormSet(BaseInlineFormSet):
+    """
+    Looks up the professors, courses, classrooms and schedules of every posted row at once,
+    so that cleaning the formset runs the same few queries whatever the number of rows
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('queryset', Schedule.objects.get_queryset(request=None).select_related('professor'))
+        super().__init__(*args, **kwargs)
+
+    def get_posted(self, field):
+        return [self.data.get(f'{self.add_prefix(i)}-{field}') for i in range(self.total_form_count())]
+
+    @cached_property
+    def preloaded(self):
+        ids = lambda field: {value for value in self.get_posted(field) if value and value.isdigit()}
+        names = {
+            ((first or '').strip(), (last or '').strip())
+            for first, last in zip(self.get_posted('first_name'), self.get_posted('last_name')) if first or last
+        }
+        q = Q()
+        for first, last in names:
+            q |= Q(first_name=first, last_name=last)
+        professors = {}
+        for professor in (User.objects.filter(q) if q else []):
+            professors.setdefault((professor.first_name, professor.last_name), []).append(professor)
+        return {
+            'professors': professors,
+            'course': Course.objects.get_queryset(request=self.form_kwargs['request']).in_bulk(ids('course')),
+            'classroom': Classroom.objects.get_queryset(request=None).in_bulk(ids('classroom')),
+            self._pk_field.name: {schedule.pk: schedule for schedule in self.get_queryset()},
+        }
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if not self.is_bound:
+            return
+        pk = form.fields[self._pk_field.name]
+        form.fields[self._pk_field.name] = PreloadedModelChoiceField(
+            pk.queryset, initial=pk.initial, required=False, widget=pk.widget,
+        )
+        for field in ['course', 'classroom', self._pk_field.name]:
+            form.fields[field].objects = self.preloaded[field]
+        form.professors = self.preloaded['professors']
+
+def get_schedule_lookups(request, rows):
+    """
+    Load the classes, courses, classrooms and professors named in these rows with one query each.
+    professors are found by email or by "first_name last_name"
+    """
+    generations, class_names, course_names, classroom_names, professors = set(), set(), set(), set(), set()
+    for row in rows:
+        try: generations.add(int(row.get('generation')))
+        except (TypeError, ValueError): pass
+        class_names.add(row.get('class_name'))
+        course_names.add(row.get('course'))
+        classroom_names.add(row.get('classroom'))
+        professors.add(row.get('professor'))
+
+    lookups = {
+        'classes': {
+            (_class.generation, _class.name): _class
+            for _class in Class.objects.get_queryset(request=request).filter(generation__in=generations, name__in=class_names)
+        },
+        'courses': {
+            (course.name, course.year): course
+            for course in Course.objects.get_queryset(request=request).filter(name__in=course_names)
+        },
+        'classrooms': {
+            classroom.name: classroom
+            for classroom in Classroom.objects.get_queryset(request=request).filter(name__in=classroom_names)
+        },
+        'professors': {},
+    }
+    users = User.objects.annotate(full_name=Concat('first_name', Value(' '), 'last_name')) \
+        .filter(Q(email__in=professors) | Q(full_name__in=professors))
+    for user in users:
+        for key in {user.email, user.full_name}:
+            lookups['professors'].setdefault(key, []).append(user)
+    return lookups
+
+class ScheduleImportForm(forms.Form):
+    """
+    A row of a timetable, where everything is named so that it can be pasted out of a spreadsheet
+    """
+    generation = forms.IntegerField()
+    class_name = forms.CharField(label='class')
+    course = forms.CharField()
+    year = forms.CharField(max_length=1)
+    classroom = forms.CharField(required=False)
+    professor = forms.CharField(help_text='full name or email')
+    mon = forms.CharField(required=False, max_length=13)
+    tue = forms.CharField(required=False, max_length=13)
+    wed = forms.CharField(required=False, max_length=13)
+    thu = forms.CharField(required=False, max_length=13)
+    fri = forms.CharField(required=False, max_length=13)
+    sat = forms.CharField(required=False, max_length=13)
+    sun = forms.CharField(required=False, max_length=13)
+
+    # set by ScheduleImportFormSet for all the rows at once
+    lookups = None
+
+    def __init__(self, *args, request=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.request = request
+
+    def clean(self):
+        data = super().clean()
+        lookups = self.lookups or get_schedule_lookups(self.request, [data])
+
+        if 'generation' in data and 'class_name' in data:
+            data['_class'] = lookups['classes'].get((data['generation'], data['class_name']))
+            if not data['_class']:
+                self.add_error('class_name', 'Class with this generation and name does not exist')
+        if 'course' in data and 'year' in data:
+            data['course'] = lookups['courses'].get((data['course'], data['year']))
+            if not data['course']:
+                self.add_error('course', 'Course with this name and year does not exist')
+        if data.get('classroom'):
+            data['classroom'] = lookups['classrooms'].get(data['classroom'])
+            if not data['classroom']:
+                self.add_error('classroom', 'Classroom with this name does not exist')
+        else:
+            data['classroom'] = None
+        if 'professor' in data:
+            professors = lookups['professors'].get(data['professor'], [])
+            if not professors:
+                self.add_error('professor', 'Professor with this name or email does not exist')
+            elif len(professors) > 1:
+                self.add_error('professor', 'Multiple professors with the same name found. Please use their email')
+            else:
+                data['professor'] = professors[0]
+
+        for day in WEEKDAYS:
+            try:
+                parse_time_range(data.get(day))
+            except ValueError as e:
+                self.add_error(day, str(e))
+            data[day] = data.get(day) or None
+        return data
+
+class ScheduleImportFormSet(forms.BaseFormSet):
+    """
+    Resolves the names of every row in a handful of queries and refuses the same schedule twice
+    """
+    @cached_property
+    def lookups(self):
+        fields = ['generation', 'class_name', 'course', 'classroom', 'professor']
+        rows = [
+            {field: (self.data.get(f'{self.add_prefix(i)}-{field}') or '').strip() for field in fields}
+            for i in range(self.total_form_count())
+        ]
+        return get_schedule_lookups(self.form_kwargs.get('request'), rows)
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if self.is_bound:
+            form.lookups = self.lookups
+
+    def clean(self):
+        seen = {}
+        for i, form in enumerate(self.forms):
+            if form.errors:
+                continue
+            data = form.cleaned_data
+            key = (data.get('professor'), data.get('course'), data.get('_class'))
+            if key in seen:
+                raise forms.ValidationError(f'rows {seen[key] + 1} and {i + 1} are the same schedule')
+            seen[key] = i
+
+class FreeClassroomForm(forms.Form):
+    weekday = forms.TypedChoiceField(coerce=int, choices=list(enumerate(WEEKDAYS)))
+    start = forms.TimeField(widget=forms.TimeInput(attrs={'type': 'time'}))
+    end = forms.TimeField(widget=forms.TimeInput(attrs={'type': 'time'}))
+
+    def clean(self):
+        data = super().clean()
+        if data.get('start') and data.get('end') and data['start'] >= data['end']:
+            raise forms.ValidationError("the end has to be after the start")
+        return data
+
+class EvaluationAnalyticsForm(forms.Form):
+    term = forms.ChoiceField()
+    group = forms.ChoiceField(choices=[('schedule', 'schedule'), ('professor', 'professor'), ('course', 'course')])
+
+    def __init__(self, *args, terms=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['term'].choices = [(term, term) for term in terms]
@@ -0,0 +1,125 @@
+import calendar
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Any
+from zoneinfo import ZoneInfo
+
+class Event(NamedTuple):
+    """
+    A weekly event, start and end are times of the day
+    """
+    uid: str
+    weekday: int
+    start: Any
+    end: Any
+    summary: str
+    location: str = ''
+    description: str = ''
+
+BYDAY = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def _fold(line):
+    # lines are at most 75 octets, the next ones start with a space
+    data = line.encode()
+    chunks = []
+    while len(data) > 75:
+        cut = 75 if not chunks else 74
+        # don't cut in the middle of a utf-8 character
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        chunks.append(data[:cut])
+        data = data[cut:]
+    chunks.append(data)
+    return b'\r\n '.join(chunks).decode()
+
+def _offset(delta):
+    minutes = int(delta.total_seconds()) // 60
+    return f'{"-" if minutes < 0 else "+"}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}'
+
+def _transitions(zone, year):
+    """
+    the utc instants of `year` the offset of `zone` changes at, to the quarter of an hour
+    """
+    found = []
+    day = datetime(year, 1, 1, tzinfo=timezone.utc)
+    while day.year == year:
+        next_day = day + timedelta(days=1)
+        if day.astimezone(zone).utcoffset() != next_day.astimezone(zone).utcoffset():
+            instant = day
+            while instant.astimezone(zone).utcoffset() == day.astimezone(zone).utcoffset():
+                instant += timedelta(minutes=15)
+            found.append(instant)
+        day = next_day
+    return found
+
+def vtimezone(tzid, year):
+    """
+    The VTIMEZONE the TZID of the events points to, with the changes of `year` repeating every year
+    on the same weekday of the month (the second sunday of march, the last sunday of october...)
+    """
+    zone = ZoneInfo(tzid)
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{tzid}']
+    transitions = _transitions(zone, year)
+    if not transitions:
+        local = datetime(year, 1, 1, tzinfo=timezone.utc).astimezone(zone)
+        lines += [
+            'BEGIN:STANDARD',
+            'DTSTART:19700101T000000',
+            f'TZOFFSETFROM:{_offset(local.utcoffset())}',
+            f'TZOFFSETTO:{_offset(local.utcoffset())}',
+            f'TZNAME:{local.tzname()}',
+            'END:STANDARD',
+        ]
+    for instant in transitions:
+        before, after = (instant - timedelta(minutes=15)).astimezone(zone), instant.astimezone(zone)
+        # the wall clock time it happens at, before the change
+        start = (instant + before.utcoffset()).replace(tzinfo=None)
+        week = -1 if start.day + 7 > calendar.monthrange(year, start.month)[1] else (start.day - 1) // 7 + 1
+        component = 'DAYLIGHT' if after.dst() else 'STANDARD'
+        lines += [
+            f'BEGIN:{component}',
+            f'DTSTART:{start:%Y%m%dT%H%M%S}',
+            f'TZOFFSETFROM:{_offset(before.utcoffset())}',
+            f'TZOFFSETTO:{_offset(after.utcoffset())}',
+            f'TZNAME:{after.tzname()}',
+            f'RRULE:FREQ=YEARLY;BYMONTH={start.month};BYDAY={week}{BYDAY[start.weekday()]}',
+            f'END:{component}',
+        ]
+    lines.append('END:VTIMEZONE')
+    return lines
+
+def render_calendar(name, events, tzid, now=None):
+    """
+    An iCalendar of weekly recurring events, they start on the week of `now`
+    """
+    now = now or datetime.now(timezone.utc)
+    monday = now.date() - timedelta(days=now.weekday())
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//academic//schedules//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(name)}',
+        f'X-WR-TIMEZONE:{tzid}',
+        *vtimezone(tzid, now.year),
+    ]
+    for event in events:
+        day = monday + timedelta(days=event.weekday)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{event.uid}',
+            f'DTSTAMP:{now.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}',
+            f'DTSTART;TZID={tzid}:{datetime.combine(day, event.start):%Y%m%dT%H%M%S}',
+            f'DTEND;TZID={tzid}:{datetime.combine(day, event.end):%Y%m%dT%H%M%S}',
+            f'RRULE:FREQ=WEEKLY;BYDAY={BYDAY[event.weekday]}',
+            f'SUMMARY:{_escape(event.summary)}',
+        ]
+        if event.location:
+            lines.append(f'LOCATION:{_escape(event.location)}')
+        if event.description:
+            lines.append(f'DESCRIPTION:{_escape(event.description)}')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
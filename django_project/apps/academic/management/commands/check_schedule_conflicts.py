@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from apps.academic.models import Schedule, TimeSlot
+from apps.academic.scheduling import WEEKDAYS, RESOURCES, find_conflicts, format_minutes
+
+class Command(BaseCommand):
+    help = 'List the professors, classrooms and classes that are double booked, for a faculty or everywhere'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--faculty', type=int, help='id of the faculty, defaults to all of them')
+
+    def handle(self, *args, **options):
+        slots = TimeSlot.objects.all()
+        if options['faculty']:
+            slots = slots.filter(schedule__course__faculty=options['faculty'])
+        conflicts = list(find_conflicts(slots.as_slots()))
+
+        schedules = Schedule.objects.get_queryset(request=None).select_related('professor', 'course', '_class') \
+            .in_bulk({slot.ref for _, a, b in conflicts for slot in (a, b)})
+        for resource, a, b in conflicts:
+            self.stdout.write(
+                f"{RESOURCES[resource]} on {WEEKDAYS[a.weekday]}: "
+                f"{schedules[a.ref]} ({format_minutes(a.start)}-{format_minutes(a.end)}) and "
+                f"{schedules[b.ref]} ({format_minutes(b.start)}-{format_minutes(b.end)})"
+            )
+        style = self.style.WARNING if conflicts else self.style.SUCCESS
+        self.stdout.write(style(f'{len(conflicts)} conflicts'))
@@ -0,0 +1,74 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from bulk_update_or_create import BulkUpdateOrCreateQuerySet
+from apps.academic.models import Schedule, Classroom, TimeSlot
+from apps.academic.scheduling import WEEKDAYS, parse_time_range
+from apps.academic.timetable import get_problem, solve, apply_result
+from apps.academic.cache import bump_schedule_version
+
+class Command(BaseCommand):
+    help = 'Place the schedules of a program on the week and in its classrooms without any double booking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('program', type=int, help='id of the program')
+        parser.add_argument('--days', default='mon,tue,wed,thu,fri', help='the days to use, defaults to mon,tue,wed,thu,fri')
+        parser.add_argument('--hours', default='7:00-19:00', help='the time of day to use, defaults to 7:00-19:00')
+        parser.add_argument('--step', type=int, default=30, help='sessions start on multiples of it, in minutes')
+        parser.add_argument('--sessions', type=int, default=2, help='weekly sessions of the schedules that have none')
+        parser.add_argument('--duration', type=int, default=120, help='minutes of these sessions')
+        parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to all cores')
+        parser.add_argument('--time-limit', type=int, default=50, help='seconds the search may take')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='only show the timetable')
+        parser.add_argument('--force', action='store_true', help='save it even if there are conflicts left')
+
+    def handle(self, *args, **options):
+        try:
+            weekdays = tuple(WEEKDAYS.index(day.strip()) for day in options['days'].split(','))
+            day_start, day_end = parse_time_range(options['hours'])
+        except (ValueError, TypeError) as e:
+            raise CommandError(f'invalid --days or --hours: {e}')
+
+        schedules = list(Schedule.objects.get_queryset(request=None)
+                         .filter(course__program=options['program'])
+                         .select_related('professor', 'course', '_class').order_by('pk'))
+        if not schedules:
+            raise CommandError('this program has no schedules')
+        classrooms = Classroom.objects.get_queryset(request=None).filter(program=options['program'])
+
+        start = time.perf_counter()
+        try:
+            problem = get_problem(
+                schedules, classrooms, weekdays, day_start, day_end, options['step'],
+                options['sessions'], options['duration'],
+            )
+            sessions = sum(len(lesson.lengths) for lesson in problem.lessons)
+            result = solve(problem, options['workers'], options['time_limit'], options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        solved = time.perf_counter()
+        self.stdout.write(f'{len(schedules)} schedules, {sessions} sessions, {classrooms.count()} classrooms '
+                          f'solved in {solved - start:.2f}s')
+
+        schedules = apply_result(problem, result, schedules)
+        if options['dry_run'] or options['verbosity'] > 1:
+            for schedule in schedules:
+                days = ', '.join(f'{day} {getattr(schedule, day)}' for day in WEEKDAYS if getattr(schedule, day))
+                self.stdout.write(f'{schedule}: {days} in {schedule.classroom_id}')
+
+        if result.conflicts:
+            self.stdout.write(self.style.WARNING(f'{result.conflicts} conflicts left'))
+            if not options['force']:
+                raise CommandError('the timetable has conflicts, nothing was saved (use --force to save it anyway)')
+        if options['dry_run']:
+            return
+
+        with transaction.atomic():
+            BulkUpdateOrCreateQuerySet(Schedule).bulk_update_or_create(
+                schedules, ['classroom', *WEEKDAYS], match_field='id',
+            )
+            TimeSlot.objects.sync(schedules)
+            # the bulk upsert doesn't send the signals
+            bump_schedule_version()
+        self.stdout.write(self.style.SUCCESS(f'{len(schedules)} schedules saved'))
@@ -0,0 +1,31 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from apps.academic.models import Class
+from apps.academic.transcripts import get_transcripts, render_transcripts, stream_zip
+
+class Command(BaseCommand):
+    help = 'Generate the PDF transcripts of a generation into a zip and report the transcripts per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('generation', type=int)
+        parser.add_argument('--output', help='path of the zip, defaults to transcripts_<generation>.zip')
+        parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to all cores')
+
+    def handle(self, *args, **options):
+        generation = options['generation']
+        output = options['output'] or f'transcripts_{generation}.zip'
+
+        start = time.perf_counter()
+        transcripts = get_transcripts(generation, Class.objects.get_queryset(request=None))
+        fetched = time.perf_counter()
+        with open(output, 'wb') as f:
+            for chunk in stream_zip(render_transcripts(transcripts, workers=options['workers'] or os.cpu_count() or 1)):
+                f.write(chunk)
+        done = time.perf_counter()
+
+        rendering = done - fetched
+        self.stdout.write(f'fetched {len(transcripts)} transcripts in {fetched - start:.2f}s')
+        self.stdout.write(f'rendered and zipped in {rendering:.2f}s '
+                          f'({len(transcripts) / rendering if rendering else 0:.1f} transcripts/s)')
+        self.stdout.write(self.style.SUCCESS(f'Transcripts written to {output}'))
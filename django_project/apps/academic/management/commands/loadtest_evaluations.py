@@ -0,0 +1,192 @@
+import json
+import math
+import time
+import queue
+import random
+import secrets
+import threading
+import http.client
+from importlib import import_module
+from urllib.parse import urlsplit, urlencode
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from apps.users.models import User, Student
+from apps.organization.models import Program
+from apps.academic.models import Class, Course, Schedule, Evaluation, EvaluationTemplate
+
+PREFIX = 'loadtest'
+EMAIL_DOMAIN = 'loadtest.invalid'
+
+def fake_answer(question, rng):
+    choices = question.get('choices') or ['a']
+    match question.get('type'):
+        case 'integer':
+            return rng.randint(1, 5)
+        case 'number':
+            return round(rng.uniform(0, 10), 2)
+        case 'dropdown':
+            return rng.choice(choices)
+        case 'checkbox':
+            return rng.sample(choices, rng.randint(0, len(choices)))
+        case 'date':
+            return '2025-01-01'
+        case 'date-time':
+            return '2025-01-01T10:00'
+        case 'time':
+            return '10:00'
+    return 'load test'
+
+def percentile(values, p):
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+class Command(BaseCommand):
+    help = ('Submit the evaluations of thousands of students at once against a running server and report '
+            'the latency and throughput. the students, schedules and their sessions are made in the given program')
+
+    def add_arguments(self, parser):
+        parser.add_argument('program', type=int, help='id of the program to put the test data in')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='the server, defaults to http://127.0.0.1:8000')
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--schedules', type=int, default=3, help='every student evaluates all of them')
+        parser.add_argument('--concurrency', type=int, default=200, help='submitters at the same time')
+        parser.add_argument('--duplicates', type=float, default=0.05, help='share of the submissions that are sent twice')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--cleanup', action='store_true', help='delete the test data and stop')
+
+    def handle(self, *args, **options):
+        try:
+            program = Program.objects.select_related('faculty').get(pk=options['program'])
+        except Program.DoesNotExist:
+            raise CommandError('this program does not exist')
+        if options['cleanup']:
+            self.cleanup(program)
+            return
+        template = EvaluationTemplate.objects.first()
+        if template is None:
+            raise CommandError('there is no evaluation template to answer')
+
+        rng = random.Random(options['seed'])
+        sessions, schedules = self.setup(program, options['students'], options['schedules'])
+        jobs = [(session, schedule) for session in sessions for schedule in schedules]
+        jobs += rng.sample(jobs, int(len(jobs) * options['duplicates']))
+        rng.shuffle(jobs)
+        # the answers are made up front so that the clients only measure the server
+        csrf_token = secrets.token_hex(16)
+        work = queue.SimpleQueue()
+        for session, schedule in jobs:
+            work.put((
+                reverse('academic:add_evaluation', args=[schedule]),
+                urlencode({
+                    'csrfmiddlewaretoken': csrf_token,
+                    'response': json.dumps({q['title']: fake_answer(q, rng) for q in template.question_definition}),
+                }),
+                f'{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf_token}',
+            ))
+
+        self.stdout.write(f'{len(jobs)} submissions by {len(sessions)} students to {len(schedules)} schedules, '
+                          f'{options["concurrency"]} at a time')
+        results = []
+        url = urlsplit(options['url'])
+        threads = [
+            threading.Thread(target=self.submitter, args=(url, work, results), daemon=True)
+            for _ in range(options['concurrency'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        self.report(results, elapsed, len(sessions) * len(schedules), schedules)
+
+    def setup(self, program, students, schedules):
+        """
+        make (or reuse) the class, courses, schedules and students of the test with a session each,
+        the evaluations of a previous run are deleted
+        """
+        org = {'faculty': program.faculty, 'program': program}
+        _class, _ = Class.objects.get_or_create(name=PREFIX, generation=0, **org)
+        courses = [Course.objects.get_or_create(name=f'{PREFIX} {i}', year='1', **org)[0] for i in range(schedules)]
+        schedules = [Schedule.objects.get_or_create(course=course, _class=_class, professor=None)[0].pk for course in courses]
+        Evaluation.objects.filter(schedule__in=schedules).delete()
+
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@{EMAIL_DOMAIN}', first_name='load', last_name=f'test {i}',
+                 password=password)
+            for i in range(students)
+        ], ignore_conflicts=True, batch_size=1000)
+        users = list(User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').order_by('pk')[:students])
+        Student.objects.bulk_create([Student(user=user, _class=_class) for user in users], ignore_conflicts=True, batch_size=1000)
+
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        backend = settings.AUTHENTICATION_BACKENDS[0]
+        sessions = []
+        for user in users:
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = backend
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session['permissions'] = []
+            session.set_expiry(60 * 60)
+            session.create()
+            sessions.append(session.session_key)
+        return sessions, schedules
+
+    def submitter(self, url, work, results):
+        success_url = reverse('academic:view_schedule')
+        connection = None
+        while True:
+            try:
+                path, body, cookie = work.get_nowait()
+            except queue.Empty:
+                break
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                connection.request('POST', path, body, {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Cookie': cookie,
+                })
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                # errors get redirected too, only the redirect to the schedules is a success
+                if status == 302 and response.getheader('Location') != success_url:
+                    status = f'302 to {response.getheader("Location")}'
+                if response.will_close:
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                if connection is not None:
+                    connection.close()
+                connection = None
+            results.append((time.perf_counter() - start, status))
+
+    def report(self, results, elapsed, expected, schedules):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        statuses = {}
+        for _, status in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        self.stdout.write(f'{len(results)} requests in {elapsed:.2f}s, {len(results) / elapsed:.1f} requests/s')
+        self.stdout.write(f'latency ms: p50 {percentile(latencies, 50):.1f}, p90 {percentile(latencies, 90):.1f}, '
+                          f'p99 {percentile(latencies, 99):.1f}, max {latencies[-1]:.1f}')
+        self.stdout.write(f'statuses: {", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str))}')
+        saved = Evaluation.objects.filter(schedule__in=schedules).count()
+        style = self.style.SUCCESS if saved == expected else self.style.ERROR
+        self.stdout.write(style(f'{saved} evaluations saved out of {expected}'))
+
+    def cleanup(self, program):
+        classes = Class.objects.filter(name=PREFIX, generation=0, program=program)
+        Evaluation.objects.filter(schedule___class__in=classes).delete()
+        Schedule.objects.filter(_class__in=classes).delete()
+        Course.objects.filter(name__startswith=f'{PREFIX} ', program=program).delete()
+        Student.objects.filter(user__email__endswith=f'@{EMAIL_DOMAIN}').delete()
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+        classes.delete()
+        self.stdout.write(self.style.SUCCESS('Load test data deleted'))
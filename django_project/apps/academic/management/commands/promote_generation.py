@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import Group
+from django.db import transaction
+from apps.users.models import User, Student
+from apps.academic.models import Class, Score
+
+class Command(BaseCommand):
+    help = ('Move every student of a generation to the classes of the same name in another one, or graduate them. '
+            'it runs as a few statements in one transaction with the students locked, so it can run while the site is up')
+
+    def add_arguments(self, parser):
+        parser.add_argument('generation', type=int)
+        action = parser.add_mutually_exclusive_group(required=True)
+        action.add_argument('--to', type=int, help='the generation to move the students to')
+        action.add_argument('--graduate', action='store_true',
+                            help='delete the students, and their users when they are in no other group')
+        parser.add_argument('--program', type=int, default=None, help='id of the program, defaults to all of them')
+        parser.add_argument('--delete-scores', action='store_true', help='graduate the students that have scores too')
+        parser.add_argument('--dry-run', action='store_true', help='only count what would change')
+
+    def handle(self, *args, **options):
+        generation = options['generation']
+        if options['to'] == generation:
+            raise CommandError('the students are already in this generation')
+        classes = Class.objects.get_queryset(request=None).filter(generation=generation)
+        if options['program']:
+            classes = classes.filter(program=options['program'])
+        students = Student.objects.get_queryset(request=None).filter(_class__in=classes)
+
+        with transaction.atomic():
+            # whatever edits them meanwhile waits for the end of it
+            locked = list(students.select_for_update(of=('self',)).values_list('pk', flat=True))
+            if not locked:
+                raise CommandError(f'generation {generation} has no students')
+            students = Student.objects.get_queryset(request=None).filter(pk__in=locked)
+            if options['graduate']:
+                self.graduate(students, options['delete_scores'], options['dry_run'])
+            else:
+                self.promote(students, classes, options['to'], options['dry_run'])
+
+    def promote(self, students, classes, to, dry_run):
+        names = set(classes.filter(students__in=students).values_list('faculty_id', 'program_id', 'name'))
+        existing = set(Class.objects.get_queryset(request=None).filter(generation=to).values_list('faculty_id', 'program_id', 'name'))
+        self.stdout.write(f'{students.count()} students of {len(names)} classes to generation {to}, '
+                          f'{len(names - existing)} classes to create')
+        if dry_run:
+            return
+        moved = students.move_to_generation(to)
+        self.stdout.write(self.style.SUCCESS(f'{len(moved)} students moved'))
+
+    def graduate(self, students, delete_scores, dry_run):
+        student_group, _ = Group.objects.get_or_create(name="STUDENT")
+        users = User.objects.get_queryset(request=None).filter(student__in=students)
+        scored = students.filter(pk__in=Score.objects.values('student')).count()
+        self.stdout.write(
+            f'{students.count()} students to delete, '
+            f'{users.filter(groups=student_group).count()} STUDENT memberships to remove, '
+            f'{users.exclude(groups__in=Group.objects.exclude(pk=student_group.pk)).filter(groups=student_group).count()} '
+            f'users to delete, {scored} students with scores'
+        )
+        if scored and not delete_scores:
+            raise CommandError('some students still have scores, nothing was deleted '
+                               '(generate their transcripts, then use --delete-scores)')
+        if dry_run:
+            return
+        _, deleted = students.graduate(delete_scores=delete_scores)
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted.get(Student._meta.label, 0)} students and {deleted.get(User._meta.label, 0)} users deleted'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.users.models import Student
+from apps.academic.models import StudentScoreSummary
+
+class Command(BaseCommand):
+    help = 'Rebuild the student score summaries and rankings from the scores, in batches of students'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        student_ids = list(Student.objects.get_queryset(request=None).order_by('pk').values_list('pk', flat=True))
+
+        # summaries of students that no longer exist cascade away, so only the batches are needed
+        for i in range(0, len(student_ids), batch_size):
+            with transaction.atomic():
+                StudentScoreSummary.objects.refresh(student_ids[i:i + batch_size], rerank=False)
+            self.stdout.write(f'{min(i + batch_size, len(student_ids))}/{len(student_ids)} students')
+
+        with transaction.atomic():
+            StudentScoreSummary.objects.rerank()
+        self.stdout.write(self.style.SUCCESS('Score summaries rebuilt'))
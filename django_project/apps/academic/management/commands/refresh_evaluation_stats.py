@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.core.terms import current_term
+from apps.academic.models import Evaluation, EvaluationStat
+
+class Command(BaseCommand):
+    help = 'Rebuild the evaluation stats of a term (or of every term) from the responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', default=None, help='defaults to the current term')
+        parser.add_argument('--all', action='store_true', help='every term that has evaluations')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            terms = set(Evaluation.objects.get_queryset(request=None).values_list('term', flat=True).distinct())
+            terms |= set(EvaluationStat.objects.get_queryset(request=None).values_list('term', flat=True).distinct())
+        else:
+            terms = {options['term'] or current_term()}
+
+        for term in sorted(terms):
+            with transaction.atomic():
+                EvaluationStat.objects.refresh(term)
+            self.stdout.write(f'{term}: {EvaluationStat.objects.filter(term=term).count()} stats')
+        self.stdout.write(self.style.SUCCESS('Evaluation stats refreshed'))
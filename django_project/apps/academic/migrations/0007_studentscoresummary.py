@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0006_alter_schedule_professor_classroom_and_more'),
+        ('users', '0004_alter_student_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.CharField(max_length=1)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('percentile', models.FloatField(blank=True, null=True)),
+                ('_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='academic.class')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_summaries', to='users.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['_class', 'year', 'rank'], name='academic_st__class__853545_idx')],
+                'unique_together': {('student', 'year')},
+            },
+        ),
+    ]
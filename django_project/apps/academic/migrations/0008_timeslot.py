@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:03
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.backends.postgresql.psycopg_any import NumericRange
+from apps.academic.scheduling import MINUTES_PER_DAY, schedule_slots, to_time
+
+
+def parse_existing_schedules(apps, schema_editor):
+    Schedule = apps.get_model('academic', 'Schedule')
+    TimeSlot = apps.get_model('academic', 'TimeSlot')
+    slots = []
+    for schedule in Schedule.objects.all().iterator():
+        for slot in schedule_slots(schedule):
+            offset = slot.weekday * MINUTES_PER_DAY
+            slots.append(TimeSlot(
+                schedule_id=schedule.pk, weekday=slot.weekday, start=to_time(slot.start), end=to_time(slot.end),
+                minutes=NumericRange(offset + slot.start, offset + slot.end),
+            ))
+    TimeSlot.objects.bulk_create(slots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0007_studentscoresummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('start', models.TimeField()),
+                ('end', models.TimeField()),
+                ('minutes', django.contrib.postgres.fields.ranges.IntegerRangeField()),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_slots', to='academic.schedule')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GistIndex(fields=['minutes'], name='academic_ti_minutes_26f696_gist'), models.Index(fields=['weekday', 'start'], name='academic_ti_weekday_9be3ec_idx')],
+            },
+        ),
+        migrations.RunPython(parse_existing_schedules, migrations.RunPython.noop),
+    ]
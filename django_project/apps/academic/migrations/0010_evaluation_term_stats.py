@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:21
+
+import apps.core.terms
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0009_professoravailability'),
+        ('users', '0004_alter_student_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvaluationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=7)),
+                ('question', models.TextField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(blank=True, null=True)),
+                ('squares', models.FloatField(blank=True, null=True)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('distribution', models.JSONField(default=dict)),
+            ],
+        ),
+        # nothing says when the existing evaluations were made, they go in a term of their own
+        # instead of the one the migration happens to run in
+        migrations.AddField(
+            model_name='evaluation',
+            name='term',
+            field=models.CharField(default='legacy', max_length=7),
+        ),
+        migrations.AlterField(
+            model_name='evaluation',
+            name='term',
+            field=models.CharField(default=apps.core.terms.current_term, max_length=7),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['term', 'schedule'], name='academic_ev_term_c35efc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['response'], name='academic_ev_respons_bad029_gin'),
+        ),
+        migrations.AddField(
+            model_name='evaluationstat',
+            name='schedule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evaluation_stats', to='academic.schedule'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='evaluationstat',
+            unique_together={('term', 'schedule', 'question')},
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0010_evaluation_term_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvaluationTemplateVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('definition', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='academic.evaluationtemplate')),
+            ],
+            options={
+                'unique_together': {('template', 'number')},
+            },
+        ),
+        migrations.AddField(
+            model_name='evaluation',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='evaluations', to='academic.evaluationtemplateversion'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from apps.core.responses import pack_responses, unpack_responses
+
+
+def forwards(apps, schema_editor):
+    pack_responses(
+        apps.get_model('academic', 'Evaluation'), apps.get_model('academic', 'EvaluationTemplate'),
+        apps.get_model('academic', 'EvaluationTemplateVersion'), 'question_definition',
+        using=schema_editor.connection.alias,
+    )
+
+
+def backwards(apps, schema_editor):
+    unpack_responses(apps.get_model('academic', 'Evaluation'), using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    # every batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('academic', '0011_template_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0012_pack_evaluation_responses'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evaluation',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='evaluations', to='academic.evaluationtemplateversion'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:35
+
+from django.db import migrations
+from apps.core.partitions import partition_table, unpartition_table
+
+
+def forwards(apps, schema_editor):
+    partition_table(schema_editor, 'academic_evaluation', 'term')
+
+
+def backwards(apps, schema_editor):
+    unpartition_table(schema_editor, 'academic_evaluation', 'term')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0013_evaluation_version_required'),
+        ('users', '0004_alter_student_user'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='evaluation',
+            unique_together={('schedule', 'student', 'term')},
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:37
+
+import apps.core.models
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0014_partition_evaluation_by_term'),
+        ('users', '0004_alter_student_user'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='evaluation',
+            name='academic_ev_respons_bad029_gin',
+        ),
+        migrations.AddField(
+            model_name='evaluation',
+            name='search',
+            field=models.GeneratedField(db_persist=True, expression=apps.core.models.ResponseSearchVector('response'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['response'], name='academic_eval_response_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search'], name='academic_eval_search_gin'),
+        ),
+    ]
@@ -1,10 +1,19 @@
 from django.db import models
 from django.db.models import Q
+from django.db.models.functions import Upper
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.fields import IntegerRangeField
+from django.contrib.postgres.search import SearchVectorField
+from django.contrib.postgres.indexes import GistIndex, GinIndex, OpClass
 from bulk_update_or_create import BulkUpdateOrCreateQuerySet
 from django_jsonform.models.fields import JSONField
 from apps.organization.mixins import OrganizationMixin
 from apps.users.models import User, Student
 from apps.core.managers import RLSManager
+from apps.core.models import TemplateVersion, VersionedTemplateMixin, ResponseSearchVector
+from apps.core.terms import current_term
+from .queryset import StudentScoreSummaryQuerySet, TimeSlotQuerySet, EvaluationQuerySet, EvaluationStatQuerySet
+from .scheduling import WEEKDAYS, parse_time_range
 
 class Course(OrganizationMixin):
     name = models.CharField(max_length=255)
@@ -15,9 +24,11 @@ class Course(OrganizationMixin):
     
     class Meta:
         unique_together = ('faculty', 'program', 'name', 'year')
+        # for the global search
+        indexes = [GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='academic_course_name_trgm')]
     
     def get_user_rls_filter(self, user):
-        return Q(False)
+        return Q(pk__in=[])
 
 class Class(OrganizationMixin):
     generation = models.IntegerField()
@@ -26,25 +37,29 @@ class Class(OrganizationMixin):
     class Meta:
         verbose_name_plural = "Classes"
         unique_together = ('faculty', 'program', 'generation', 'name')
+        # for the global search
+        indexes = [GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='academic_class_name_trgm')]
 
     def __str__(self):
         return f"{self.generation}: {self.name}"
 
     def get_user_rls_filter(self, user):
         # the class one is teaching or the class one is a student in
-        return Q(students__user=user) | Q(schedule__professor=user)
+        return Q(students__user=user) | Q(schedules__professor=user)
 
 class Classroom(OrganizationMixin):
     name = models.CharField(max_length=255)
 
     class Meta:
         unique_together = ('faculty', 'program', 'name')
+        # for the global search
+        indexes = [GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='academic_classroom_name_trgm')]
 
     def __str__(self):
         return self.name
     
     def get_user_rls_filter(self, user):
-        return Q(False)
+        return Q(pk__in=[])
 
 class Schedule(models.Model):
     """
@@ -72,7 +87,62 @@ class Schedule(models.Model):
     
     class Meta:
         unique_together = ('professor', 'course', '_class')
+
+    def clean(self):
+        super().clean()
+        errors = {}
+        for day in WEEKDAYS:
+            try: parse_time_range(getattr(self, day))
+            except ValueError as e: errors[day] = str(e)
+        if errors:
+            raise ValidationError(errors)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        TimeSlot.objects.sync([self])
+
+class TimeSlot(models.Model):
+    """
+    Normalized time of a schedule, parsed out of its mon...sun and kept in sync on save.
+    minutes is the [start, end) range in minutes since monday 00:00 so overlaps go through the gist index
+    """
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='time_slots')
+    weekday = models.PositiveSmallIntegerField()  # 0 is monday
+    start = models.TimeField()
+    end = models.TimeField()
+    minutes = IntegerRangeField()
+
+    objects = TimeSlotQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GistIndex(fields=['minutes']),
+            models.Index(fields=['weekday', 'start']),
+        ]
+
+    def __str__(self):
+        return f"{WEEKDAYS[self.weekday]} {self.start:%H:%M}-{self.end:%H:%M}"
     
+class ProfessorAvailability(models.Model):
+    """
+    When a professor can teach, the timetable generator keeps their schedules inside of it.
+    a professor without any is available all the time
+    """
+    professor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availabilities')
+    weekday = models.PositiveSmallIntegerField(choices=list(enumerate(WEEKDAYS)))
+    start = models.TimeField()
+    end = models.TimeField()
+
+    class Meta:
+        verbose_name_plural = "Professor availabilities"
+
+    def __str__(self):
+        return f"{self.professor} {WEEKDAYS[self.weekday]} {self.start:%H:%M}-{self.end:%H:%M}"
+
+    def clean(self):
+        if self.start and self.end and self.start >= self.end:
+            raise ValidationError({'end': 'the end has to be after the start'})
+
 class Score(models.Model):
     student = models.ForeignKey(Student, on_delete=models.PROTECT)
     course = models.ForeignKey(Course, on_delete=models.PROTECT)
@@ -83,7 +153,30 @@ class Score(models.Model):
     class Meta:
         unique_together = ('student', 'course')
 
-class EvaluationTemplate(models.Model):
+class StudentScoreSummary(models.Model):
+    """
+    Aggregate of a student's scores for one course year, kept up to date by the score write paths.
+    rank and percentile are within the student's class for that year
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='score_summaries')
+    _class = models.ForeignKey(Class, on_delete=models.SET_NULL, null=True, blank=True)
+    year = models.CharField(max_length=1)
+    count = models.PositiveIntegerField(default=0)
+    total = models.IntegerField(default=0)
+    mean = models.FloatField(default=0)
+    rank = models.PositiveIntegerField(null=True, blank=True)
+    percentile = models.FloatField(null=True, blank=True)
+
+    objects = StudentScoreSummaryQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('student', 'year')
+        indexes = [models.Index(fields=['_class', 'year', 'rank'])]
+
+    def __str__(self):
+        return f"{self.student} - year {self.year}"
+
+class EvaluationTemplate(VersionedTemplateMixin):
     """
     This is a singleton model
     """
@@ -112,21 +205,72 @@ class EvaluationTemplate(models.Model):
     }
     question_definition = JSONField(schema=TEMPLATE_SCHEMA)
 
+    definition_field = 'question_definition'
+
     def save(self, *args, **kwargs):
         self.pk = 1
         super().save(*args, **kwargs)
 
+class EvaluationTemplateVersion(TemplateVersion):
+    template = models.ForeignKey(EvaluationTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='versions')
+
+    class Meta:
+        unique_together = ('template', 'number')
+
 class Evaluation(models.Model):
     schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    # the answers in the order of the questions of the version
     response = models.JSONField()
+    version = models.ForeignKey(EvaluationTemplateVersion, on_delete=models.PROTECT, related_name='evaluations')
+    term = models.CharField(max_length=7, default=current_term)
+    search = models.GeneratedField(expression=ResponseSearchVector('response'), output_field=SearchVectorField(), db_persist=True)
 
-    objects = RLSManager(field_with_affiliation="schedule.course")
+    objects = RLSManager.from_queryset(EvaluationQuerySet)(field_with_affiliation="schedule.course")
+    # the table is partitioned by term in postgres, see apps.core.partitions
+    partition_key = 'term'
 
     class Meta:
-        unique_together = ('schedule', 'student')
+        # a student evaluates a schedule once a term, the unique key of a partitioned table has to include the term
+        unique_together = ('schedule', 'student', 'term')
+        indexes = [
+            models.Index(fields=['term', 'schedule']),
+            # for containment searches over the answers (@>)
+            GinIndex(fields=['response'], name='academic_eval_response_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['search'], name='academic_eval_search_gin'),
+        ]
 
     def get_user_rls_filter(self, user):
         return Q(schedule__professor=user)
-    
-        
\ No newline at end of file
+
+    @property
+    def answers(self):
+        return EvaluationTemplateVersion.expand(self.version_id, self.response)
+
+class EvaluationStat(models.Model):
+    """
+    What the evaluations of a schedule in a term answered to one question, aggregated in the database.
+    every submission adds its answers, an evaluation saved or deleted otherwise refreshes the schedule.
+    total, squares, minimum and maximum are only set for numeric answers,
+    distribution counts every answer of the numeric, dropdown and checkbox questions
+    """
+    term = models.CharField(max_length=7)
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='evaluation_stats')
+    question = models.TextField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(null=True, blank=True)
+    squares = models.FloatField(null=True, blank=True)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    distribution = models.JSONField(default=dict)
+
+    objects = RLSManager.from_queryset(EvaluationStatQuerySet)(field_with_affiliation="schedule.course")
+
+    class Meta:
+        unique_together = ('term', 'schedule', 'question')
+
+    def get_user_rls_filter(self, user):
+        return Q(schedule__professor=user)
+
+    def __str__(self):
+        return f"{self.schedule} - {self.term} - {self.question}"
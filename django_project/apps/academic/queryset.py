@@ -0,0 +1,340 @@
+import json
+from django.db import models, connections, transaction
+from django.db.models import Count, Sum, F, Q, Window
+from django.db.models.functions import Rank, PercentRank
+from django.db.backends.postgresql.psycopg_any import NumericRange
+from apps.core.terms import current_term
+from .scheduling import MINUTES_PER_DAY, Slot, schedule_slots, to_time, find_conflicts
+
+class StudentScoreSummaryQuerySet(models.QuerySet):
+    def refresh(self, student_ids, rerank=True):
+        """
+        Recompute the summaries of these students from their scores with one aggregate query,
+        then rerank the (class, year) partitions they were or are now part of.
+        returns the partitions that got touched
+        """
+        from .models import Score
+        student_ids = set(student_ids)
+        if not student_ids:
+            return set()
+
+        existing = {
+            (student_id, year): (pk, class_id)
+            for pk, student_id, year, class_id in self.filter(student_id__in=student_ids)
+            .values_list('pk', 'student_id', 'year', '_class_id')
+        }
+        partitions = {(class_id, year) for (_, year), (_, class_id) in existing.items()}
+
+        rows = Score.objects.filter(student_id__in=student_ids) \
+            .values('student_id', 'student___class_id', 'course__year') \
+            .annotate(count=Count('id'), total=Sum('score'))
+        to_create, to_update = [], []
+        for row in rows:
+            key = (row['student_id'], row['course__year'])
+            summary = self.model(
+                student_id=row['student_id'], _class_id=row['student___class_id'], year=row['course__year'],
+                count=row['count'], total=row['total'], mean=round(row['total'] / row['count'], 2),
+            )
+            partitions.add((summary._class_id, summary.year))
+            if key in existing:
+                summary.pk = existing.pop(key)[0]
+                to_update.append(summary)
+            else:
+                to_create.append(summary)
+
+        # whatever is left in existing has no score anymore
+        if existing:
+            self.filter(pk__in=[pk for pk, _ in existing.values()]).delete()
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['_class_id', 'count', 'total', 'mean'])
+        if rerank:
+            self.rerank(partitions)
+        return partitions
+
+    def rerank(self, partitions=None, batch_size=1000):
+        """
+        Rank the students within their class and year by mean using window functions.
+        partitions is a set of (class_id, year), None reranks everything
+        """
+        queryset = self
+        if partitions is not None:
+            if not partitions:
+                return
+            queryset = queryset.filter(
+                Q(*[Q(_class_id=class_id, year=year) for class_id, year in partitions], _connector=Q.OR)
+            )
+        partition_by = [F('_class'), F('year')]
+        ranked = queryset.annotate(
+            new_rank=Window(Rank(), partition_by=partition_by, order_by=F('mean').desc()),
+            new_percentile=Window(PercentRank(), partition_by=partition_by, order_by=F('mean').asc()),
+        ).only('pk')
+
+        summaries = []
+        for summary in ranked:
+            summary.rank = summary.new_rank
+            summary.percentile = round(summary.new_percentile * 100, 1)
+            summaries.append(summary)
+        self.bulk_update(summaries, ['rank', 'percentile'], batch_size=batch_size)
+
+class TimeSlotQuerySet(models.QuerySet):
+    def sync(self, schedules):
+        """
+        Replace the slots of these schedules with the ones parsed out of their mon...sun
+        """
+        schedules = list(schedules)
+        self.filter(schedule__in=[schedule.pk for schedule in schedules]).delete()
+        self.bulk_create([
+            self.model(
+                schedule_id=schedule.pk, weekday=slot.weekday, start=to_time(slot.start), end=to_time(slot.end),
+                minutes=NumericRange(slot.weekday * MINUTES_PER_DAY + slot.start, slot.weekday * MINUTES_PER_DAY + slot.end),
+            )
+            for schedule in schedules for slot in schedule_slots(schedule)
+        ])
+
+    def at(self, weekday, minute):
+        """
+        the slots running at that minute of the day, eg: who is teaching at 10:00 on tuesday
+        """
+        return self.filter(minutes__contains=weekday * MINUTES_PER_DAY + minute)
+
+    def overlapping(self, slots):
+        """
+        the slots that overlap any of these slots
+        """
+        q = Q()
+        for slot in slots:
+            offset = slot.weekday * MINUTES_PER_DAY
+            q |= Q(minutes__overlap=NumericRange(offset + slot.start, offset + slot.end))
+        return self.filter(q) if q else self.none()
+
+    def hourly_usage(self):
+        """
+        Busy minutes of every (classroom, weekday, hour) out of the slots in this queryset,
+        each slot is split over the hours it touches and summed up in the database.
+        returns {(classroom_id, weekday, hour): minutes}
+        """
+        slots, params = self.values('id').query.sql_with_params()
+        sql = f'''
+            SELECT s.classroom_id, bucket / {MINUTES_PER_DAY}, bucket %% {MINUTES_PER_DAY} / 60,
+                   LEAST(SUM(upper(t.minutes * int4range(bucket, bucket + 60)) - lower(t.minutes * int4range(bucket, bucket + 60))), 60)
+            FROM {self.model._meta.db_table} t
+            JOIN {self.model.schedule.field.related_model._meta.db_table} s ON s.id = t.schedule_id
+            CROSS JOIN LATERAL generate_series(lower(t.minutes) / 60 * 60, upper(t.minutes) - 1, 60) AS bucket
+            WHERE t.id IN ({slots}) AND s.classroom_id IS NOT NULL
+            GROUP BY 1, 2, 3
+        '''
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return {(classroom, weekday, hour): minutes for classroom, weekday, hour, minutes in cursor.fetchall()}
+
+    def as_slots(self, ref='schedule_id'):
+        """
+        load the slots with what the conflict detection needs in one query
+        """
+        rows = self.values_list(
+            ref, 'weekday', 'minutes', 'schedule__professor_id', 'schedule__classroom_id', 'schedule___class_id'
+        )
+        return [
+            Slot(ref_value, weekday, minutes.lower - weekday * MINUTES_PER_DAY, minutes.upper - weekday * MINUTES_PER_DAY,
+                 professor, classroom, _class)
+            for ref_value, weekday, minutes, professor, classroom, _class in rows
+        ]
+
+    def conflicts(self, slots):
+        """
+        Conflicts of these (unsaved) slots between themselves and with the saved slots in this queryset,
+        which are narrowed down with one query on the gist index before the sweep
+        """
+        slots = list(slots)
+        professors = {slot.professor_id for slot in slots if slot.professor_id}
+        classrooms = {slot.classroom_id for slot in slots if slot.classroom_id}
+        classes = {slot.class_id for slot in slots if slot.class_id}
+        saved = self.overlapping(slots).filter(
+            Q(schedule__professor__in=professors) | Q(schedule__classroom__in=classrooms) | Q(schedule___class__in=classes)
+        ).as_slots()
+        # the saved slots may clash among themselves, that's not what is being asked
+        unsaved = {id(slot) for slot in slots}
+        return [
+            (resource, a, b) for resource, a, b in find_conflicts(slots + saved)
+            if id(a) in unsaved or id(b) in unsaved
+        ]
+
+def _aggregate_answers(evaluation_version):
+    """
+    The CTEs that aggregate the answers of an `evaluations` CTE (schedule_id, version_id, response) by schedule
+    and question into `new_stats`, walking the questions of the version of every response.
+    the answers are merged by question title across versions
+    """
+    return f'''
+        answers AS (
+            SELECT e.schedule_id, q.question ->> 'title' AS title, q.question ->> 'type' AS type,
+                   e.response -> (q.position - 1)::int AS answer
+            FROM evaluations e
+            JOIN {evaluation_version} v ON v.id = e.version_id
+            CROSS JOIN LATERAL jsonb_array_elements(v.definition) WITH ORDINALITY AS q(question, position)
+            WHERE jsonb_typeof(e.response -> (q.position - 1)::int) <> 'null'
+        ), stats AS (
+            SELECT schedule_id, title, count(*) AS count, sum(number) AS total, sum(number * number) AS squares,
+                   min(number) AS minimum, max(number) AS maximum
+            FROM (
+                SELECT schedule_id, title, CASE WHEN type IN ('integer', 'number') AND jsonb_typeof(answer) = 'number'
+                                                THEN answer::float8 END AS number
+                FROM answers
+            ) a
+            GROUP BY 1, 2
+        ), choices AS (
+            SELECT schedule_id, title, answer #>> '{{}}' AS choice FROM answers
+            WHERE type IN ('integer', 'number', 'dropdown') AND jsonb_typeof(answer) IN ('number', 'string')
+            UNION ALL
+            -- the case keeps the function from ever seeing something else than an array
+            SELECT schedule_id, title, choice FROM answers
+            CROSS JOIN LATERAL jsonb_array_elements_text(
+                CASE WHEN jsonb_typeof(answer) = 'array' THEN answer ELSE '[]' END
+            ) AS choice
+            WHERE type = 'checkbox'
+        ), distributions AS (
+            SELECT schedule_id, title, jsonb_object_agg(choice, n) AS distribution
+            FROM (SELECT schedule_id, title, choice, count(*) AS n FROM choices GROUP BY 1, 2, 3) c
+            GROUP BY 1, 2
+        ), new_stats AS (
+            SELECT s.schedule_id, s.title AS question, s.count, s.total, s.squares, s.minimum, s.maximum,
+                   coalesce(d.distribution, '{{}}') AS distribution
+            FROM stats s
+            LEFT JOIN distributions d USING (schedule_id, title)
+        )
+    '''
+
+STAT_COLUMNS = 'term, schedule_id, question, count, total, squares, minimum, maximum, distribution'
+
+class EvaluationQuerySet(models.QuerySet):
+    def submit(self, schedule_id, user, version, response, term=None):
+        """
+        Insert the evaluation of a schedule by the student of this user in a single statement.
+        a second submission runs into the unique (schedule, student, term) constraint and does nothing,
+        so there is no need to check first. nothing is inserted either when the user isn't a student
+        or the schedule doesn't exist. returns whether it got inserted.
+        the same statement adds its answers to the stats of the schedule, only the rows of its questions are touched
+        """
+        from apps.users.models import Student
+        from .models import Schedule, EvaluationStat, EvaluationTemplateVersion
+        term = term or current_term()
+        sql = f'''
+            WITH evaluations AS (
+                INSERT INTO {self.model._meta.db_table} (schedule_id, student_id, version_id, response, term)
+                SELECT s.id, st.id, %s, %s, %s
+                FROM {Student._meta.db_table} st
+                JOIN {Schedule._meta.db_table} s ON s.id = %s
+                WHERE st.user_id = %s
+                ON CONFLICT (schedule_id, student_id, term) DO NOTHING
+                RETURNING schedule_id, version_id, response
+            ), {_aggregate_answers(EvaluationTemplateVersion._meta.db_table)}, added AS (
+                INSERT INTO {EvaluationStat._meta.db_table} AS t ({STAT_COLUMNS})
+                SELECT %s, n.* FROM new_stats n
+                -- the same order for everyone, two submissions to a schedule wait on each other instead of deadlocking
+                ORDER BY n.question
+                ON CONFLICT (term, schedule_id, question) DO UPDATE SET
+                    count = t.count + excluded.count,
+                    -- sum() of no numbers is null
+                    total = CASE WHEN t.total IS NULL THEN excluded.total ELSE t.total + coalesce(excluded.total, 0) END,
+                    squares = CASE WHEN t.squares IS NULL THEN excluded.squares
+                                   ELSE t.squares + coalesce(excluded.squares, 0) END,
+                    -- least and greatest skip nulls
+                    minimum = least(t.minimum, excluded.minimum),
+                    maximum = greatest(t.maximum, excluded.maximum),
+                    distribution = (
+                        SELECT coalesce(jsonb_object_agg(d.key, d.n), '{{}}')
+                        FROM (
+                            SELECT key, sum(value::int) AS n
+                            FROM (SELECT * FROM jsonb_each_text(t.distribution)
+                                  UNION ALL SELECT * FROM jsonb_each_text(excluded.distribution)) c
+                            GROUP BY key
+                        ) d
+                    )
+            )
+            SELECT count(*) FROM evaluations
+        '''
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [version.pk, json.dumps(response), term, schedule_id, user.pk, term])
+            return cursor.fetchone()[0] > 0
+
+class EvaluationStatQuerySet(models.QuerySet):
+    GROUPS = {'schedule': 'st.schedule_id', 'professor': 's.professor_id', 'course': 's.course_id'}
+
+    def refresh(self, term, schedule_ids=None):
+        """
+        Recompute the stats of these schedules (all of them if None) for a term out of the responses of
+        their evaluations, with one query. the submissions add to the stats as they come,
+        this is for whatever else changes the evaluations
+        """
+        from .models import Schedule, Evaluation, EvaluationTemplateVersion
+        stats = self.filter(term=term)
+        params = [term]
+        schedules = ''
+        locked = Schedule.objects.filter(
+            Q(pk__in=Evaluation.objects.filter(term=term).values('schedule')) | Q(pk__in=stats.values('schedule'))
+        )
+        if schedule_ids is not None:
+            schedule_ids = list(schedule_ids)
+            if not schedule_ids:
+                return
+            stats = stats.filter(schedule_id__in=schedule_ids)
+            locked = Schedule.objects.filter(pk__in=schedule_ids)
+            schedules = 'AND e.schedule_id = ANY(%s)'
+            params.append(schedule_ids)
+        sql = f'''
+            WITH evaluations AS (
+                SELECT e.schedule_id, e.version_id, e.response FROM {Evaluation._meta.db_table} e
+                WHERE e.term = %s {schedules}
+            ), {_aggregate_answers(EvaluationTemplateVersion._meta.db_table)}
+            INSERT INTO {self.model._meta.db_table} ({STAT_COLUMNS})
+            SELECT %s, n.* FROM new_stats n
+        '''
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            # two refreshes of a schedule at once would both insert its stats, the second one waits here instead.
+            # no_key doesn't get in the way of the evaluations being inserted
+            list(locked.using(self.db).order_by('pk').select_for_update(no_key=True).values_list('pk'))
+            stats.delete()
+            cursor.execute(sql, params + [term])
+
+    def rollup(self, group='schedule'):
+        """
+        Merge the stats in this queryset by schedule, professor or course, in the database.
+        returns [{'group', 'question', 'count', 'mean', 'stddev', 'minimum', 'maximum', 'distribution'}]
+        """
+        from .models import Schedule
+        key = self.GROUPS[group]
+        stats, params = self.values('id').query.sql_with_params()
+        sql = f'''
+            WITH stats AS (
+                SELECT {key} AS grp, st.*
+                FROM {self.model._meta.db_table} st
+                JOIN {Schedule._meta.db_table} s ON s.id = st.schedule_id
+                WHERE st.id IN ({stats})
+            ), distributions AS (
+                SELECT grp, question, jsonb_object_agg(choice, n) AS distribution
+                FROM (
+                    SELECT grp, question, d.key AS choice, sum(d.value::int) AS n
+                    FROM stats CROSS JOIN LATERAL jsonb_each_text(distribution) AS d
+                    GROUP BY 1, 2, 3
+                ) c
+                GROUP BY 1, 2
+            )
+            SELECT t.grp, t.question, t.count, t.total / t.count,
+                   -- greatest skips nulls, so only with a total, rounding may leave the variance a hair under zero
+                   CASE WHEN t.total IS NOT NULL THEN sqrt(greatest(t.squares / t.count - (t.total / t.count) ^ 2, 0)) END,
+                   t.minimum, t.maximum, d.distribution
+            FROM (
+                SELECT grp, question, sum(count) AS count, sum(total) AS total, sum(squares) AS squares,
+                       min(minimum) AS minimum, max(maximum) AS maximum
+                FROM stats GROUP BY 1, 2
+            ) t
+            LEFT JOIN distributions d USING (grp, question)
+            ORDER BY t.grp, t.question
+        '''
+        columns = ['group', 'question', 'count', 'mean', 'stddev', 'minimum', 'maximum', 'distribution']
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [
+                {**dict(zip(columns, row)), 'distribution': json.loads(row[-1]) if row[-1] else {}}
+                for row in cursor.fetchall()
+            ]
@@ -0,0 +1,94 @@
+import re
+import heapq
+from datetime import time
+from typing import NamedTuple, Any
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+MINUTES_PER_DAY = 24 * 60
+
+# 7:00-9:30, 07:00 - 09:30, 7h-9h30, 7.00-9.30, 7-9
+TIME_RANGE_RE = re.compile(r'^\s*(\d{1,2})(?:[:.h](\d{2})?)?\s*-\s*(\d{1,2})(?:[:.h](\d{2})?)?\s*$')
+
+def parse_time_range(text):
+    """
+    Parse the free text of a schedule day into (start, end) minutes of the day.
+    returns None for an empty day and raises ValueError when it can't be read
+    """
+    if not text or not text.strip():
+        return None
+    match = TIME_RANGE_RE.match(text)
+    if not match:
+        raise ValueError(f"'{text}' is not a time range like 07:00-09:30")
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    start = int(start_hour) * 60 + int(start_minute or 0)
+    end = int(end_hour) * 60 + int(end_minute or 0)
+    if not (int(start_minute or 0) < 60 and int(end_minute or 0) < 60 and 0 <= start < end <= MINUTES_PER_DAY):
+        raise ValueError(f"'{text}' is not a valid time range")
+    return start, end
+
+def to_time(minutes):
+    # 24:00 can't be a time, the end of the day is as close as it gets
+    if minutes >= MINUTES_PER_DAY:
+        return time(23, 59)
+    return time(minutes // 60, minutes % 60)
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+class Slot(NamedTuple):
+    """
+    One weekly time slot, with start and end in minutes of the day.
+    ref is whatever identifies the schedule to the caller (a pk, an instance, a form...)
+    """
+    ref: Any
+    weekday: int
+    start: int
+    end: int
+    professor_id: Any = None
+    classroom_id: Any = None
+    class_id: Any = None
+
+def schedule_slots(schedule, ref=None):
+    """
+    The slots of a schedule (or anything with the mon...sun attributes), skipping the days that can't be read
+    """
+    slots = []
+    for weekday, day in enumerate(WEEKDAYS):
+        try: parsed = parse_time_range(getattr(schedule, day, None))
+        except ValueError: continue
+        if parsed:
+            slots.append(Slot(
+                schedule if ref is None else ref, weekday, *parsed,
+                professor_id=getattr(schedule, 'professor_id', None),
+                classroom_id=getattr(schedule, 'classroom_id', None),
+                class_id=getattr(schedule, '_class_id', None),
+            ))
+    return slots
+
+RESOURCES = {'professor_id': 'professor', 'classroom_id': 'classroom', 'class_id': 'class'}
+
+def find_conflicts(slots, resources=tuple(RESOURCES)):
+    """
+    Sweep over the slots of every (resource, weekday) sorted by start, keeping the running ones in a heap by end.
+    it's O(n log n) plus the number of conflicts.
+    yields (resource, slot, other_slot) for every pair of slots that overlap on the same professor, classroom or class
+    """
+    for resource in resources:
+        groups = {}
+        for slot in slots:
+            value = getattr(slot, resource)
+            if value is not None:
+                groups.setdefault((value, slot.weekday), []).append(slot)
+
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            group.sort(key=lambda slot: slot.start)
+            running = []
+            for i, slot in enumerate(group):
+                while running and running[0][0] <= slot.start:
+                    heapq.heappop(running)
+                for _, j in running:
+                    if group[j].ref != slot.ref:
+                        yield resource, group[j], slot
+                heapq.heappush(running, (slot.end, i))
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.core.forms import forget_compiled_template
+from apps.core.partitions import partition_dropped
+from .models import Schedule, Classroom, Course, Class, Evaluation, EvaluationTemplate, EvaluationStat
+from .cache import bump_schedule_version, refresh_evaluation_stats
+
+# the classroom usage and the calendar feeds are cached under the schedule version,
+# bulk writes don't send these signals so they have to bump it themselves
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def schedule_changed(sender, instance, **kwargs):
+    bump_schedule_version()
+
+# their names show up in the feeds
+@receiver(post_save, sender=Classroom)
+@receiver(post_delete, sender=Classroom)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Class)
+def schedule_relation_changed(sender, instance, **kwargs):
+    bump_schedule_version()
+
+@receiver(post_save, sender=Evaluation)
+@receiver(post_delete, sender=Evaluation)
+def evaluation_changed(sender, instance, **kwargs):
+    refresh_evaluation_stats(instance.term, instance.schedule_id)
+
+# an archived term keeps its stats, a dropped one is gone for good
+@receiver(partition_dropped, sender=Evaluation)
+def evaluation_term_dropped(sender, value, using, **kwargs):
+    EvaluationStat.objects.using(using).filter(term=value).delete()
+
+# the stats follow the version every evaluation was answered with, so they don't depend on the template
+@receiver(post_save, sender=EvaluationTemplate)
+@receiver(post_delete, sender=EvaluationTemplate)
+def evaluation_template_changed(sender, instance, **kwargs):
+    forget_compiled_template(instance)
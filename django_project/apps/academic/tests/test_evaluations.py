@@ -0,0 +1,77 @@
+from django.test import TestCase
+from apps.core.tests.utils import make_org
+from apps.users.models import User, Student
+from apps.academic.models import Class, Course, Schedule, Evaluation, EvaluationStat, EvaluationTemplateVersion
+
+QUESTIONS = [
+    {'title': 'rating', 'type': 'integer'},
+    {'title': 'tags', 'type': 'checkbox', 'choices': ['clear', 'fun', 'hard']},
+    {'title': 'level', 'type': 'dropdown', 'choices': ['low', 'high']},
+    {'title': 'comment', 'type': 'text'},
+]
+
+def stats(schedule, term):
+    return {
+        stat.question: (stat.count, stat.total, stat.squares, stat.minimum, stat.maximum, stat.distribution)
+        for stat in EvaluationStat.objects.filter(schedule=schedule, term=term)
+    }
+
+class SubmitTest(TestCase):
+    term = '2026-2'
+
+    def setUp(self):
+        faculty, program, _ = make_org()
+        organization = {'faculty': faculty, 'program': program}
+        _class = Class.objects.create(generation=1, name='A', **organization)
+        course = Course.objects.create(name='math', year='1', **organization)
+        self.schedule = Schedule.objects.create(course=course, _class=_class)
+        self.version = EvaluationTemplateVersion.objects.create(number=1, definition=QUESTIONS)
+        self.users = []
+        for i in range(4):
+            user = User.objects.create(first_name='s', last_name=str(i), email=f's{i}@example.com')
+            Student.objects.create(user=user, _class=_class)
+            self.users.append(user)
+
+    def submit(self, user, response):
+        return Evaluation.objects.submit(self.schedule.pk, user, self.version, response, term=self.term)
+
+    def test_submit_once(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.submit(self.users[0], [4, ['clear', 'fun'], 'high', 'good']))
+        before = stats(self.schedule, self.term)
+        self.assertEqual(before['rating'], (1, 4, 16, 4, 4, {'4': 1}))
+        self.assertEqual(before['tags'][0], 1)
+        self.assertEqual(before['tags'][-1], {'clear': 1, 'fun': 1})
+
+        # the second one changes neither the evaluation nor the stats
+        with self.assertNumQueries(1):
+            self.assertFalse(self.submit(self.users[0], [1, ['hard'], 'low', 'bad']))
+        self.assertEqual(Evaluation.objects.filter(schedule=self.schedule).count(), 1)
+        self.assertEqual(Evaluation.objects.get().response[0], 4)
+        self.assertEqual(stats(self.schedule, self.term), before)
+
+    def test_nothing_without_a_student_or_schedule(self):
+        staff = User.objects.get(email='admin@example.com')
+        self.assertFalse(self.submit(staff, [3, [], None, None]))
+        self.assertFalse(Evaluation.objects.submit(0, self.users[0], self.version, [3, [], None, None], term=self.term))
+        self.assertFalse(Evaluation.objects.exists())
+        self.assertFalse(EvaluationStat.objects.exists())
+
+    def test_stats_add_up_to_a_refresh(self):
+        responses = [
+            [4, ['clear', 'fun'], 'high', 'good'],
+            [2, ['hard'], 'low', None],
+            [None, [], 'high', 'meh'],
+            [5, ['fun', 'hard'], None, None],
+        ]
+        for user, response in zip(self.users, responses):
+            self.assertTrue(self.submit(user, response))
+        # and one more that is ignored
+        self.assertFalse(self.submit(self.users[1], [1, ['clear'], 'low', 'no']))
+        added = stats(self.schedule, self.term)
+        self.assertEqual(added['rating'], (3, 11, 45, 2, 5, {'2': 1, '4': 1, '5': 1}))
+        self.assertEqual(added['level'][0], 3)
+        self.assertEqual(added['level'][-1], {'high': 2, 'low': 1})
+
+        EvaluationStat.objects.refresh(self.term, [self.schedule.pk])
+        self.assertEqual(stats(self.schedule, self.term), added)
@@ -0,0 +1,105 @@
+import pytest
+from django.test import TestCase
+from apps.core.tests.utils import make_org
+from apps.users.models import User
+from apps.academic.models import Class, Classroom, Course, Schedule, TimeSlot
+from apps.academic.scheduling import Slot, parse_time_range, schedule_slots, find_conflicts
+
+@pytest.mark.parametrize('text, expected', [
+    ('7:00-9:30', (420, 570)),
+    ('07:00 - 09:30', (420, 570)),
+    ('7h-9h30', (420, 570)),
+    ('7.00-9.30', (420, 570)),
+    ('7-9', (420, 540)),
+    ('22:00-24:00', (1320, 1440)),
+    ('', None),
+    ('   ', None),
+    (None, None),
+])
+def test_parse_time_range(text, expected):
+    assert parse_time_range(text) == expected
+
+@pytest.mark.parametrize('text', ['9-7', '7:00-7:00', '7:60-9:00', '23-25', 'monday', '7:00', '7:0-9:00'])
+def test_parse_time_range_rejects(text):
+    with pytest.raises(ValueError):
+        parse_time_range(text)
+
+def test_schedule_slots_skip_what_cant_be_read():
+    class Day:
+        mon, tue, wed = '7-9', 'whenever', '13:00-15:00'
+        professor_id, classroom_id, _class_id = 1, 2, 3
+    assert schedule_slots(Day, ref='a') == [Slot('a', 0, 420, 540, 1, 2, 3), Slot('a', 2, 780, 900, 1, 2, 3)]
+
+def brute_force(slots, resources=('professor_id', 'classroom_id', 'class_id')):
+    return {
+        (resource, *sorted([a.ref, b.ref]))
+        for resource in resources
+        for i, a in enumerate(slots) for b in slots[i + 1:]
+        if getattr(a, resource) is not None and getattr(a, resource) == getattr(b, resource)
+        and a.weekday == b.weekday and a.ref != b.ref and a.start < b.end and b.start < a.end
+    }
+
+def test_find_conflicts():
+    slots = [
+        Slot('a', 0, 420, 540, professor_id=1, classroom_id=1, class_id=1),
+        # same professor, overlapping
+        Slot('b', 0, 480, 600, professor_id=1, classroom_id=2, class_id=2),
+        # touching isn't overlapping
+        Slot('c', 0, 540, 600, professor_id=3, classroom_id=1, class_id=3),
+        # another day
+        Slot('d', 1, 420, 540, professor_id=1, classroom_id=1, class_id=1),
+        # inside of a and b, same class as a and same classroom as b
+        Slot('e', 0, 500, 520, professor_id=None, classroom_id=2, class_id=1),
+    ]
+    found = {(resource, *sorted([a.ref, b.ref])) for resource, a, b in find_conflicts(slots)}
+    assert found == {('professor_id', 'a', 'b'), ('classroom_id', 'b', 'e'), ('class_id', 'a', 'e')}
+    assert found == brute_force(slots)
+
+def test_find_conflicts_matches_brute_force():
+    import random
+    rng = random.Random(31)
+    slots = []
+    for i in range(300):
+        start = rng.randrange(7 * 60, 18 * 60, 30)
+        slots.append(Slot(i, rng.randrange(5), start, start + rng.choice([60, 90, 120]),
+                          rng.randrange(20), rng.randrange(15), rng.choice([None, *range(10)])))
+    found = {(resource, *sorted([a.ref, b.ref])) for resource, a, b in find_conflicts(slots)}
+    assert found == brute_force(slots)
+
+class TimeSlotConflictsTest(TestCase):
+    def setUp(self):
+        faculty, program, _ = make_org()
+        organization = {'faculty': faculty, 'program': program}
+        self.course = Course.objects.create(name='math', year='1', **organization)
+        self.classes = [Class.objects.create(generation=1, name=name, **organization) for name in 'AB']
+        self.rooms = [Classroom.objects.create(name=name, **organization) for name in ['R1', 'R2']]
+        self.professors = [User.objects.create(first_name='p', last_name=str(i), email=f'p{i}@example.com') for i in range(2)]
+        self.saved = Schedule.objects.create(professor=self.professors[0], course=self.course, _class=self.classes[0],
+                                             classroom=self.rooms[0], mon='7:00-9:00', wed='13-15')
+
+    def conflicts(self, **days):
+        schedule = Schedule(course=self.course, **days)
+        return TimeSlot.objects.conflicts(schedule_slots(schedule, ref='new'))
+
+    def test_sync_parses_the_days(self):
+        slots = TimeSlot.objects.filter(schedule=self.saved).order_by('weekday')
+        self.assertEqual([(slot.weekday, str(slot.start), str(slot.end)) for slot in slots],
+                         [(0, '07:00:00', '09:00:00'), (2, '13:00:00', '15:00:00')])
+        self.assertEqual(list(TimeSlot.objects.at(0, 8 * 60).values_list('schedule', flat=True)), [self.saved.pk])
+        self.assertFalse(TimeSlot.objects.at(0, 9 * 60).exists())
+
+    def test_conflicts_with_the_saved_slots(self):
+        found = self.conflicts(professor=self.professors[0], _class=self.classes[1], classroom=self.rooms[1],
+                               mon='8:00-10:00')
+        self.assertEqual([(resource, a.ref, b.ref) for resource, a, b in found], [('professor_id', self.saved.pk, 'new')])
+
+        found = self.conflicts(professor=self.professors[1], _class=self.classes[0], classroom=self.rooms[0],
+                               wed='14-16', fri='7-9')
+        self.assertEqual(sorted(resource for resource, _, _ in found), ['class_id', 'classroom_id'])
+
+    def test_no_conflicts(self):
+        # the same resources right after, or at the same time on their own
+        self.assertEqual(self.conflicts(professor=self.professors[0], _class=self.classes[0], classroom=self.rooms[0],
+                                        mon='9:00-11:00'), [])
+        self.assertEqual(self.conflicts(professor=self.professors[1], _class=self.classes[1], classroom=self.rooms[1],
+                                        mon='7:00-9:00'), [])
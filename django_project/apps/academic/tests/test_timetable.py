@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+import time
+import pytest
+from django.test import TestCase
+from apps.core.tests.utils import make_org
+from apps.academic.models import Class, Classroom, Course, Schedule
+from apps.academic.scheduling import WEEKDAYS, Slot, schedule_slots, find_conflicts
+from apps.academic.timetable import Lesson, Problem, _Search, solve, get_problem, apply_result
+
+ROOMS = (1, 2, 3, 4)
+
+def make_problem(availability=None, busy=()):
+    # 5 professors and 6 classes share 20 lessons of two 2 hour sessions
+    lessons = [Lesson(ref, professor_id=ref % 5, class_id=ref % 6, rooms=ROOMS, lengths=(120, 120)) for ref in range(20)]
+    return Problem(lessons, (0, 1, 2, 3, 4), 7 * 60, 19 * 60, 30, availability or {}, list(busy))
+
+def check(problem, result):
+    """
+    place the result on schedules and look for the conflicts without the search
+    """
+    schedules = [
+        SimpleNamespace(pk=lesson.ref, professor_id=lesson.professor_id, _class_id=lesson.class_id, classroom_id=None,
+                        **dict.fromkeys(WEEKDAYS))
+        for lesson in problem.lessons
+    ]
+    apply_result(problem, result, schedules)
+    slots = [slot for schedule in schedules for slot in schedule_slots(schedule, ref=schedule.pk)]
+    assert list(find_conflicts(slots + problem.busy)) == []
+    for lesson, schedule in zip(problem.lessons, schedules):
+        own = schedule_slots(schedule)
+        assert sorted(slot.end - slot.start for slot in own) == sorted(lesson.lengths)
+        # every session on a day of its own
+        assert len({slot.weekday for slot in own}) == len(own)
+        assert schedule.classroom_id in lesson.rooms
+    return slots
+
+def test_search_finds_a_timetable_without_conflicts():
+    problem = make_problem()
+    result = _Search(problem, seed=1).run(time.monotonic() + 10)
+    assert result.conflicts == 0
+    check(problem, result)
+
+def test_search_keeps_to_availability_and_busy_slots():
+    # professor 0 only teaches until 15:00 from monday to wednesday, and every room is taken on friday
+    availability = {0: {weekday: [(7 * 60, 15 * 60)] for weekday in (0, 1, 2)}}
+    busy = [Slot('other', 4, 7 * 60, 19 * 60, professor_id=None, classroom_id=room, class_id=None) for room in ROOMS]
+    problem = make_problem(availability, busy)
+    result = _Search(problem, seed=2).run(time.monotonic() + 10)
+    assert result.conflicts == 0
+    slots = check(problem, result)
+    for slot in slots:
+        assert slot.weekday != 4
+        if slot.professor_id == 0:
+            assert slot.weekday in (0, 1, 2) and slot.end <= 15 * 60
+
+def test_solve():
+    problem = make_problem()
+    result = solve(problem, workers=1, time_limit=10, seed=3)
+    assert result.conflicts == 0
+    check(problem, result)
+
+def test_search_counts_conflicts_it_cant_avoid():
+    # a class with three lessons of eight hours a day on a single day
+    lessons = [Lesson(ref, None, 1, (1,), (8 * 60,)) for ref in range(3)]
+    problem = Problem(lessons, (0,), 7 * 60, 19 * 60, 30, {}, [])
+    result = _Search(problem, seed=4).run(time.monotonic() + 0.2)
+    assert result.conflicts > 0
+
+def test_no_time_left():
+    problem = make_problem(availability={0: {0: [(7 * 60, 8 * 60)]}})
+    with pytest.raises(ValueError):
+        _Search(problem, seed=5)
+
+def test_apply_result_keeps_the_classroom_without_rooms():
+    problem = Problem([Lesson(1, None, 1, (), (60,)), Lesson(2, None, 2, (), (60,))], (0,), 7 * 60, 19 * 60, 30, {}, [])
+    result = _Search(problem, seed=6).run(time.monotonic() + 1)
+    schedules = [SimpleNamespace(pk=1, classroom_id=7, **dict.fromkeys(WEEKDAYS)),
+                 SimpleNamespace(pk=2, classroom_id=None, **dict.fromkeys(WEEKDAYS))]
+    apply_result(problem, result, schedules)
+    assert [schedule.classroom_id for schedule in schedules] == [7, None]
+    assert all(schedule.mon for schedule in schedules)
+
+class GetProblemTest(TestCase):
+    def setUp(self):
+        faculty, self.program, _ = make_org()
+        self.organization = {'faculty': faculty, 'program': self.program}
+        course = Course.objects.create(name='math', year='1', **self.organization)
+        self.room = Classroom.objects.create(name='R1', **self.organization)
+        self.placed = Schedule.objects.create(course=course, _class=Class.objects.create(generation=1, name='A', **self.organization),
+                                              classroom=self.room)
+        self.unplaced = Schedule.objects.create(course=course, _class=Class.objects.create(generation=1, name='B', **self.organization))
+
+    def test_without_classrooms_the_schedules_keep_theirs(self):
+        problem = get_problem([self.placed, self.unplaced], Classroom.objects.none())
+        self.assertEqual([lesson.rooms for lesson in problem.lessons], [(self.room.pk,), ()])
+        result = _Search(problem, seed=7).run(time.monotonic() + 1)
+        self.assertEqual([s.classroom_id for s in apply_result(problem, result, [self.placed, self.unplaced])],
+                         [self.room.pk, None])
+
+    def test_classrooms_to_pick_from(self):
+        other = Classroom.objects.create(name='R2', **self.organization)
+        problem = get_problem([self.placed, self.unplaced], Classroom.objects.filter(program=self.program))
+        self.assertEqual([set(lesson.rooms) for lesson in problem.lessons], [{self.room.pk, other.pk}] * 2)
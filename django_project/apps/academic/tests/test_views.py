@@ -0,0 +1,26 @@
+from django.test import TestCase
+from apps.core.tests.utils import make_org, make_session, make_request
+from apps.users.models import User
+from apps.academic.models import Class, Classroom, Course, Schedule
+from apps.academic.views import ScheduleListView
+
+class ScheduleListTest(TestCase):
+    def setUp(self):
+        self.faculty, self.program, self.admin = make_org()
+        organization = {'faculty': self.faculty, 'program': self.program}
+        professor = User.objects.create(first_name='ada', last_name='lovelace', email='ada@example.com')
+        Schedule.objects.create(
+            professor=professor, course=Course.objects.create(name='math', year='3', **organization),
+            _class=Class.objects.create(generation=1, name='A', **organization),
+            classroom=Classroom.objects.create(name='R1', **organization), mon='7-9',
+        )
+
+    def test_columns(self):
+        request = make_request('get', self.admin, make_session(self.faculty, self.program))
+        response = ScheduleListView.as_view()(request)
+        response.render()
+        for field in ['professor', 'course', 'course.year', '_class', 'classroom']:
+            self.assertContains(response, f'<th>{field}</th>', html=True)
+        row = response.content.decode().split('<tbody', 1)[1]
+        for value in ['math', 'R1']:
+            self.assertIn(value, row)
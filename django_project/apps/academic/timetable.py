@@ -0,0 +1,311 @@
+import os
+import time
+import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple, Any
+from .scheduling import WEEKDAYS, schedule_slots, format_minutes
+
+class Lesson(NamedTuple):
+    """
+    A schedule to place: who teaches which class, the classrooms it may use and the minutes of each weekly session
+    """
+    ref: Any
+    professor_id: Any
+    class_id: Any
+    rooms: tuple
+    lengths: tuple
+
+class Problem(NamedTuple):
+    """
+    Everything the search needs, plain data so that it can be sent to the worker processes.
+    availability is {professor_id: {weekday: [(start, end)]}}, professors that aren't in it can teach any time.
+    busy are the Slots taken by schedules that aren't part of the problem
+    """
+    lessons: list
+    weekdays: tuple
+    day_start: int
+    day_end: int
+    step: int
+    availability: dict
+    busy: list
+
+class Result(NamedTuple):
+    conflicts: int
+    # (weekday, start) of every session, in the order of the lessons
+    sessions: list
+    rooms: list
+
+class _Search:
+    """
+    Min-conflicts local search with a tabu list and a bit of random walk.
+    the day is cut in cells of `step` minutes and every professor, class and room counts how many sessions
+    sit on each of its cells, so the cost of a move is a few additions
+    """
+    noise = 0.05
+    room_moves = 0.2
+    tenure = 10
+
+    def __init__(self, problem, seed):
+        self.problem = problem
+        self.rng = random.Random(seed)
+        self.cells = (problem.day_end - problem.day_start) // problem.step
+        self.occupancy = {}
+
+        # session: (lesson, cells it spans, its possible (day, cell) starts)
+        self.sessions = []
+        for index, lesson in enumerate(problem.lessons):
+            for length in lesson.lengths:
+                span = -(-length // problem.step)
+                domain = self.get_domain(lesson, span)
+                if not domain:
+                    raise ValueError(f'{lesson.ref} has no time left for a session of {length} minutes')
+                self.sessions.append((index, span, domain))
+        self.lesson_sessions = [[] for _ in problem.lessons]
+        for s, (index, _, _) in enumerate(self.sessions):
+            self.lesson_sessions[index].append(s)
+        # how many sessions of a lesson are on each day, there should be one at most
+        self.lesson_days = [[0] * len(problem.weekdays) for _ in problem.lessons]
+        self.positions = [None] * len(self.sessions)
+        self.rooms = [self.rng.choice(lesson.rooms) if lesson.rooms else None for lesson in problem.lessons]
+
+        for slot in problem.busy:
+            if slot.weekday not in problem.weekdays:
+                continue
+            day = problem.weekdays.index(slot.weekday)
+            first = max(0, (slot.start - problem.day_start) // problem.step)
+            last = min(self.cells, -(-(slot.end - problem.day_start) // problem.step))
+            for key in (('p', slot.professor_id), ('c', slot.class_id), ('r', slot.classroom_id)):
+                if key[1] is not None:
+                    row = self.get_row(key, day)
+                    for cell in range(first, last):
+                        row[cell] += 1
+
+    def get_domain(self, lesson, span):
+        problem = self.problem
+        windows = problem.availability.get(lesson.professor_id)
+        domain = []
+        for day, weekday in enumerate(problem.weekdays):
+            for cell in range(self.cells - span + 1):
+                start = problem.day_start + cell * problem.step
+                end = start + span * problem.step
+                if windows is None or any(a <= start and end <= b for a, b in windows.get(weekday, [])):
+                    domain.append((day, cell))
+        return domain
+
+    def get_row(self, key, day):
+        if key not in self.occupancy:
+            self.occupancy[key] = [[0] * self.cells for _ in self.problem.weekdays]
+        return self.occupancy[key][day]
+
+    def keys(self, s):
+        index = self.sessions[s][0]
+        lesson, room = self.problem.lessons[index], self.rooms[index]
+        keys = [('c', lesson.class_id)]
+        if lesson.professor_id is not None:
+            keys.append(('p', lesson.professor_id))
+        if room is not None:
+            keys.append(('r', room))
+        return keys
+
+    def move(self, s, position, sign):
+        index, span, _ = self.sessions[s]
+        day, cell = position
+        for key in self.keys(s):
+            row = self.get_row(key, day)
+            for i in range(cell, cell + span):
+                row[i] += sign
+        self.lesson_days[index][day] += sign
+
+    def place(self, s, position):
+        self.positions[s] = position
+        self.move(s, position, 1)
+
+    def unplace(self, s):
+        self.move(s, self.positions[s], -1)
+        self.positions[s] = None
+
+    def cost_at(self, s, position):
+        """
+        cost of an unplaced session at that position
+        """
+        index, span, _ = self.sessions[s]
+        day, cell = position
+        cost = self.lesson_days[index][day] * span
+        for key in self.keys(s):
+            row = self.get_row(key, day)
+            for i in range(cell, cell + span):
+                cost += row[i]
+        return cost
+
+    def cost(self, s):
+        """
+        cost of a placed session, without counting itself
+        """
+        index, span, _ = self.sessions[s]
+        keys = self.keys(s)
+        return self.cost_at(s, self.positions[s]) - span * (len(keys) + 1)
+
+    def best_position(self, s, iteration, tabu):
+        _, _, domain = self.sessions[s]
+        if self.rng.random() < self.noise:
+            return self.rng.choice(domain)
+        best, best_cost = [], None
+        for position in domain:
+            cost = self.cost_at(s, position)
+            if cost and tabu.get((s, position), -1) > iteration:
+                continue
+            if best_cost is None or cost < best_cost:
+                best, best_cost = [position], cost
+            elif cost == best_cost:
+                best.append(position)
+        return self.rng.choice(best) if best else self.rng.choice(domain)
+
+    def move_room(self, index):
+        lesson = self.problem.lessons[index]
+        sessions = self.lesson_sessions[index]
+        for s in sessions:
+            self.move_in_room(s, -1)
+        best, best_cost = [], None
+        for room in lesson.rooms:
+            cost = 0
+            for s in sessions:
+                _, span, _ = self.sessions[s]
+                day, cell = self.positions[s]
+                row = self.get_row(('r', room), day)
+                cost += sum(row[cell:cell + span])
+            if best_cost is None or cost < best_cost:
+                best, best_cost = [room], cost
+            elif cost == best_cost:
+                best.append(room)
+        self.rooms[index] = self.rng.choice(best)
+        for s in sessions:
+            self.move_in_room(s, 1)
+
+    def move_in_room(self, s, sign):
+        index, span, _ = self.sessions[s]
+        day, cell = self.positions[s]
+        row = self.get_row(('r', self.rooms[index]), day)
+        for i in range(cell, cell + span):
+            row[i] += sign
+
+    def run(self, deadline, stop=None):
+        order = list(range(len(self.sessions)))
+        self.rng.shuffle(order)
+        for s in order:
+            self.place(s, self.best_position(s, 0, {}))
+
+        best = None
+        tabu = {}
+        candidates = []
+        iteration = 0
+        while time.monotonic() < deadline and not (stop and stop.is_set()):
+            if not candidates:
+                costs = [self.cost(s) for s in range(len(self.sessions))]
+                total = sum(costs)
+                if best is None or total < best.conflicts:
+                    best = Result(total, list(self.positions), list(self.rooms))
+                if not total:
+                    break
+                candidates = [s for s, cost in enumerate(costs) if cost]
+                self.rng.shuffle(candidates)
+
+            s = candidates.pop()
+            if not self.cost(s):
+                continue
+            iteration += 1
+            index = self.sessions[s][0]
+            if len(self.problem.lessons[index].rooms) > 1 and self.rng.random() < self.room_moves:
+                self.move_room(index)
+            else:
+                tabu[(s, self.positions[s])] = iteration + self.tenure
+                self.unplace(s)
+                self.place(s, self.best_position(s, iteration, tabu))
+
+        if best is None or best.conflicts:
+            total = sum(self.cost(s) for s in range(len(self.sessions)))
+            if best is None or total < best.conflicts:
+                best = Result(total, list(self.positions), list(self.rooms))
+        return best
+
+_stop = None
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+def _search(problem, seed, time_limit):
+    return _Search(problem, seed).run(time.monotonic() + time_limit, _stop)
+
+def solve(problem, workers=None, time_limit=50, seed=None):
+    """
+    Run an independent search with its own seed on every core, they all stop as soon as one of them
+    finds a timetable without conflicts, otherwise the one with the least conflicts wins
+    """
+    # fail here rather than in every worker
+    _Search(problem, seed)
+    workers = workers or os.cpu_count() or 1
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    stop = multiprocessing.Event()
+    best = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stop,)) as executor:
+        futures = [executor.submit(_search, problem, seed + i, time_limit) for i in range(workers)]
+        for future in as_completed(futures):
+            result = future.result()
+            if best is None or result.conflicts < best.conflicts:
+                best = result
+            if not best.conflicts:
+                stop.set()
+    return best
+
+def get_problem(schedules, classrooms, weekdays=(0, 1, 2, 3, 4), day_start=7 * 60, day_end=19 * 60, step=30,
+                sessions=2, duration=120):
+    """
+    Build the problem of placing these schedules in these classrooms.
+    a schedule keeps the number and length of the sessions it has, the ones without any get `sessions` of `duration`.
+    the professors, classes and classrooms stay booked wherever other schedules use them
+    """
+    from django.db.models import Q
+    from .models import TimeSlot, ProfessorAvailability
+
+    schedules = list(schedules)
+    rooms = tuple(classrooms.values_list('pk', flat=True))
+    lessons = [
+        Lesson(
+            # without classrooms to pick from a schedule stays in its own, if it has one
+            schedule.pk, schedule.professor_id, schedule._class_id,
+            rooms or ((schedule.classroom_id,) if schedule.classroom_id else ()),
+            tuple(slot.end - slot.start for slot in schedule_slots(schedule)) or (duration,) * sessions,
+        )
+        for schedule in schedules
+    ]
+    professors = {lesson.professor_id for lesson in lessons if lesson.professor_id}
+    availability = {}
+    for professor, weekday, start, end in ProfessorAvailability.objects.filter(professor__in=professors) \
+            .values_list('professor_id', 'weekday', 'start', 'end'):
+        availability.setdefault(professor, {}).setdefault(weekday, []) \
+            .append((start.hour * 60 + start.minute, end.hour * 60 + end.minute))
+    busy = TimeSlot.objects.exclude(schedule__in=[schedule.pk for schedule in schedules]).filter(
+        Q(schedule__professor__in=professors) | Q(schedule__classroom__in={room for lesson in lessons for room in lesson.rooms})
+        | Q(schedule___class__in={lesson.class_id for lesson in lessons})
+    ).as_slots()
+    return Problem(lessons, tuple(weekdays), day_start, day_end, step, availability, busy)
+
+def apply_result(problem, result, schedules):
+    """
+    Write the days and classroom of every schedule out of the result, without saving them.
+    a schedule the search had no classroom for keeps the one it has
+    """
+    schedules = {schedule.pk: schedule for schedule in schedules}
+    positions = iter(result.sessions)
+    for lesson, room in zip(problem.lessons, result.rooms):
+        schedule = schedules[lesson.ref]
+        for day in WEEKDAYS:
+            setattr(schedule, day, None)
+        for length in lesson.lengths:
+            day, cell = next(positions)
+            start = problem.day_start + cell * problem.step
+            setattr(schedule, WEEKDAYS[problem.weekdays[day]], f'{format_minutes(start)}-{format_minutes(start + length)}')
+        if room is not None:
+            schedule.classroom_id = room
+    return list(schedules.values())
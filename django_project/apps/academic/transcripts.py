@@ -0,0 +1,151 @@
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# A4 in points
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+LINES_PER_PAGE = 60
+
+def get_transcripts(generation, classes):
+    """
+    Gather everything the transcripts of a generation need in a handful of queries.
+    they are returned as plain dicts so that they can be sent to the worker processes
+    """
+    from apps.users.models import Student
+    from .models import Score
+
+    students = Student.objects.get_queryset(request=None) \
+        .filter(_class__in=classes.filter(generation=generation)) \
+        .select_related('user', '_class') \
+        .order_by('_class__name', 'user__last_name', 'user__first_name')
+    transcripts = {
+        student.pk: {
+            'id': student.pk,
+            'name': str(student),
+            'email': student.user.email,
+            'class': str(student._class),
+            'scores': [],
+        }
+        for student in students
+    }
+    scores = Score.objects.filter(student__in=students) \
+        .order_by('course__year', 'course__name') \
+        .values_list('student_id', 'course__year', 'course__name', 'score')
+    for student_id, year, course, score in scores:
+        transcripts[student_id]['scores'].append((year, course, score))
+    return list(transcripts.values())
+
+def _safe(name):
+    return re.sub(r'[^\w.-]+', '_', name).strip('_')
+
+def transcript_filename(transcript):
+    return f"{_safe(transcript['class'])}/{_safe(transcript['name'])}_{transcript['id']}.pdf"
+
+def transcript_lines(transcript):
+    lines = [
+        'TRANSCRIPT',
+        '',
+        f"Name:  {transcript['name']}",
+        f"Email: {transcript['email']}",
+        f"Class: {transcript['class']}",
+        '',
+        f"{'Year':<6}{'Course':<50}{'Score':>6}",
+        '-' * 62,
+    ]
+    years = {}
+    for year, course, score in transcript['scores']:
+        lines.append(f"{year:<6}{course[:48]:<50}{score:>6}")
+        years.setdefault(year, []).append(score)
+    lines.append('-' * 62)
+    for year, scores in years.items():
+        lines.append(f"Year {year} average: {sum(scores) / len(scores):.2f}")
+    all_scores = [score for scores in years.values() for score in scores]
+    if all_scores:
+        lines.append(f"Overall average: {sum(all_scores) / len(all_scores):.2f}")
+    return lines
+
+def _escape(line):
+    # the standard fonts only know latin-1, anything else becomes a ?
+    line = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return line.encode('latin-1', 'replace')
+
+def build_pdf(lines):
+    """
+    Write a plain text PDF with the builtin Courier font, so no pdf library is needed
+    """
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    # 1: catalog, 2: page tree, 3: font, then a page and its content for every page
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>',
+    ]
+    kids = []
+    for page in pages:
+        content = b'BT /F1 10 Tf 12 TL 50 800 Td ' + b''.join(b'(' + _escape(line) + b') Tj T* ' for line in page) + b'ET'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, obj)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+def render_transcript(transcript):
+    return build_pdf(transcript_lines(transcript))
+
+def render_transcripts(transcripts, workers=1):
+    """
+    Yield (filename, pdf) for every transcript, rendered one after the other or in a pool of `workers` processes.
+    a web worker renders them one at a time as the zip streams out, only the command takes all the cores
+    """
+    if workers <= 1:
+        for transcript in transcripts:
+            yield transcript_filename(transcript), render_transcript(transcript)
+        return
+    chunksize = max(1, len(transcripts) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pdfs = executor.map(render_transcript, transcripts, chunksize=chunksize)
+        for transcript, pdf in zip(transcripts, pdfs):
+            yield transcript_filename(transcript), pdf
+
+class _ZipBuffer:
+    """
+    write-only buffer so that zipfile can stream into a response
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_zip(files):
+    """
+    Yield the bytes of a zip archive of (filename, data) as the files come in
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, data in files:
+            archive.writestr(filename, data)
+            yield buffer.pop()
+    yield buffer.pop()
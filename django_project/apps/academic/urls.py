@@ -9,6 +9,8 @@ urlpatterns = [
     path('classrooms/create/', views.ClassroomCreateView.as_view(), name='add_classroom'),
     path('classrooms/change/<int:pk>/', views.ClassroomUpdateView.as_view(), name='change_classroom'),
     path('classrooms/delete/<int:pk>/', views.ClassroomDeleteView.as_view(), name='delete_classroom'),
+    path('classrooms/usage/', views.ClassroomUsageView.as_view(), name='classroom_usage'),
+    path('classrooms/calendar/<int:pk>/', views.ClassroomCalendarView.as_view(), name='calendar_classroom'),
     # course
     path('courses/', views.CourseListView.as_view(), name='view_course'),
     path('courses/create/', views.CourseCreateView.as_view(), name='add_course'),
@@ -19,13 +21,24 @@ urlpatterns = [
     path('classes/create/', views.ClassCreateView.as_view(), name='add_class'),
     path('classes/change/<int:pk>/', views.ClassUpdateView.as_view(), name='change_class'),
     path('classes/delete/<int:pk>/', views.ClassDeleteView.as_view(), name='delete_class'),
+    path('classes/calendar/<int:pk>/', views.ClassCalendarView.as_view(), name='calendar_class'),
     # schedule
     path('schedules/', views.ScheduleListView.as_view(), name='view_schedule'),
+    path('schedules/import/', views.ScheduleImportView.as_view(), name='import_schedule'),
+    path('schedules/calendar/', views.ProfessorCalendarView.as_view(), name='calendar_professor'),
+    path('schedules/classroom/', views.ScheduleClassroomView.as_view(), name='assign_classroom'),
+    path('schedules/delete/', views.ScheduleSelectedDeleteView.as_view(), name='delete_selected_schedule'),
+    path('calendars/<str:token>.ics', views.CalendarFeedView.as_view(), name='calendar_feed'),
     # score
     path('scores/<int:student_pk>', views.ScoreStudentListView.as_view(), name='view_score'),
     path('scores/add/<int:schedule_pk>/', views.ScoreScheduleCreateView.as_view(), name='add_score'),
+    path('scores/class/<int:class_pk>/', views.ScoreClassGridView.as_view(), name='grade_class'),
+    path('scores/class/<int:class_pk>/ranking/', views.ScoreClassRankingView.as_view(), name='rank_class'),
+    path('transcripts/', views.TranscriptView.as_view(), name='generate_transcript'),
     # evaluation
     path('evaluations/', views.EvaluationListView.as_view(), name='view_evaluation'),
     path('evaluations/add/<int:schedule_pk>/', views.EvaluationCreateView.as_view(), name='add_evaluation'),
-    path('evaluations/delete/', views.EvaluationBulkDeleteView.as_view(), name='delete_evaluation')
+    path('evaluations/analytics/', views.EvaluationAnalyticsView.as_view(), name='evaluation_analytics'),
+    path('evaluations/delete/', views.EvaluationBulkDeleteView.as_view(), name='delete_evaluation'),
+    path('evaluations/delete/selected/', views.EvaluationSelectedDeleteView.as_view(), name='delete_selected_evaluation'),
 ]
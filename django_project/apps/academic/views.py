@@ -1,20 +1,41 @@
-from django.urls import reverse_lazy
+import json
+import hashlib
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse, reverse_lazy
+from django import forms
+from django.http import HttpResponse, HttpResponseRedirect, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.forms.models import modelform_factory
-from django.views.generic import FormView
-from django_jsonform.widgets import JSONFormWidget
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.decorators import method_decorator
+from django.contrib import messages
+from django.views.generic import FormView, View
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from extra_views import InlineFormSetView
-from apps.core.generic_views import BaseListView, BaseCreateView, BaseUpdateView, BaseDeleteView, BaseBulkDeleteView, BaseWriteView
-from apps.core.forms import json_to_schema
-from .models import Course, Class, Schedule, Score, Evaluation, EvaluationTemplate, Classroom
-from .forms import create_score_form_class, ScheduleForm
+from apps.core.generic_views import BaseListView, BaseCreateView, BaseUpdateView, BaseDeleteView, BaseBulkDeleteView, BaseWriteView, BaseImportView, BaseSelectedDeleteView, BaseSelectedUpdateView, ReadOnlyViewMixin
+from apps.core.forms import compile_template, ResponseSearchForm
+from apps.users.models import User
+from apps.core.terms import current_term
+from .models import Course, Class, Schedule, Score, Evaluation, EvaluationTemplate, EvaluationStat, Classroom, StudentScoreSummary, TimeSlot
+from .forms import create_score_form_class, ScheduleForm, ScheduleFormSet, ScheduleImportForm, ScheduleImportFormSet, FreeClassroomForm, EvaluationAnalyticsForm
+from .transcripts import get_transcripts, render_transcripts, stream_zip
+from .scheduling import WEEKDAYS, RESOURCES, Slot, parse_time_range, format_minutes
+from .cache import get_schedule_version, bump_schedule_version, feed_etags
+from .ical import Event, render_calendar
 
 class ClassroomListView(BaseListView):
     model = Classroom
     table_fields = ['name']
     object_actions = [('✏️', 'academic:change_classroom', None), 
-    ('❌', 'academic:delete_classroom', None)]
-    actions = [('+', 'academic:add_classroom', None)]
+    ('❌', 'academic:delete_classroom', None),
+    ('📅', 'academic:calendar_classroom', 'view_classroom')]
+    actions = [('+', 'academic:add_classroom', None),
+    ('usage', 'academic:classroom_usage', None)]
 
 class ClassroomCreateView(BaseCreateView):
     model = Classroom
@@ -25,6 +46,73 @@ class ClassroomUpdateView(BaseUpdateView):
 class ClassroomDeleteView(BaseDeleteView):
     model = Classroom
 
+class ClassroomUsageView(BaseWriteView, View):
+    """
+    The classrooms that are free on a weekday between two times and the weekly usage of every classroom,
+    both computed from the time slots and cached until the schedules or classrooms change
+    """
+    model = Classroom
+    permission_required = [('view', 'classroom')]
+    template_name = 'academic/classroom_usage.html'
+    cache_timeout = 60 * 60
+    # the heatmap always shows at least these hours
+    default_hours = range(7, 19)
+
+    def get_cache_key(self, *parts):
+        s = self.request.session
+        if any(perm in s['permissions'] for perm in ['access_global', 'access_faculty_wide', 'access_program_wide']):
+            scope = f"{s.get('selected_faculty')}:{s.get('selected_program')}"
+        else:
+            # the classrooms depend on the user then
+            scope = f'user{self.request.user.pk}'
+        return ':'.join(['classroom_usage', scope, str(get_schedule_version()), *map(str, parts)])
+
+    def get_free_classrooms(self, weekday, start, end):
+        busy = TimeSlot.objects.overlapping([Slot(None, weekday, start, end)]).filter(schedule__classroom=OuterRef('pk'))
+        return list(self.get_queryset().exclude(Exists(busy)).order_by('name').values_list('name', flat=True))
+
+    def get_heatmap(self):
+        classrooms = list(self.get_queryset().order_by('name').values_list('pk', 'name'))
+        usage = TimeSlot.objects.filter(schedule__classroom__in=[pk for pk, _ in classrooms]).hourly_usage()
+        used_hours = {hour for _, _, hour in usage}
+        hours = list(range(min(used_hours | {self.default_hours[0]}), max(used_hours | {self.default_hours[-1]}) + 1))
+        # sunday only when something happens on it
+        weekdays = range(7 if any(weekday == 6 for _, weekday, _ in usage) else 6)
+
+        rows = []
+        for pk, name in classrooms:
+            busy = sum(minutes for (classroom, _, _), minutes in usage.items() if classroom == pk)
+            rows.append({
+                'name': name,
+                'busy_hours': round(busy / 60, 1),
+                'percent': round(busy * 100 / (len(weekdays) * len(hours) * 60)),
+                'days': [
+                    (WEEKDAYS[weekday], [f'{usage.get((pk, weekday, hour), 0) / 60:.2f}' for hour in hours])
+                    for weekday in weekdays
+                ],
+            })
+        return {'hours': hours, 'classrooms': rows}
+
+    def get(self, request, *args, **kwargs):
+        form = FreeClassroomForm(request.GET or None)
+        free = None
+        if form.is_bound and form.is_valid():
+            weekday, start, end = (form.cleaned_data[key] for key in ['weekday', 'start', 'end'])
+            start, end = start.hour * 60 + start.minute, end.hour * 60 + end.minute
+            free = cache.get_or_set(
+                self.get_cache_key('free', weekday, start, end),
+                lambda: self.get_free_classrooms(weekday, start, end),
+                self.cache_timeout,
+            )
+        heatmap = cache.get_or_set(self.get_cache_key('heatmap'), self.get_heatmap, self.cache_timeout)
+        return render(request, self.template_name, {
+            'title': 'classroom usage',
+            'form': form,
+            'free': free,
+            'heatmap': heatmap,
+            'cancel_url': self.get_success_url(),
+        })
+
 class CourseListView(BaseListView):
     model = Course
     table_fields = ['name', 'year']
@@ -45,7 +133,169 @@ class ScheduleListView(BaseListView):
     model = Schedule
     object_actions = [('score', 'academic:add_score', None),
                ('evaluation', 'academic:add_evaluation', None)]
+    actions = [('my calendar', 'academic:calendar_professor', 'view_schedule'),
+               ('import', 'academic:import_schedule', 'add_schedule')]
     table_fields = ['professor', 'course', 'course.year', '_class', 'classroom']
+    selection_actions = [('assign classroom to', 'academic:assign_classroom', 'change_schedule'),
+                         ('delete', 'academic:delete_selected_schedule', 'delete_schedule')]
+
+class ScheduleClassroomView(BaseSelectedUpdateView):
+    """
+    Put the selected schedules in one classroom, unless that double books it
+    """
+    model = Schedule
+    fields = ['classroom']
+    verb = 'assign a classroom to'
+    done = 'assigned'
+
+    def validate_selection(self, selected, form):
+        classroom = form.cleaned_data.get('classroom')
+        if classroom is None:
+            return
+        # the selected schedules can clash with each other once they are in the same classroom too
+        slots = [slot._replace(classroom_id=classroom.pk) for slot in TimeSlot.objects.filter(schedule__in=selected).as_slots()]
+        conflicts = [
+            (a, b) for resource, a, b in TimeSlot.objects.exclude(schedule__in=selected).conflicts(slots)
+            if resource == 'classroom_id'
+        ]
+        schedules = Schedule.objects.get_queryset(request=None).select_related('professor', 'course', '_class') \
+            .in_bulk({slot.ref for pair in conflicts for slot in pair})
+        for a, b in conflicts:
+            form.add_error('classroom', f"{schedules[a.ref]} and {schedules[b.ref]} would both be in it on {WEEKDAYS[a.weekday]} "
+                                        f"{format_minutes(max(a.start, b.start))}-{format_minutes(min(a.end, b.end))}")
+
+    def perform(self, selected, form):
+        assigned = super().perform(selected, form)
+        # the update doesn't send the signals
+        bump_schedule_version()
+        return assigned
+
+class ScheduleSelectedDeleteView(BaseSelectedDeleteView):
+    model = Schedule
+
+class ScheduleImportView(BaseImportView):
+    """
+    Import a timetable, a row that names the same professor, course and class as an existing schedule updates it
+    """
+    model = Schedule
+    form_class = ScheduleImportForm
+    import_formset_class = ScheduleImportFormSet
+    flat_fields = ['generation', 'class_name', 'course', 'year', 'classroom', 'professor', *WEEKDAYS]
+
+    def save_import(self, new_forms, changed):
+        schedules = [
+            Schedule(**{field: form.cleaned_data[field] for field in ['professor', 'course', '_class', 'classroom', *WEEKDAYS]})
+            for form in new_forms
+        ]
+        Schedule.objects.get_queryset(request=None).bulk_create(
+            schedules, batch_size=1000, update_conflicts=True,
+            unique_fields=['professor', 'course', '_class'], update_fields=['classroom', *WEEKDAYS],
+        )
+        TimeSlot.objects.sync(schedules)
+        # the bulk writes don't send the signals
+        bump_schedule_version()
+
+CALENDAR_FILTERS = {'professor': 'schedule__professor', 'class': 'schedule___class', 'classroom': 'schedule__classroom'}
+CALENDAR_MODELS = {'professor': User, 'class': Class, 'classroom': Classroom}
+
+class CalendarLinkView(BaseWriteView, View):
+    """
+    The link to subscribe to the calendar of a professor, class or classroom.
+    without a pk it's the calendar of the user
+    """
+    kind = None
+    permission_required = [('view', None)]
+    template_name = 'academic/calendar_link.html'
+
+    def get(self, request, pk=None):
+        # the RLS filter of some models joins to many rows
+        obj = request.user if pk is None else get_object_or_404(self.get_queryset().distinct(), pk=pk)
+        token = signing.dumps([self.kind, obj.pk], salt=CalendarFeedView.salt)
+        url = request.build_absolute_uri(reverse('academic:calendar_feed', args=[token]))
+        return render(request, self.template_name, {
+            'title': f'calendar of {obj}',
+            'url': url,
+            'webcal_url': 'webcal://' + url.split('://', 1)[1],
+            'cancel_url': self.get_success_url(),
+        })
+
+class ClassCalendarView(CalendarLinkView):
+    model = Class
+    kind = 'class'
+
+class ClassroomCalendarView(CalendarLinkView):
+    model = Classroom
+    kind = 'classroom'
+
+class ProfessorCalendarView(CalendarLinkView):
+    """
+    the calendar of the professor that is logged in
+    """
+    model = Schedule
+    kind = 'professor'
+
+# a 304 shouldn't even open a transaction
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
+class CalendarFeedView(View):
+    """
+    iCalendar feed of a professor, class or classroom for whoever has the signed link.
+    it's rendered once per schedule version, after that polling clients are answered out of the cache,
+    and the ones that still have it out of the etags this process remembers
+    """
+    salt = 'academic.calendar'
+    cache_timeout = 60 * 60 * 24
+
+    def get_feed(self, kind, pk):
+        obj = CALENDAR_MODELS[kind].objects.get_queryset(request=None).filter(pk=pk).first()
+        if obj is None:
+            raise Http404
+        slots = TimeSlot.objects.filter(**{CALENDAR_FILTERS[kind]: pk}) \
+            .select_related('schedule__course', 'schedule__classroom', 'schedule___class', 'schedule__professor') \
+            .order_by('weekday', 'start')
+        events = [
+            Event(
+                f'{slot.schedule_id}-{slot.weekday}@academic', slot.weekday, slot.start, slot.end,
+                str(slot.schedule.course), str(slot.schedule.classroom or ''),
+                f'{slot.schedule.professor or ""} - {slot.schedule._class}',
+            )
+            for slot in slots
+        ]
+        # out of the events and not the body, which has the time it was rendered at
+        etag = '"%s"' % hashlib.md5(repr((str(obj), events)).encode()).hexdigest()
+        return {
+            'body': render_calendar(str(obj), events, settings.TIME_ZONE),
+            'etag': etag,
+            'last_modified': int(timezone.now().timestamp()),
+        }
+
+    def get(self, request, token):
+        try:
+            kind, pk = signing.loads(token, salt=self.salt)
+        except signing.BadSignature:
+            raise Http404
+        known = feed_etags.get(f'{kind}:{pk}')
+        if known is not None:
+            response = get_conditional_response(request, etag=known['etag'], last_modified=known['last_modified'])
+            if response is not None:
+                return self.set_validators(response, known)
+
+        key = f'academic:ics:{kind}:{pk}:{get_schedule_version()}'
+        feed = cache.get(key)
+        if feed is None:
+            feed = self.get_feed(kind, pk)
+            cache.set(key, feed, self.cache_timeout)
+        feed_etags.set(f'{kind}:{pk}', {'etag': feed['etag'], 'last_modified': feed['last_modified']})
+
+        response = get_conditional_response(request, etag=feed['etag'], last_modified=feed['last_modified'])
+        if response is None:
+            response = HttpResponse(feed['body'], content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="{kind}_{pk}.ics"'
+        return self.set_validators(response, feed)
+
+    def set_validators(self, response, feed):
+        response['ETag'] = feed['etag']
+        response['Last-Modified'] = http_date(feed['last_modified'])
+        return response
 
 class ScoreStudentListView(BaseListView):
     model = Score
@@ -54,6 +304,29 @@ class ScoreStudentListView(BaseListView):
     def get_queryset(self):
         return Score.objects.filter(student_id=self.kwargs['student_pk']).select_related('course')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        summaries = StudentScoreSummary.objects.filter(student_id=self.kwargs['student_pk']).order_by('year')
+        context['object_dict'] = {
+            f'year {summary.year}': f'average {summary.mean} over {summary.count} courses, '
+                                    f'rank {summary.rank} ({summary.percentile} percentile)'
+            for summary in summaries
+        }
+        return context
+
+class ScoreClassRankingView(BaseListView):
+    """
+    Ranking of a class read from the score summaries, open to whoever may see the scores
+    """
+    model = StudentScoreSummary
+    permission_model = Score
+    table_fields = ['student', 'year', 'count', 'mean', 'rank', 'percentile']
+
+    def get_queryset(self):
+        classes = Class.objects.get_queryset(request=self.request)
+        return StudentScoreSummary.objects.filter(_class=self.kwargs['class_pk'], _class__in=classes) \
+            .select_related('student__user').order_by('year', 'rank')
+
 class ScoreScheduleCreateView(BaseWriteView, FormView):
     """
     View for bulk creating/updating scores for all students in a class.
@@ -71,50 +344,193 @@ class ScoreScheduleCreateView(BaseWriteView, FormView):
         form.save()
         return super().form_valid(form)
 
+class ScoreClassGridView(BaseWriteView, View):
+    """
+    Gradebook for a whole class: its students x the courses scheduled for it.
+    the page autosaves by posting only the changed cells as json, which get upserted in one batch
+    """
+    model = Score
+    permission_required = [('add', 'score')]
+    template_name = 'academic/score_grid.html'
+
+    def get_class(self):
+        classes = Class.objects.get_queryset(request=self.request).distinct()
+        return get_object_or_404(classes, pk=self.kwargs['class_pk'])
+
+    def get_courses(self, _class):
+        # only the courses of the schedules one can see, so a professor gets their own courses
+        schedules = Schedule.objects.get_queryset(request=self.request).filter(_class=_class)
+        return Course.objects.get_queryset(request=None).filter(schedule__in=schedules).distinct()
+
+    def get(self, request, *args, **kwargs):
+        _class = self.get_class()
+        courses = self.get_courses(_class).order_by('year', 'name')
+        students = _class.students.select_related('user').order_by('user__last_name', 'user__first_name')
+        scores = Score.objects.filter(student__in=students, course__in=courses).values_list('student_id', 'course_id', 'score')
+        grid = {
+            'students': [[student.id, str(student)] for student in students],
+            'courses': [[course.id, f'{course.name} ({course.year})'] for course in courses],
+            'scores': {f'{student_id}-{course_id}': score for student_id, course_id, score in scores},
+        }
+        return render(request, self.template_name, {
+            'grid': grid, 'title': f'scores of {_class}', 'cancel_url': reverse_lazy('academic:view_class'),
+        })
+
+    def post(self, request, *args, **kwargs):
+        """
+        expects {"cells": [[student_id, course_id, score], ...]}
+        """
+        _class = self.get_class()
+        student_ids = set(_class.students.values_list('id', flat=True))
+        course_ids = set(self.get_courses(_class).values_list('id', flat=True))
+        try:
+            cells = json.loads(request.body)['cells']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'invalid payload'}, status=400)
+
+        scores, errors = {}, []
+        for cell in cells:
+            try: student_id, course_id, value = cell
+            except (ValueError, TypeError):
+                errors.append({'cell': cell, 'error': 'invalid cell'})
+                continue
+            if student_id not in student_ids or course_id not in course_ids:
+                errors.append({'cell': cell, 'error': 'not in this gradebook'})
+            elif not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 100:
+                errors.append({'cell': cell, 'error': 'score must be between 0 and 100'})
+            else:
+                scores[(student_id, course_id)] = Score(student_id=student_id, course_id=course_id, score=value)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+
+        if scores:
+            Score.objects.bulk_update_or_create(list(scores.values()), ['score'], match_field=('student', 'course'))
+            StudentScoreSummary.objects.refresh(student_id for student_id, _ in scores)
+        return JsonResponse({'saved': len(scores)})
+
+class TranscriptView(BaseWriteView, FormView):
+    """
+    Streams a zip with the PDF transcript of every student of a generation
+    """
+    model = Score
+    permission_required = [('view', 'score')]
+    template_name = 'core/generic_form.html'
+    success_url = reverse_lazy('academic:view_class')
+    extra_context = {'title': 'generate transcripts'}
+
+    def get_form_class(self):
+        generations = Class.objects.get_queryset(request=self.request) \
+            .order_by('-generation').values_list('generation', flat=True).distinct()
+
+        class TranscriptForm(forms.Form):
+            generation = forms.TypedChoiceField(coerce=int, choices=[(g, g) for g in generations])
+        return TranscriptForm
+
+    def form_valid(self, form):
+        generation = form.cleaned_data['generation']
+        transcripts = get_transcripts(generation, Class.objects.get_queryset(request=self.request))
+        response = StreamingHttpResponse(stream_zip(render_transcripts(transcripts)), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="transcripts_{generation}.zip"'
+        return response
+
 class EvaluationListView(BaseListView):
     model = Evaluation
-    table_fields = ['schedule.course', 'schedule._class', 'schedule.professor', 'response']
-    actions = [('clear all', 'academic:delete_evaluation', None)]
+    table_fields = ['schedule.course', 'schedule._class', 'schedule.professor', 'term', 'answers']
+    filter_form_class = ResponseSearchForm
+    actions = [('analytics', 'academic:evaluation_analytics', None),
+               ('clear all', 'academic:delete_evaluation', None)]
+    selection_actions = [('delete', 'academic:delete_selected_evaluation', 'delete_evaluation')]
+
+    def get_filter_form_kwargs(self):
+        return {'model': Evaluation}
 
 class EvaluationCreateView(FormView, BaseWriteView):
     """
     View for creating/updating an evaluation for a schedule.
+    everyone submits at the end of the term, so a submission is one idempotent insert (see EvaluationQuerySet.submit)
     """
     model = Evaluation
+    # FormView comes first and its template_name would hide BaseWriteView's
+    template_name = 'core/generic_form.html'
     success_url = reverse_lazy('academic:view_schedule')
 
-    # throw an error if they've already created the evaluation
-    def dispatch(self, request, *args, **kwargs):
-        if Evaluation.objects.filter(schedule=kwargs['schedule_pk'], student__user=request.user).exists():
+    # throw an error if they've already created the evaluation, only before showing the form
+    def get(self, request, *args, **kwargs):
+        if Evaluation.objects.filter(schedule=kwargs['schedule_pk'], student__user=request.user, term=current_term()).exists():
             raise ValidationError(f"You've already evaluated this schedule {kwargs['schedule_pk']}")
-        return super().dispatch(request, *args, **kwargs)
+        return super().get(request, *args, **kwargs)
 
     def get_form(self):
-        question_definition = EvaluationTemplate.objects.get().question_definition
-        Form = modelform_factory(Evaluation, fields=['response'], widgets={
-            'response': JSONFormWidget(schema=json_to_schema(question_definition))
-            })
+        self.template = EvaluationTemplate.objects.get()
+        Form = compile_template(self.template, self.template.question_definition, Evaluation).form_class
         return super().get_form(form_class=Form)
     
     def form_valid(self, form):
-        Evaluation.objects.create(
-            schedule=Schedule.objects.get(pk=self.kwargs['schedule_pk']), 
-            student=self.request.user.student, 
-            response=form.cleaned_data['response']
-            )
+        version = self.template.get_version()
+        response = version.pack(form.cleaned_data['response'])
+        if not Evaluation.objects.submit(self.kwargs['schedule_pk'], self.request.user, version, response):
+            messages.info(self.request, "this schedule was already evaluated, the first submission was kept")
         return super().form_valid(form)
 
+class EvaluationAnalyticsView(ReadOnlyViewMixin, BaseWriteView, View):
+    """
+    Statistics of the answers to every question of the evaluations of a term by schedule, professor or course,
+    rolled up in the database out of the stats that are kept for every schedule
+    """
+    model = Evaluation
+    permission_required = [('view', None)]
+    template_name = 'academic/evaluation_analytics.html'
+
+    def get_labels(self, group, ids):
+        if group == 'schedule':
+            objects = Schedule.objects.filter(pk__in=ids).select_related('professor', 'course', '_class')
+        else:
+            objects = {'professor': User, 'course': Course}[group].objects.filter(pk__in=ids)
+        return {obj.pk: str(obj) for obj in objects}
+
+    def get(self, request, *args, **kwargs):
+        stats = EvaluationStat.objects.get_queryset(request=request)
+        terms = sorted(set(stats.values_list('term', flat=True).distinct()) | {current_term()}, reverse=True)
+        form = EvaluationAnalyticsForm({'term': current_term(), 'group': 'schedule', **request.GET.dict()}, terms=terms)
+        term, group = (form.cleaned_data['term'], form.cleaned_data['group']) if form.is_valid() else (current_term(), 'schedule')
+
+        rows = stats.filter(term=term).rollup(group)
+        labels = self.get_labels(group, {row['group'] for row in rows})
+        template = EvaluationTemplate.objects.first()
+        # in the order of the template, then whatever an older template asked
+        questions = {
+            question['title']: {'type': question.get('type'), 'rows': []}
+            for question in (template.question_definition if template else None) or []
+        }
+        for row in rows:
+            row['label'] = labels.get(row['group'], str(row['group']))
+        for row in sorted(rows, key=lambda row: row['label']):
+            questions.setdefault(row['question'], {'type': None, 'rows': []})['rows'].append(row)
+        return render(request, self.template_name, {
+            'title': f'evaluations of {term} by {group}',
+            'form': form,
+            'questions': {title: question for title, question in questions.items() if question['rows']},
+            'cancel_url': self.get_success_url(),
+        })
+
 class EvaluationBulkDeleteView(BaseBulkDeleteView):
     """
     delete everything
     """
     model = Evaluation
 
+class EvaluationSelectedDeleteView(BaseSelectedDeleteView):
+    model = Evaluation
+
 class ClassListView(BaseListView):
     model = Class
     object_actions = [('✏️', 'academic:change_class', None),
-               ('❌', 'academic:delete_class', None)]
-    actions = [('+', 'academic:add_class', None)]
+               ('❌', 'academic:delete_class', None),
+               ('scores', 'academic:grade_class', 'add_score'),
+               ('ranking', 'academic:rank_class', 'view_score'),
+               ('📅', 'academic:calendar_class', 'view_class')]
+    actions = [('+', 'academic:add_class', None),
+               ('transcripts', 'academic:generate_transcript', 'view_score')]
     table_fields = ['generation', 'name']
 
 class ClassDeleteView(BaseDeleteView):
@@ -127,6 +543,7 @@ class ClassUpdateView(InlineFormSetView, BaseWriteView):
     model = Class
     inline_model = Schedule
     form_class = ScheduleForm
+    formset_class = ScheduleFormSet
     factory_kwargs = {'extra': 1, 'can_delete': True}
     success_url = reverse_lazy('academic:view_class')
     template_name = 'core/generic_form.html'
@@ -138,9 +555,59 @@ class ClassUpdateView(InlineFormSetView, BaseWriteView):
         return kwargs
     
     def formset_valid(self, formset):
-        for data in formset.cleaned_data:
-            if data.get('DELETE') == True:
-                Schedule.objects.get(
-                    course=data['course'], _class=data['_class'], professor=data['professor']
-                ).delete()
-        return super().formset_valid(formset)
+        if self.add_conflict_errors(formset):
+            return self.formset_invalid(formset)
+        self.object_list = self.save_formset(formset)
+        return HttpResponseRedirect(self.get_success_url())
+
+    def save_formset(self, formset):
+        """
+        Save the rows with one delete, one bulk create and one bulk update, whatever the number of rows
+        """
+        schedules = Schedule.objects.get_queryset(request=None)
+        deleted = [form.instance.pk for form in formset.deleted_forms if form.instance.pk]
+        if deleted:
+            schedules.filter(pk__in=deleted).delete()
+
+        created, updated = [], []
+        for form in formset.forms:
+            if form in formset.deleted_forms or not form.has_changed():
+                continue
+            schedule = form.save(commit=False)
+            (updated if schedule.pk else created).append(schedule)
+        schedules.bulk_create(created)
+        schedules.bulk_update(updated, ['professor', 'course', 'classroom', *WEEKDAYS])
+        if created or updated:
+            TimeSlot.objects.sync(created + updated)
+            # the bulk writes don't send the signals
+            bump_schedule_version()
+        return created + updated
+
+    def add_conflict_errors(self, formset):
+        """
+        Add an error to the rows that double book a professor, a classroom or this class.
+        the other schedules of this class are all in the formset so they are left out of the saved ones
+        """
+        slots = []
+        for form in formset.forms:
+            data = form.cleaned_data
+            if not data or data.get('DELETE'):
+                continue
+            professor, classroom = data.get('professor'), data.get('classroom')
+            for weekday, day in enumerate(WEEKDAYS):
+                parsed = parse_time_range(data.get(day))
+                if parsed:
+                    slots.append(Slot(form, weekday, *parsed, professor and professor.pk, classroom and classroom.pk, self.object.pk))
+        saved = TimeSlot.objects.exclude(schedule___class=self.object)
+        conflicts = saved.conflicts(slots)
+
+        others = Schedule.objects.get_queryset(request=None).select_related('professor', 'course', '_class') \
+            .in_bulk([slot.ref for _, a, b in conflicts for slot in (a, b) if not isinstance(slot.ref, forms.BaseForm)])
+        for resource, a, b in conflicts:
+            for slot, other in ((a, b), (b, a)):
+                if isinstance(slot.ref, forms.BaseForm):
+                    other = others.get(other.ref) or other.ref.cleaned_data.get('course')
+                    slot.ref.add_error(None, f"the {RESOURCES[resource]} is already booked on {WEEKDAYS[slot.weekday]} "
+                                             f"{format_minutes(slot.start)}-{format_minutes(slot.end)} by {other}")
+        return bool(conflicts)
+
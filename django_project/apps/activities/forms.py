@@ -0,0 +1,9 @@
+from django import forms
+
+class ActivityDashboardForm(forms.Form):
+    year = forms.TypedChoiceField(coerce=int)
+    group = forms.ChoiceField(choices=[('template', 'template'), ('program', 'program'), ('both', 'program and template')])
+
+    def __init__(self, *args, years=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['year'].choices = [(year, year) for year in years]
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from apps.core.terms import term_range
+from apps.activities.models import ActivityRollup
+
+class Command(BaseCommand):
+    help = 'Count the activities again into the rollups of the dashboards, of every month or of a term'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', default=None, help='only the months of this term, eg: 2025-1')
+
+    def handle(self, *args, **options):
+        start, end = term_range(options['term']) if options['term'] else (None, None)
+        rollups = ActivityRollup.objects.rebuild(start, end)
+        self.stdout.write(f'{len(rollups)} rollups of {sum(rollup.count for rollup in rollups)} activities')
+        self.stdout.write(self.style.SUCCESS('Activity rollups rebuilt'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0003_alter_activity_response'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityTemplateVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('definition', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='activities.activitytemplate')),
+            ],
+            options={
+                'unique_together': {('template', 'number')},
+            },
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='version',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='activities', to='activities.activitytemplateversion'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from apps.core.responses import pack_responses, unpack_responses
+
+
+def forwards(apps, schema_editor):
+    pack_responses(
+        apps.get_model('activities', 'Activity'), apps.get_model('activities', 'ActivityTemplate'),
+        apps.get_model('activities', 'ActivityTemplateVersion'), 'template_definition', template_field='template',
+        using=schema_editor.connection.alias,
+    )
+
+
+def backwards(apps, schema_editor):
+    unpack_responses(apps.get_model('activities', 'Activity'), using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    # every batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('activities', '0004_template_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
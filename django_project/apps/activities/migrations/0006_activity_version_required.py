@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0005_pack_activity_responses'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activity',
+            name='version',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='activities', to='activities.activitytemplateversion'),
+        ),
+    ]
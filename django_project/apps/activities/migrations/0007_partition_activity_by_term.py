@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:35
+
+import apps.core.terms
+from django.db import migrations, models
+from apps.core.partitions import partition_table, unpartition_table
+
+
+def forwards(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        # the term of the day they were created, as in apps.core.terms.current_term
+        cursor.execute('''
+            UPDATE activities_activity
+            SET term = EXTRACT(YEAR FROM created_at)::int || '-' || CASE WHEN EXTRACT(MONTH FROM created_at) <= 6 THEN 1 ELSE 2 END
+        ''')
+    partition_table(schema_editor, 'activities_activity', 'term')
+
+
+def backwards(apps, schema_editor):
+    unpartition_table(schema_editor, 'activities_activity', 'term')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0006_activity_version_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='term',
+            field=models.CharField(default=apps.core.terms.current_term, editable=False, max_length=7),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:37
+
+import apps.core.models
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0007_partition_activity_by_term'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='search',
+            field=models.GeneratedField(db_persist=True, expression=apps.core.models.ResponseSearchVector('response'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['response'], name='activities_act_response_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search'], name='activities_act_search_gin'),
+        ),
+    ]
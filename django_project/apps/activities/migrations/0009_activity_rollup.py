@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0008_activity_search'),
+        ('organization', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('faculty', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='organization.faculty')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='organization.program')),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='activities.activitytemplate')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('faculty', 'program', 'template', 'month'), name='activities_rollup_key', nulls_distinct=False)],
+            },
+        ),
+        # the activities that already exist, from then on they are counted as they come and go
+        migrations.RunSQL(
+            '''
+            INSERT INTO activities_activityrollup (faculty_id, program_id, template_id, month, count)
+            SELECT faculty_id, program_id, template_id, date_trunc('month', created_at)::date, COUNT(*)
+            FROM activities_activity
+            GROUP BY 1, 2, 3, 4
+            ''',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,11 +1,17 @@
 from django.db import models
 from django.db.models import Q
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django_jsonform.models.fields import JSONField
 from apps.organization.mixins import OrganizationNullMixin
+from apps.core.models import TemplateVersion, VersionedTemplateMixin, ResponseSearchVector
+from apps.core.terms import current_term
+from apps.core.managers import RLSManager
+from .queryset import ActivityRollupQuerySet
 
 # Create your models here.
-class ActivityTemplate(models.Model):
+class ActivityTemplate(VersionedTemplateMixin):
     """
     Stores JSON-based templates for creating activities.
     
@@ -40,23 +46,75 @@ class ActivityTemplate(models.Model):
     name = models.CharField(max_length=255, unique=True)
     template_definition = JSONField(schema=TEMPLATE_SCHEMA)
 
+    definition_field = 'template_definition'
+
     def __str__(self): 
         return self.name
 
+class ActivityTemplateVersion(TemplateVersion):
+    # versions outlive their template, the activities still need them
+    template = models.ForeignKey(ActivityTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='versions')
+
+    class Meta:
+        unique_together = ('template', 'number')
+
 class Activity(OrganizationNullMixin):
     """
     Stores user responses to activity templates with row-level security.
     """
     template = models.ForeignKey(ActivityTemplate, null=True, on_delete=models.SET_NULL, editable=False)
+    # the answers in the order of the questions of the version
     response = JSONField()
+    version = models.ForeignKey(ActivityTemplateVersion, on_delete=models.PROTECT, editable=False, related_name='activities')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, editable=False)
     created_at = models.DateField(auto_now_add=True, editable=False)
+    term = models.CharField(max_length=7, default=current_term, editable=False)
+    search = models.GeneratedField(expression=ResponseSearchVector('response'), output_field=SearchVectorField(), db_persist=True)
+
+    # the table is partitioned by term in postgres, see apps.core.partitions
+    partition_key = 'term'
 
     def get_user_rls_filter(self, user):
         return Q(author=user)
 
+    @property
+    def answers(self):
+        return ActivityTemplateVersion.expand(self.version_id, self.response)
+
     def __str__(self): 
         return f"{self.template.name if self.template else ''} activity created by {self.author} on {self.created_at.strftime('%Y-%m-%d')}"
 
     class Meta:
-        verbose_name_plural = "Activities"
\ No newline at end of file
+        verbose_name_plural = "Activities"
+        indexes = [
+            # for containment searches over the answers (@>)
+            GinIndex(fields=['response'], name='activities_act_response_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['search'], name='activities_act_search_gin'),
+        ]
+
+class ActivityRollup(OrganizationNullMixin):
+    """
+    How many activities of a template were created in a month, per faculty and program,
+    counted up and down as activities are created and deleted (see ActivityRollupQuerySet.bump)
+    so that the dashboards never have to count the activities themselves
+    """
+    template = models.ForeignKey(ActivityTemplate, null=True, blank=True, on_delete=models.CASCADE)
+    # the first day of the month
+    month = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    objects = RLSManager.from_queryset(ActivityRollupQuerySet)()
+
+    class Meta:
+        constraints = [
+            # the activities without a program or template are counted in a single row too
+            models.UniqueConstraint(fields=['faculty', 'program', 'template', 'month'], nulls_distinct=False,
+                                    name='activities_rollup_key'),
+        ]
+
+    def get_user_rls_filter(self, user):
+        # the counts are of everyone's activities, only the faculty and program wide roles see them
+        return Q(pk__in=[])
+
+    def __str__(self):
+        return f"{self.template or 'no template'} - {self.month.strftime('%Y-%m')}: {self.count}"
@@ -0,0 +1,57 @@
+import datetime
+from django.db import models, connections, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+def month_of(date):
+    # created_at comes back as a datetime from a timestamp column
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return date.replace(day=1)
+
+class ActivityRollupQuerySet(models.QuerySet):
+    def bump(self, activity, delta):
+        """
+        Add delta to the count of the (faculty, program, template, month) of an activity,
+        in the transaction that created or deleted it so the count is never off
+        """
+        table = self.model._meta.db_table
+        key = [activity.faculty_id, activity.program_id, activity.template_id, month_of(activity.created_at)]
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {table} (faculty_id, program_id, template_id, month, count)
+                VALUES (%s, %s, %s, %s, GREATEST(%s, 0))
+                ON CONFLICT (faculty_id, program_id, template_id, month)
+                DO UPDATE SET count = GREATEST({table}.count + %s, 0)
+            ''', [*key, delta, delta])
+            if delta < 0:
+                cursor.execute(f'''
+                    DELETE FROM {table} WHERE count = 0 AND faculty_id IS NOT DISTINCT FROM %s
+                    AND program_id IS NOT DISTINCT FROM %s AND template_id IS NOT DISTINCT FROM %s AND month = %s
+                ''', key)
+
+    def rebuild(self, start=None, end=None, **filters):
+        """
+        Count the activities again into the rollups of the months from start up to end (every month by default),
+        filters narrow both down further, eg: template=None.
+        the table is locked against writes meanwhile so that no bump gets lost or counted twice
+        """
+        from .models import Activity
+        activities = Activity.objects.get_queryset(request=None).filter(**filters)
+        rollups = self.filter(**filters)
+        if start:
+            activities, rollups = activities.filter(created_at__gte=start), rollups.filter(month__gte=month_of(start))
+        if end:
+            activities, rollups = activities.filter(created_at__lt=end), rollups.filter(month__lt=end)
+
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {self.model._meta.db_table} IN EXCLUSIVE MODE')
+            rows = activities.values('faculty', 'program', 'template', month=TruncMonth('created_at')) \
+                .annotate(count=Count('id')).order_by()
+            rollups.delete()
+            return self.bulk_create([
+                self.model(faculty_id=row['faculty'], program_id=row['program'], template_id=row['template'],
+                           month=month_of(row['month']), count=row['count'])
+                for row in rows
+            ], batch_size=1000)
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.core.forms import forget_compiled_template
+from apps.core.partitions import partition_dropped
+from apps.core.terms import term_range
+from .models import Activity, ActivityTemplate, ActivityRollup
+
+@receiver(post_save, sender=ActivityTemplate)
+@receiver(post_delete, sender=ActivityTemplate)
+def activity_template_changed(sender, instance, **kwargs):
+    forget_compiled_template(instance)
+
+# the rollups of a template go with it, its activities are now counted without one
+@receiver(post_delete, sender=ActivityTemplate)
+def activity_template_deleted(sender, instance, **kwargs):
+    ActivityRollup.objects.rebuild(template=None)
+
+# activities are only ever created or deleted, never moved to another faculty, program or template
+@receiver(post_save, sender=Activity)
+def activity_created(sender, instance, created, **kwargs):
+    if created:
+        ActivityRollup.objects.bump(instance, 1)
+
+@receiver(post_delete, sender=Activity)
+def activity_deleted(sender, instance, **kwargs):
+    ActivityRollup.objects.bump(instance, -1)
+
+# an archived term is still counted, a dropped one isn't
+@receiver(partition_dropped, sender=Activity)
+def activity_term_dropped(sender, value, using, **kwargs):
+    ActivityRollup.objects.db_manager(using).rebuild(*term_range(value))
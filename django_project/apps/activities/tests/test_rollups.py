@@ -0,0 +1,77 @@
+import datetime
+from django.db import connection
+from django.test import TestCase
+from apps.core.tests.utils import make_org
+from apps.organization.models import Program
+from apps.activities.models import Activity, ActivityTemplate, ActivityRollup
+
+def counted():
+    return {
+        (rollup.faculty_id, rollup.program_id, rollup.template_id, rollup.month): rollup.count
+        for rollup in ActivityRollup._base_manager.all()
+    }
+
+def grouped():
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT faculty_id, program_id, template_id, date_trunc('month', created_at)::date, count(*)
+            FROM {Activity._meta.db_table} GROUP BY 1, 2, 3, 4
+        ''')
+        return {tuple(row[:4]): row[4] for row in cursor.fetchall()}
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.faculty, self.program, self.user = make_org()
+        self.other = Program.objects.create(name='other', faculty=self.faculty)
+        self.templates = [ActivityTemplate.objects.create(name=name, template_definition=[{'title': 'q', 'type': 'text'}])
+                          for name in ['talk', 'trip']]
+
+    def create(self, template, program, faculty=True):
+        return Activity.objects.create(
+            template=template, version=template.get_version() if template else self.templates[0].get_version(),
+            response=['x'], author=self.user, faculty=self.faculty if faculty else None, program=program,
+        )
+
+    def create_some(self):
+        activities = []
+        for template in [*self.templates, None]:
+            for program in [self.program, self.other, None]:
+                activities += [self.create(template, program) for _ in range(2)]
+        activities.append(self.create(None, None, faculty=False))
+        return activities
+
+    def test_bumps_match_a_group_by(self):
+        activities = self.create_some()
+        self.assertEqual(counted(), grouped())
+        # the nulls share their rows
+        month = datetime.date.today().replace(day=1)
+        self.assertEqual(counted()[(self.faculty.pk, None, None, month)], 2)
+
+        for activity in activities[::3]:
+            activity.delete()
+        self.assertEqual(counted(), grouped())
+        # the rows that got to zero go away
+        self.assertNotIn(0, counted().values())
+
+    def test_rebuild_matches_a_group_by(self):
+        activities = self.create_some()
+        # spread them over a few months, without the rollups knowing
+        for i, activity in enumerate(activities):
+            Activity.objects.filter(pk=activity.pk).update(created_at=datetime.date(2025, 1 + i % 4, 1 + i % 28))
+        self.assertNotEqual(counted(), grouped())
+
+        # only the months of the range are recounted
+        ActivityRollup.objects.rebuild(datetime.date(2025, 2, 1), datetime.date(2025, 3, 1))
+        self.assertEqual({key: n for key, n in counted().items() if key[3] == datetime.date(2025, 2, 1)},
+                         {key: n for key, n in grouped().items() if key[3] == datetime.date(2025, 2, 1)})
+        self.assertNotIn(datetime.date(2025, 1, 1), {key[3] for key in counted()})
+
+        ActivityRollup.objects.rebuild()
+        self.assertEqual(counted(), grouped())
+
+    def test_deleting_a_template(self):
+        self.create_some()
+        pk = self.templates[0].pk
+        self.templates[0].delete()
+        self.assertEqual(counted(), grouped())
+        self.assertNotIn(pk, {key[2] for key in counted()})
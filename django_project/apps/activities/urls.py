@@ -8,8 +8,10 @@ urlpatterns = [
     path('', views.ActivityListView.as_view(), name='view_activity'),
     path('create/templates/', views.ActivityTemplateSelectView.as_view(), name='add_activity'),
     path('create/<int:template_pk>/', views.ActivityCreateView.as_view(), name='submit_activity'),
+    path('dashboard/', views.ActivityDashboardView.as_view(), name='activity_dashboard'),
     path('delete/<int:pk>', views.ActivityDeleteView.as_view(), name='delete_activity'),
     path('delete/', views.ActivityBulkDeleteView.as_view(), name='delete_activity'),
+    path('delete/selected/', views.ActivitySelectedDeleteView.as_view(), name='delete_selected_activity'),
     # activity template
     path('templates/', views.ActivityTemplateListView.as_view(), name='view_activitytemplate'),
     path('templates/create/', views.ActivityTemplateCreateView.as_view(), name='add_activitytemplate'),
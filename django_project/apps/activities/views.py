@@ -1,19 +1,27 @@
-from django.views.generic import ListView
-from django.forms.models import modelform_factory
-from django_jsonform.widgets import JSONFormWidget
-from apps.core.generic_views import BaseDeleteView, BaseListView, BaseCreateView, BaseUpdateView, BaseBulkDeleteView
-from apps.core.forms import json_to_schema
-from .models import Activity, ActivityTemplate
+import calendar
+from django.shortcuts import render
+from django.utils import timezone
+from django.views.generic import ListView, View
+from apps.core.generic_views import BaseDeleteView, BaseListView, BaseCreateView, BaseUpdateView, BaseBulkDeleteView, BaseWriteView, BaseSelectedDeleteView, ReadOnlyViewMixin
+from apps.core.forms import compile_template, ResponseSearchForm
+from .models import Activity, ActivityTemplate, ActivityRollup
+from .forms import ActivityDashboardForm
 
 class ActivityListView(BaseListView):
     """
     View for listing all activities.
     """
     model = Activity
-    table_fields = ['author', 'template', 'created_at', 'response']
+    table_fields = ['author', 'template', 'created_at', 'answers']
     object_actions = [('❌', 'activities:delete_activity', None)]
     actions = [('+', 'activities:add_activity', None),
+    ('dashboard', 'activities:activity_dashboard', 'view_activity'),
     ('clear all', 'activities:delete_activity', None)]
+    selection_actions = [('delete', 'activities:delete_selected_activity', 'delete_activity')]
+    filter_form_class = ResponseSearchForm
+
+    def get_filter_form_kwargs(self):
+        return {'model': Activity}
 
 class ActivityTemplateSelectView(ListView):
     """
@@ -34,21 +42,63 @@ class ActivityCreateView(BaseCreateView):
     model = Activity
     def get_form(self):
         self.template = ActivityTemplate.objects.get(pk=self.kwargs['template_pk'])
-        template_json = self.template.template_definition
-        Form = modelform_factory(Activity, fields=['response'], widgets={'response': JSONFormWidget(schema=json_to_schema(template_json))})
+        Form = compile_template(self.template, self.template.template_definition, Activity).form_class
         return super().get_form(form_class=Form)
 
     def form_valid(self, form):
         form.instance.template = self.template
+        form.instance.version = self.template.get_version()
+        form.instance.response = form.instance.version.pack(form.cleaned_data['response'])
         form.instance.author = self.request.user
         return super().form_valid(form)
 
+class ActivityDashboardView(ReadOnlyViewMixin, BaseWriteView, View):
+    """
+    Activities created every month of a year by template and/or program, read out of the rollups only
+    so it doesn't matter how many activities there are
+    """
+    model = Activity
+    permission_required = [('view', None)]
+    template_name = 'activities/activity_dashboard.html'
+
+    def get(self, request, *args, **kwargs):
+        rollups = ActivityRollup.objects.get_queryset(request=request)
+        this_year = timezone.localdate().year
+        years = sorted({month.year for month in rollups.dates('month', 'year')} | {this_year}, reverse=True)
+        form = ActivityDashboardForm({'year': this_year, 'group': 'template', **request.GET.dict()}, years=years)
+        year, group = (form.cleaned_data['year'], form.cleaned_data['group']) if form.is_valid() else (this_year, 'template')
+
+        counts = {}
+        for program, template, month, count in rollups.filter(month__year=year) \
+                .values_list('program__name', 'template__name', 'month', 'count'):
+            label = {
+                'template': (template or 'no template',),
+                'program': (program or 'no program',),
+                'both': (program or 'no program', template or 'no template'),
+            }[group]
+            counts.setdefault(label, [0] * 12)[month.month - 1] += count
+        rows = [{'label': label, 'months': months, 'total': sum(months)} for label, months in sorted(counts.items())]
+        totals = [sum(column) for column in zip(*counts.values())] or [0] * 12
+        return render(request, self.template_name, {
+            'title': f'activities of {year}',
+            'form': form,
+            'headers': ['program', 'template'] if group == 'both' else [group],
+            'months': calendar.month_abbr[1:],
+            'rows': rows,
+            'totals': totals,
+            'total': sum(totals),
+            'cancel_url': self.get_success_url(),
+        })
+
 class ActivityDeleteView(BaseDeleteView):
     model = Activity
     
 class ActivityBulkDeleteView(BaseBulkDeleteView):
     model = Activity
 
+class ActivitySelectedDeleteView(BaseSelectedDeleteView):
+    model = Activity
+
 class ActivityTemplateListView(BaseListView):
     model = ActivityTemplate
     table_fields = ['name']
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import register, Tags, Warning
+from django.db import connections
+
+@register(Tags.database)
+def check_connection_budget(app_configs, databases=None, **kwargs):
+    """
+    every thread of every worker keeps a connection to each database open, they have to fit in max_connections
+    with room left for the commands and the cron jobs
+    """
+    errors = []
+    held = settings.WEB_WORKERS * settings.WEB_THREADS
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql' or connection.settings_dict['CONN_MAX_AGE'] == 0:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT current_setting('max_connections')::int - current_setting('superuser_reserved_connections')::int"
+            )
+            available = cursor.fetchone()[0]
+        if held > available - settings.SPARE_CONNECTIONS:
+            errors.append(Warning(
+                f'{settings.WEB_WORKERS} workers of {settings.WEB_THREADS} threads keep {held} connections to {alias} '
+                f'open, the server allows {available} and {settings.SPARE_CONNECTIONS} are kept spare',
+                hint='lower WEB_CONCURRENCY or WEB_THREADS, or raise max_connections',
+                id='core.W001',
+            ))
+    return errors
@@ -0,0 +1,91 @@
+import time
+import logging
+import threading
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+class ConnectionStats:
+    """
+    How long the requests of this process waited for a connection to open and how old it was by then,
+    summed up in the log every `interval` requests
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.opened = 0
+        self.waits = []
+        self.ages = []
+
+    def record(self, wait, age, opened):
+        with self.lock:
+            self.requests += 1
+            self.opened += opened
+            self.waits.append(wait)
+            self.ages.append(age)
+            if self.requests >= self.interval:
+                logger.info(self.summary())
+                self.reset()
+
+    def summary(self):
+        waits, ages = sorted(self.waits), sorted(self.ages)
+        if not waits:
+            return 'no requests'
+        return (f'{self.requests} requests, {self.opened} new connections, '
+                f'wait ms p50 {waits[len(waits) // 2] * 1000:.2f} max {waits[-1] * 1000:.2f}, '
+                f'age s p50 {ages[len(ages) // 2]:.0f} max {ages[-1]:.0f}')
+
+stats = ConnectionStats(getattr(settings, 'CONNECTION_STATS_INTERVAL', 1000))
+
+def time_connects(connection):
+    """
+    Time every connect() of this connection, `connect_seconds` is how long the last one took
+    and `connected_at` when it was done
+    """
+    if getattr(connection, 'connect_timed', False):
+        return
+    connect = connection.connect
+
+    def timed_connect():
+        start = time.monotonic()
+        connection.connecting = True
+        try:
+            connect()
+        finally:
+            connection.connecting = False
+        connection.connected_at = time.monotonic()
+        connection.connect_seconds = connection.connected_at - start
+
+    connection.connect = timed_connect
+    connection.connect_timed = True
+
+class FirstQuery:
+    """
+    Execute wrapper that records how the connection of `alias` was got at the first query of a request,
+    a request that doesn't query doesn't connect. `acquired` is then (seconds waited, seconds since it was opened, opened),
+    the wait being how long opening it took, 0 when it was already open
+    """
+    def __init__(self, alias=DEFAULT_DB_ALIAS):
+        self.connection = connections[alias]
+        time_connects(self.connection)
+        self.started = time.monotonic()
+        self.acquired = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # django checks the version of the database with a query the first time it connects
+        if self.acquired is None and not getattr(self.connection, 'connecting', False):
+            # none for a connection opened before its connects were timed
+            connected_at = getattr(self.connection, 'connected_at', None)
+            opened = connected_at is not None and connected_at >= self.started
+            self.acquired = (
+                self.connection.connect_seconds if opened else 0.0,
+                time.monotonic() - connected_at if connected_at is not None else 0.0,
+                opened,
+            )
+            stats.record(*self.acquired)
+        return execute(sql, params, many, context)
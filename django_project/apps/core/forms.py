@@ -1,6 +1,17 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import NamedTuple, Callable
 from django import forms
+from django.db.models import Model, QuerySet, Q, Exists, OuterRef
+from django.contrib.postgres.search import SearchQuery
+from django.http import QueryDict
 from django.forms.models import modelform_factory
 from django_jsonform.forms.fields import JSONFormField
+from django_jsonform.widgets import JSONFormWidget
+from django_jsonform.validators import JSONSchemaValidator
 
 def get_default_form(flat_fields, model, request=None, form_class=None):
     """
@@ -25,6 +36,117 @@ def get_default_form(flat_fields, model, request=None, form_class=None):
                     self.fields[field] = model_form.fields[field]
     return DefaultImportForm
 
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that cleans out of `objects` ({pk: obj}) once it's given one,
+    so that the forms of a formset share a single query instead of running one each
+    """
+    objects = None
+
+    def to_python(self, value):
+        if self.objects is None or value in self.empty_values or isinstance(value, self.queryset.model):
+            return super().to_python(value)
+        try:
+            return self.objects[int(value)]
+        except (KeyError, ValueError, TypeError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+
+class AutocompleteMixin:
+    """
+    A select that only renders the options that are selected, the others are fetched by select2 from
+    the view of the form as they are typed (see BaseWriteView.autocomplete)
+    """
+    def __init__(self, field_name, attrs=None):
+        super().__init__(attrs)
+        self.field_name = field_name
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete'] = self.field_name
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        choices = [('', field.empty_label)] if field.empty_label is not None else []
+        selected = [v for v in value if v not in field.empty_values]
+        if selected:
+            try:
+                choices += [self.choices.choice(obj) for obj in field.queryset.filter(pk__in=selected)]
+            except (ValueError, TypeError, forms.ValidationError):
+                # a posted value that isn't a pk, the field tells about it
+                pass
+        return [
+            (None, [self.create_option(name, v, label, str(v) in value, index, attrs=attrs)], index)
+            for index, (v, label) in enumerate(choices)
+        ]
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    pass
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    pass
+
+def use_autocomplete(form):
+    """
+    swap the plain selects of the related fields of a form for the autocomplete ones,
+    once their queryset is final
+    """
+    for name, field in form.fields.items():
+        if not isinstance(field, forms.ModelChoiceField) or type(field.widget) not in (forms.Select, forms.SelectMultiple):
+            continue
+        widget_class = AutocompleteSelectMultiple if field.widget.allow_multiple_selected else AutocompleteSelect
+        widget = widget_class(name, attrs=field.widget.attrs)
+        widget.choices = field.choices
+        widget.is_required = field.required
+        field.widget = widget
+
+def form_to_grid(form):
+    """
+    describe the fields of a form as grid columns.
+    the choices of every select are listed once in options and the columns point to them by index,
+    so the payload doesn't repeat every <option> in every row
+    """
+    columns, options = [], []
+    for name, field in form.fields.items():
+        column = {'name': name, 'label': str(field.label or name), 'type': 'text', 'options': None}
+        if isinstance(field, forms.BooleanField):
+            column['type'] = 'checkbox'
+        elif isinstance(field, forms.ChoiceField):
+            options.append([[str(value), str(label)] for value, label in field.choices])
+            column['options'] = len(options) - 1
+            column['type'] = 'multiple' if isinstance(field, forms.MultipleChoiceField) else 'select'
+        columns.append(column)
+    return columns, options
+
+def grid_value(value):
+    """
+    turn an initial/cleaned value into something json (and therefore the session) can hold
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Model):
+        return str(value.pk)
+    if isinstance(value, (QuerySet, list, tuple)):
+        return [grid_value(v) for v in value]
+    return str(value)
+
+def grid_to_formset_data(columns, rows, prefix='form'):
+    """
+    build the POST data a formset expects out of the grid rows
+    """
+    data = QueryDict(mutable=True)
+    data[f'{prefix}-TOTAL_FORMS'] = str(len(rows))
+    data[f'{prefix}-INITIAL_FORMS'] = '0'
+    for i, row in enumerate(rows):
+        for column, value in zip(columns, row):
+            if isinstance(value, list):
+                data.setlist(f'{prefix}-{i}-{column}', [str(v) for v in value])
+            elif value is not None:
+                data[f'{prefix}-{i}-{column}'] = str(value)
+    return data
+
 def json_to_schema(template_json):
     schema = {
         "type": "object",
@@ -59,4 +181,139 @@ def json_to_schema(template_json):
                     "choices": field['choices'],
                     "widget": "multiselect"
                 }
-    return schema
\ No newline at end of file
+    return schema
+
+def validate_json(schema, value):
+    """
+    raises a JSONSchemaValidationError (a ValidationError) with the error_map of what's wrong.
+    a validator keeps the errors of its last call, so every call gets its own
+    """
+    JSONSchemaValidator(schema=schema)(value)
+
+class CompiledTemplate(NamedTuple):
+    """
+    What a json template turns into: the schema of the widget, the model form of a response and its validator
+    """
+    schema: dict
+    form_class: type
+    validator: Callable
+
+# form classes can't go in the shared cache, so it's one per process, least recently used first
+COMPILED_TEMPLATES_SIZE = 64
+_compiled_templates = OrderedDict()
+_compiled_lock = threading.Lock()
+
+def template_hash(template_json):
+    return hashlib.md5(json.dumps(template_json, sort_keys=True).encode()).hexdigest()
+
+def compile_template(template, template_json, model, field='response'):
+    """
+    The compiled form of a template for the json `field` of `model`, built once per template content.
+    the key has a hash of the content so that a template changed by another process is never served stale,
+    saving a template also drops what this process compiled out of it (see forget_compiled_template)
+    """
+    key = (template._meta.label_lower, template.pk, model._meta.label_lower, field, template_hash(template_json))
+    with _compiled_lock:
+        compiled = _compiled_templates.get(key)
+        if compiled:
+            _compiled_templates.move_to_end(key)
+            return compiled
+
+    schema = json_to_schema(template_json)
+    # the schema field validates the response against the widget's schema on the server too
+    form_class = modelform_factory(
+        model, fields=[field], field_classes={field: JSONFormField}, widgets={field: JSONFormWidget(schema=schema)},
+    )
+    compiled = CompiledTemplate(schema, form_class, partial(validate_json, schema))
+    with _compiled_lock:
+        _compiled_templates[key] = compiled
+        while len(_compiled_templates) > COMPILED_TEMPLATES_SIZE:
+            _compiled_templates.popitem(last=False)
+    return compiled
+
+def forget_compiled_template(template):
+    label = template._meta.label_lower
+    with _compiled_lock:
+        for key in [key for key in _compiled_templates if key[:2] == (label, template.pk)]:
+            del _compiled_templates[key]
+
+class ResponseSearchForm(forms.Form):
+    """
+    Search the responses of a model that answers the versions of a template, in the database:
+    q is matched against the words of every answer (the search column) and question + value/minimum/maximum
+    filter on the answer to one question. a question sits at its own position in every version,
+    so it's one condition per version that asked it
+    """
+    NUMERIC = ('integer', 'number')
+
+    q = forms.CharField(required=False, label='search the answers')
+    question = forms.ChoiceField(required=False)
+    value = forms.CharField(required=False, help_text='the answer is this, or has it checked')
+    minimum = forms.CharField(required=False, help_text='the answer is this or after it')
+    maximum = forms.CharField(required=False, help_text='the answer is this or before it')
+
+    def __init__(self, *args, model, **kwargs):
+        super().__init__(*args, **kwargs)
+        # only the versions something answered, a template edited often has many that nothing did
+        version_model = model._meta.get_field('version').related_model
+        answered = model._base_manager.filter(version=OuterRef('pk'))
+        self.versions = dict(version_model.objects.filter(Exists(answered)).order_by('pk').values_list('pk', 'definition'))
+        # the type the latest version gives to every question
+        self.types = {}
+        for definition in self.versions.values():
+            for question in definition:
+                self.types[question['title']] = question.get('type')
+        self.fields['question'].choices = [('', '---------')] + [(title, title) for title in sorted(self.types)]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        question = cleaned_data.get('question')
+        answers = [name for name in ('value', 'minimum', 'maximum') if cleaned_data.get(name)]
+        if answers and not question:
+            self.add_error('question', 'pick the question to filter on')
+        elif question and self.types[question] in self.NUMERIC:
+            for name in answers:
+                try: float(cleaned_data[name])
+                except ValueError: self.add_error(name, 'this question is answered with a number')
+        return cleaned_data
+
+    def get_answer(self, value, question_type):
+        # numbers compare as numbers in jsonb, and a number never equals a string
+        if question_type in self.NUMERIC:
+            try: return float(value)
+            except ValueError: pass
+        return value
+
+    def filter(self, queryset):
+        data = self.cleaned_data
+        if data['q']:
+            queryset = queryset.filter(search=SearchQuery(data['q'], config='simple', search_type='websearch'))
+        question = data['question']
+        given = {name: data[name] for name in ('value', 'minimum', 'maximum') if data[name]}
+        if not question or not given:
+            return queryset
+
+        conditions = Q()
+        values = set()
+        for pk, definition in self.versions.items():
+            position, asked = next(((i, q) for i, q in enumerate(definition) if q['title'] == question), (None, None))
+            if asked is None:
+                continue
+            answer = f'response__{position}'
+            checkbox = asked.get('type') == 'checkbox'
+            lookups = {}
+            if 'value' in given:
+                value = self.get_answer(given['value'], asked.get('type'))
+                lookups[f'{answer}__contains' if checkbox else answer] = [value] if checkbox else value
+                values.add(json.dumps([value] if checkbox else value))
+            if 'minimum' in given:
+                lookups[f'{answer}__gte'] = self.get_answer(given['minimum'], asked.get('type'))
+            if 'maximum' in given:
+                lookups[f'{answer}__lte'] = self.get_answer(given['maximum'], asked.get('type'))
+            conditions |= Q(version=pk, **lookups)
+        if not conditions:
+            return queryset.none()
+        if len(values) == 1:
+            # the answer is somewhere in the response, which the jsonb_path_ops index can tell
+            queryset = queryset.filter(response__contains=[json.loads(values.pop())])
+        return queryset.filter(conditions)
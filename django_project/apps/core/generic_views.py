@@ -1,30 +1,61 @@
-from django.forms import formset_factory
+import json
+from django.forms import formset_factory, BaseFormSet
 from django.urls import reverse_lazy
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError, FieldDoesNotExist, ImproperlyConfigured
 from django.views.generic import View, ListView, DeleteView, CreateView, UpdateView
-from django.forms.models import modelform_factory
+from django.views.generic.edit import FormMixin
+from django.contrib import messages
+from django.forms.models import ModelForm, modelform_factory
 from django.shortcuts import redirect, render
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django import forms
 from apps.organization.models import Faculty, Program
 from apps.users.managers import UserRLSManager
 from .managers import RLSManager
-from .forms import get_default_form
+from .forms import get_default_form, form_to_grid, grid_value, grid_to_formset_data, use_autocomplete
+from .search import MAX_WORDS, search_filter, search_fields, rank
 
-class BaseListView(ListView):
+class ReadOnlyViewMixin:
+    """
+    For the views that only read: their safe requests run outside ATOMIC_REQUESTS and read from the replica
+    (see ReplicaMiddleware), the other ones still run in a transaction on the primary
+    """
+    read_from_replica = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            return super().dispatch(request, *args, **kwargs)
+
+class BaseListView(ReadOnlyViewMixin, ListView):
     """
     Base view for displaying a list of objects.
     """
     model = None
     object_actions = []
     actions = []
+    # actions on the rows picked in the table, they post the pks as `selected` (see BaseSelectionView)
+    selection_actions = []
     template_name = 'core/generic_list.html'
     table_fields = []
+    # a form with a filter(queryset) method, bound to the query string and applied on top of the RLS filter
+    filter_form_class = None
+    # the model whose permissions open the list, when it's not the model listed
+    permission_model = None
 
     def dispatch(self, request, *args, **kwargs):
         # check if permission in request.session['permission']
         self.app_label = self.model._meta.app_label
         self.model_name = self.model._meta.model_name
+        permission_name = (self.permission_model or self.model)._meta.model_name
         s = request.session
-        if not any(perm in s['permissions'] for perm in [f'view_{self.model_name}', f'change_{self.model_name}', f'delete_{self.model_name}']):
+        if not any(perm in s['permissions'] for perm in [f'view_{permission_name}', f'change_{permission_name}', f'delete_{permission_name}']):
             raise PermissionDenied("You do not have permission to access this page.")
         return super().dispatch(request, *args, **kwargs)
 
@@ -34,6 +65,7 @@ class BaseListView(ListView):
         
         # Add table configuration
         context['table_fields'] = self.table_fields
+        context['filter_form'] = self.filter_form
         
         # Set up URLs
         context["object_actions"] = {}
@@ -51,7 +83,15 @@ class BaseListView(ListView):
             if permission in self.request.session['permissions']:
                 context["actions"][action] = url
 
+        context["selection_actions"] = {}
+        for action, url, permission in self.selection_actions:
+            if permission in self.request.session['permissions']:
+                context["selection_actions"][action] = url
+
         return context
+
+    def get_filter_form_kwargs(self):
+        return {}
         
     def get_queryset(self):
         # filter RLS sin
@@ -60,13 +100,24 @@ class BaseListView(ListView):
             queryset = self.model.objects.get_queryset(request=self.request)
         else:
             queryset = super().get_queryset()
+
+        self.filter_form = None
+        if self.filter_form_class:
+            self.filter_form = self.filter_form_class(self.request.GET or None, **self.get_filter_form_kwargs())
+            if self.filter_form.is_valid():
+                queryset = self.filter_form.filter(queryset)
+
         # Get all potential foreign key fields from table_fields
         related_fields = set()
         for field in getattr(self, 'table_fields', []):
             # Add direct fields that might be foreign keys
             field = field.replace('.', '__')
             direct_field = field.split('__')[0]
-            field_obj = self.model._meta.get_field(direct_field)
+            try:
+                field_obj = self.model._meta.get_field(direct_field)
+            except FieldDoesNotExist:
+                # a property, like the answers of a response
+                continue
             direct_field_is_relation = field_obj.is_relation and field_obj.many_to_one and field_obj.concrete
             
             if direct_field_is_relation:
@@ -94,6 +145,7 @@ class BaseWriteView(View):
     template_name = 'core/generic_form.html'
     permission_required = []
     success_url = None
+    autocomplete_page_size = 20
 
     def dispatch(self, request, *args, **kwargs):
         self.app_label = self.model._meta.app_label
@@ -109,9 +161,50 @@ class BaseWriteView(View):
         if self.success_url:
             return self.success_url
         return reverse_lazy(f'{self.app_label}:view_{self.model_name}')
+
+    def get(self, request, *args, **kwargs):
+        if 'autocomplete' in request.GET:
+            return self.autocomplete(request)
+        if not hasattr(super(), 'get'):
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        return super().get(request, *args, **kwargs)
+
+    def autocomplete(self, request):
+        """
+        A page of the choices of a related field of the form as select2 takes them,
+        out of the same queryset the field validates against so the RLS filter holds
+        """
+        self.object = self.get_object() if self.pk_url_kwarg in self.kwargs and hasattr(self, 'get_object') else None
+        form = self.get_form()
+        field = form.fields.get(request.GET['autocomplete']) if form is not None else None
+        if not isinstance(field, forms.ModelChoiceField):
+            raise Http404('no such field')
+        # the RLS filter of some models joins to many rows
+        queryset = field.queryset.distinct()
+        words = request.GET.get('term', '').split()[:MAX_WORDS]
+        fields = search_fields(queryset.model)
+        if words and fields:
+            queryset = rank(queryset.filter(search_filter(fields, words)), fields, ' '.join(words), words)
+        elif not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        # one more than a page tells if there is a next one without counting
+        start = (page - 1) * self.autocomplete_page_size
+        objects = list(queryset[start:start + self.autocomplete_page_size + 1])
+        return JsonResponse({
+            'results': [
+                {'id': field.prepare_value(obj), 'text': field.label_from_instance(obj)}
+                for obj in objects[:self.autocomplete_page_size]
+            ],
+            'pagination': {'more': len(objects) > self.autocomplete_page_size},
+        })
     
-    def get_context_data(self):
-        context = super().get_context_data()
+    def get_context_data(self, **kwargs):
+        # form_invalid passes the bound form in
+        context = super().get_context_data(**kwargs)
         context['cancel_url'] = self.get_success_url()
         return context
     
@@ -140,6 +233,8 @@ class BaseWriteView(View):
             if issubclass(related_model.objects.__class__, RLSManager) or \
                 issubclass(related_model.objects.__class__, UserRLSManager):
                 form.fields[field].queryset = related_model.objects.get_queryset(request=self.request)
+        # the choices are fetched as they are typed instead of being rendered
+        use_autocomplete(form)
         return form
     
     def form_valid(self, form):
@@ -205,28 +300,130 @@ class BaseBulkDeleteView(BaseWriteView, View):
         context['title'] = f"are you sure you want to delete all these {self.model_name}s?"
         return context
 
+class BaseSelectionView(BaseWriteView, FormMixin, View):
+    """
+    Base view for an action on the objects picked in a list, the list posts their pks as `selected`.
+    the first post shows how many of them are in the RLS scope and asks for the form if there is one,
+    the second one (with `apply`) runs the action on them at once with perform()
+    """
+    model = None
+    form_class = None
+    verb = None
+    done = None
+
+    def post(self, request, *args, **kwargs):
+        # pks that aren't numbers would fail the whole query
+        pks = [pk for pk in request.POST.getlist('selected') if pk.isdigit()]
+        self.selected = self.get_queryset().filter(pk__in=pks)
+        form_class = self.get_form_class()
+        form = self.get_form(form_class) if form_class else None
+        if 'apply' in request.POST and (form is None or form.is_valid()):
+            count = self.perform(self.selected, form)
+            messages.success(request, f'{count} {self.model._meta.verbose_name_plural} {self.done}')
+            return redirect(self.get_success_url())
+
+        pks = list(self.selected.values_list('pk', flat=True))
+        if not pks:
+            messages.warning(request, f'no {self.model._meta.verbose_name_plural} were selected')
+            return redirect(self.get_success_url())
+        return render(request, self.template_name, {
+            'form': form,
+            'selected': pks,
+            'title': f'{self.verb} {len(pks)} selected {self.model._meta.verbose_name_plural}?',
+            'cancel_url': self.get_success_url(),
+        })
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        # the selection is checked with the rest of the form, once its fields are clean
+        clean = form.clean
+        def clean_selection():
+            cleaned_data = clean()
+            self.validate_selection(self.selected, form)
+            return cleaned_data
+        form.clean = clean_selection
+        return form
+
+    def get_form_kwargs(self):
+        # the post that comes from the list has no values yet
+        kwargs = super().get_form_kwargs()
+        if 'apply' not in self.request.POST:
+            kwargs.pop('data', None)
+            kwargs.pop('files', None)
+        return kwargs
+
+    def validate_selection(self, selected, form):
+        """
+        add errors to the form when the action can't be run on the selected objects,
+        it runs from the clean() of the form so a field that didn't clean is missing from cleaned_data
+        """
+
+    def perform(self, selected, form):
+        """
+        run the action on the selected objects, returns how many of them it touched
+        """
+        raise ImproperlyConfigured(f'{self.__class__.__name__} has to define perform()')
+
+class BaseSelectedDeleteView(BaseSelectionView):
+    """
+    Delete the selected objects with one delete over their pks.
+    the objects are still collected when something cascades from them or listens to their deletion
+    """
+    permission_required = [('delete', None)]
+    verb = 'delete'
+    done = 'deleted'
+
+    def perform(self, selected, form):
+        _, deleted = selected.delete()
+        return deleted.get(self.model._meta.label, 0)
+
+class BaseSelectedUpdateView(BaseSelectionView):
+    """
+    Set `fields` of the selected objects to the values of the form with one update.
+    it doesn't go through save() so nothing that listens to it is told
+    """
+    permission_required = [('change', None)]
+    fields = []
+    verb = 'change'
+    done = 'changed'
+
+    def get_form_class(self):
+        return self.form_class or modelform_factory(self.model, fields=self.fields)
+
+    def perform(self, selected, form):
+        return selected.update(**{field: form.cleaned_data[field] for field in self.fields})
+
 class BaseImportView(BaseCreateView):
     """
     Mixin for views that require permission to import an object.
     first, it will give a model form that asks the user to fill out the default value of each field.
     they can also paste an entire row of values where x is the row number
-    then once they submit, we give them another form that autogenerate x amount of form (in row format)
-    those rows of form comes with prefilled default that they input and they can modify it
-    finally, they can submit the form and it will bulk create all the objects
+    then once they submit, we give them a grid with x amount of rows
+    those rows come with prefilled default that they input and they can modify it.
+    the grid only posts back the cells that changed, the rows themselves are kept in the session
+    finally, they can submit the grid and it will bulk create all the objects
+    if match_field is set (eg: email), rows that already exist are updated instead of duplicated.
+    the first submit of the rows is then a dry run that shows what will be inserted or updated
     """
     flat_fields = []
     form_class = None    
+    import_formset_class = BaseFormSet
+    match_field = None
+    update_fields = []
+    # the fields clean() works out from the updated ones, saved along with them
+    derived_fields = []
+    diff_sample_size = 10
+    # the rows the grid may add on top of the ones it was given
+    max_new_rows = 1000
+    batch_size = 1000
+    grid_template_name = 'core/import_grid.html'
 
     def get(self, request, *args, **kwargs):
         default_form = get_default_form(flat_fields=self.flat_fields, model=self.model, request=request, form_class=self.form_class)()
         return render(request, self.template_name, {'form': default_form, 'title': 'set the default values'})
     
     def post(self, request, *args, **kwargs):
-        FormSet_Class = formset_factory(
-            self.form_class or modelform_factory(self.model, fields='__all__'),
-            extra=0, can_delete=True
-        )
-        if 'form-TOTAL_FORMS' not in request.POST:
+        if 'grid_changes' not in request.POST:
             form = get_default_form(flat_fields=self.flat_fields, model=self.model, request=request, form_class=self.form_class)(request.POST)
             if form.is_valid():
                 # calculating the num form
@@ -251,20 +448,189 @@ class BaseImportView(BaseCreateView):
                         else:
                             initials[i][field] = data[field]
 
-                formset = FormSet_Class(initial=initials, form_kwargs={'request': request})
-                return render(request, self.template_name, {'formset': formset})
+                columns = self.get_import_form_class()(request=request).fields
+                rows = [[grid_value(initial.get(column)) for column in columns] for initial in initials]
+                return self.render_grid(request, rows)
             return render(request, self.template_name, {'form': form})
         
-        elif 'form-TOTAL_FORMS' in request.POST:
-            formset = FormSet_Class(request.POST, form_kwargs={'request': request})
-            instances = []
-            if formset.is_valid():
-                for form in formset:
-                    instance = form.save(commit=False)
-                    instance.clean()
-                    instances.append(instance)
-                self.model.objects.bulk_create(instances)   
+        else:
+            stored = request.session.get(self.grid_session_key)
+            if not stored:
+                raise ValidationError("the import has expired, please start over")
+            try:
+                rows = self.get_grid_rows(request, stored)
+            except ValidationError as e:
+                return self.render_grid(request, stored['rows'], non_form_errors=e.messages)
+            FormSet_Class = formset_factory(self.get_import_form_class(), formset=self.import_formset_class, extra=0)
+            formset = FormSet_Class(grid_to_formset_data(stored['columns'], rows), form_kwargs={'request': request})
+            if formset.is_valid() and self.check_duplicate_keys(formset):
+                if self.match_field:
+                    diff, new_forms, changed = self.get_import_diff(formset)
+                    # the rows edited on the review page were not in the diff that was confirmed
+                    if 'confirm_import' not in request.POST or rows != stored['rows']:
+                        return self.render_grid(request, rows, diff=diff)
+                else:
+                    new_forms, changed = formset, []
+                self.save_import(new_forms, changed)
+                request.session.pop(self.grid_session_key, None)
             else:
-                return render(request, self.template_name, {'formset': formset})
+                return self.render_grid(request, rows, formset=formset)
         return redirect(f'{self.app_label}:view_{self.model_name}')
 
+    def save_import(self, new_forms, changed):
+        """
+        create the objects of the new rows and update the changed ones, in bulk
+        """
+        instances = []
+        for form in new_forms:
+            instance = form.save(commit=False)
+            instance.clean()
+            instances.append(instance)
+        self.model.objects.bulk_create(instances, batch_size=self.batch_size)
+        if changed:
+            # bulk_update skips save(), so what clean() derives from the updated fields is worked out here
+            if self.derived_fields:
+                for obj in changed:
+                    obj.clean()
+            self.model.objects.bulk_update(changed, [*self.update_fields, *self.derived_fields], batch_size=self.batch_size)
+
+    @property
+    def grid_session_key(self):
+        return f'import_{self.app_label}_{self.model_name}'
+
+    def render_grid(self, request, rows, formset=None, diff=None, non_form_errors=()):
+        """
+        keep the rows in the session and send them with the shared options as json
+        """
+        columns, options = form_to_grid(self.get_import_form_class()(request=request))
+        request.session[self.grid_session_key] = {
+            'columns': [column['name'] for column in columns],
+            'rows': rows,
+        }
+        grid = {'columns': columns, 'options': options, 'rows': rows, 'errors': {}, 'non_form_errors': list(non_form_errors)}
+        if formset is not None:
+            grid['errors'] = {
+                i: {field: [str(e) for e in errors] for field, errors in form_errors.items()}
+                for i, form_errors in enumerate(formset.errors) if form_errors
+            }
+            grid['non_form_errors'] += [str(e) for e in formset.non_form_errors()]
+        return render(request, self.grid_template_name, {
+            'grid': grid, 'diff': diff, 'cancel_url': self.get_success_url(),
+            'title': 'review the changes' if diff else f'import {self.model._meta.verbose_name_plural}',
+        })
+
+    def get_grid_rows(self, request, stored):
+        """
+        apply the changed cells posted by the grid on top of the rows `stored` in the session.
+        grid_changes looks like {"cells": {"<row>": {"<column>": value}}, "deleted": [<row>], "total": <rows>}
+        """
+        try:
+            changes = json.loads(request.POST['grid_changes'] or '{}')
+            cells = dict(changes.get('cells', {}))
+            deleted = set(changes.get('deleted', []))
+            total = int(changes.get('total', len(stored['rows'])))
+            if total < 0:
+                raise ValueError
+        except (ValueError, TypeError, AttributeError):
+            raise ValidationError("the changes of the grid could not be read, please submit it again")
+        if total > len(stored['rows']) + self.max_new_rows:
+            raise ValidationError(f"at most {self.max_new_rows} rows can be added at once")
+        columns = stored['columns']
+
+        rows = []
+        for i in range(total):
+            if i in deleted:
+                continue
+            row = list(stored['rows'][i]) if i < len(stored['rows']) else [None] * len(columns)
+            row_cells = cells.get(str(i), {})
+            if not isinstance(row_cells, dict):
+                raise ValidationError("the changes of the grid could not be read, please submit it again")
+            for column, value in row_cells.items():
+                if column in columns:
+                    row[columns.index(column)] = value
+            rows.append(row)
+        return rows
+
+    def get_import_form_class(self):
+        form_class = self.form_class or modelform_factory(self.model, fields='__all__')
+        if not self.match_field or not issubclass(form_class, ModelForm):
+            return form_class
+        key_name = self.match_field.split('__')[-1]
+
+        class UpsertForm(form_class):
+            def validate_unique(self):
+                # existing rows get updated, so the match field is allowed to clash
+                exclude = self._get_validation_exclusions()
+                exclude.add(key_name)
+                try:
+                    self.instance.validate_unique(exclude=exclude)
+                except ValidationError as e:
+                    self._update_errors(e)
+        return UpsertForm
+
+    def check_duplicate_keys(self, formset):
+        """
+        a match key can only be on one row, the rows after the first get an error. false when there was any
+        """
+        if not self.match_field:
+            return True
+        key_name = self.match_field.split('__')[-1]
+        seen = {}
+        for i, form in enumerate(formset):
+            key = form.cleaned_data.get(key_name)
+            if key in seen:
+                form.add_error(key_name, f"this is already on row {seen[key] + 1}")
+            else:
+                seen[key] = i
+        return len(seen) == len(formset.forms)
+
+    def get_import_diff(self, formset):
+        """
+        split the rows into the ones to insert and the existing ones that changed.
+        existing rows are matched on match_field in one query and compared in memory.
+        matches outside of the RLS scope are skipped instead of being updated or duplicated
+        """
+        key_name = self.match_field.split('__')[-1]
+        rows = {form.cleaned_data[key_name]: form for form in formset}
+        fields = [self.model._meta.get_field(field) for field in self.update_fields]
+        related = [field.name for field in fields if field.is_relation]
+        if '__' in self.match_field:
+            related.append(self.match_field.rsplit('__', 1)[0])
+
+        existing = {}
+        queryset = self.model.objects.get_queryset(request=None) \
+            .filter(**{f'{self.match_field}__in': rows.keys()}).select_related(*related)
+        for obj in queryset:
+            key = obj
+            for attr in self.match_field.split('__'):
+                key = getattr(key, attr)
+            existing[key] = obj
+        in_scope = set(self.get_queryset().filter(pk__in=[obj.pk for obj in existing.values()]).values_list('pk', flat=True))
+
+        diff = {'insert': 0, 'update': 0, 'unchanged': 0, 'skipped': 0, 'sample': []}
+        new_forms, changed = [], []
+        for key, form in rows.items():
+            obj = existing.get(key)
+            if obj is None:
+                diff['insert'] += 1
+                new_forms.append(form)
+                continue
+            if obj.pk not in in_scope:
+                diff['skipped'] += 1
+                continue
+            changes = []
+            for field in fields:
+                new = form.cleaned_data.get(field.name)
+                new_value = new.pk if field.is_relation and new else new
+                if getattr(obj, field.attname) != new_value:
+                    changes.append((field.verbose_name, getattr(obj, field.name), new))
+                    setattr(obj, field.name, new)
+            if not changes:
+                diff['unchanged'] += 1
+                continue
+            diff['update'] += 1
+            changed.append(obj)
+            if len(diff['sample']) < self.diff_sample_size:
+                diff['sample'].append({'key': key, 'changes': changes})
+        return diff, new_forms, changed
+
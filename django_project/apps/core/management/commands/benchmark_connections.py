@@ -0,0 +1,75 @@
+import re
+import math
+import time
+import http.client
+from importlib import import_module
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from apps.users.models import User
+
+PAGES = ['home', 'users:view_user', 'users:view_student', 'academic:view_class', 'academic:view_schedule']
+ACQUIRE_RE = re.compile(r'db-acquire;dur=([\d.]+);desc="(\w+)"')
+
+def percentile(values, p):
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+class Command(BaseCommand):
+    help = ('Time the home page and the lists of a running server as a logged in user, with the wait for a database '
+            'connection its Server-Timing header reports. run it against servers started with SERVER_TIMING=1, '
+            'one with DB_CONN_MAX_AGE=0 and one without, to see what keeping the connections open saves')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='the server, defaults to http://127.0.0.1:8000')
+        parser.add_argument('--email', default=None, help='the user to log in as, defaults to the first superuser')
+        parser.add_argument('--requests', type=int, default=100, help='requests to every page')
+        parser.add_argument('--pages', nargs='*', default=PAGES, help='url names of the pages')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(email=options['email']) if options['email'] else User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('there is no such user to log in as')
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.login(user)}'
+        url = urlsplit(options['url'])
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        # the home page fills the permissions of the session in
+        self.get(connection, reverse('home'), cookie)
+
+        self.stdout.write(f'{"page":<28} {"p50 ms":>8} {"p90 ms":>8} {"mean ms":>8} {"wait ms":>8} {"new":>5}')
+        for name in options['pages']:
+            path = reverse(name)
+            latencies, waits, opened = [], [], 0
+            for _ in range(options['requests']):
+                latency, status, timing = self.get(connection, path, cookie)
+                if status != 200:
+                    raise CommandError(f'{path} answered {status}')
+                latencies.append(latency * 1000)
+                match = ACQUIRE_RE.search(timing or '')
+                if match:
+                    waits.append(float(match.group(1)))
+                    opened += match.group(2) == 'new'
+            latencies.sort()
+            wait = f'{sum(waits) / len(waits):8.2f}' if waits else f'{"-":>8}'
+            self.stdout.write(f'{name:<28} {percentile(latencies, 50):8.1f} {percentile(latencies, 90):8.1f} '
+                              f'{sum(latencies) / len(latencies):8.1f} {wait} {opened:5}')
+        connection.close()
+
+    def login(self, user):
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.set_expiry(60 * 60)
+        session.create()
+        return session.session_key
+
+    def get(self, connection, path, cookie):
+        start = time.perf_counter()
+        connection.request('GET', path, headers={'Cookie': cookie})
+        response = connection.getresponse()
+        response.read()
+        return time.perf_counter() - start, response.status, response.getheader('Server-Timing')
@@ -0,0 +1,69 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from apps.core.terms import current_term
+from apps.core.partitions import (
+    get_partitions, get_archived_partitions, create_partition, archive_partition, restore_partition, drop_partition,
+)
+
+ACTIONS = {
+    'archive': (archive_partition, 'archived'),
+    'restore': (restore_partition, 'restored'),
+    'drop': (drop_partition, 'dropped'),
+}
+
+class Command(BaseCommand):
+    help = ('Manage the term partitions of the evaluations and activities. '
+            'archiving a term detaches its partition and clearing it drops it, both take milliseconds '
+            'whatever the number of rows. use the "clear all" of the lists to delete a part of a term')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'create', 'archive', 'restore', 'drop'])
+        parser.add_argument('term', nargs='?', default=None, help='defaults to the current term')
+        parser.add_argument('--model', action='append', default=None,
+                            help='app_label.Model, can be repeated. defaults to every partitioned model')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='do not ask before dropping')
+
+    def get_models(self, labels):
+        models = [model for model in apps.get_models() if getattr(model, 'partition_key', None)]
+        if labels:
+            try:
+                selected = [apps.get_model(label) for label in labels]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            if not set(selected) <= set(models):
+                raise CommandError(f'only {", ".join(model._meta.label for model in models)} are partitioned')
+            models = selected
+        return models
+
+    def handle(self, *args, **options):
+        models = self.get_models(options['model'])
+        term = options['term'] or current_term()
+
+        if options['action'] == 'list':
+            for model in models:
+                self.stdout.write(self.style.MIGRATE_HEADING(model._meta.label))
+                for value, (table, rows) in sorted(get_partitions(model).items(), key=lambda item: item[0] or ''):
+                    self.stdout.write(f'  {value or "default":<10} {table:<40} {rows} rows')
+                for value, table in get_archived_partitions(model).items():
+                    self.stdout.write(f'  {value:<10} {table:<40} archived')
+            return
+
+        if options['action'] == 'drop' and options['interactive']:
+            answer = input(f'every {" and ".join(str(model._meta.verbose_name_plural) for model in models)} '
+                           f'of {term} will be deleted for good. type "yes" to go on: ')
+            if answer != 'yes':
+                raise CommandError('nothing was dropped')
+
+        for model in models:
+            try:
+                if options['action'] == 'create':
+                    table, moved = create_partition(model, term)
+                    self.stdout.write(f'{model._meta.label}: {table} created, {moved} rows moved in')
+                else:
+                    action, done = ACTIONS[options['action']]
+                    self.stdout.write(f'{model._meta.label}: {action(model, term)} {done}')
+            except DatabaseError as e:
+                raise CommandError(f'{model._meta.label}: {e}')
+        self.stdout.write(self.style.SUCCESS('Done'))
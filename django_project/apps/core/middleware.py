@@ -1,6 +1,11 @@
 import logging
 from django.shortcuts import redirect
+from django.conf import settings
 from django.contrib import messages
+from .routers import get_replica, read_from, is_sticky, make_sticky
+from .connections import FirstQuery
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
 logger = logging.getLogger(__name__)
 
@@ -23,4 +28,45 @@ class GlobalExceptionHandlingMiddleware:
         )
         
         # Redirect to home or error page
-        return redirect('home')
\ No newline at end of file
+        return redirect('home')
+class ReplicaMiddleware:
+    """
+    Send the reads of the views with read_from_replica to the replica (see apps.core.routers) on safe methods,
+    unless the session wrote something a moment ago. any other method makes the session stick to the primary
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            # the thread goes on to other requests
+            read_from(None)
+        if request.method not in SAFE_METHODS and get_replica():
+            make_sticky(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        replica = get_replica()
+        if replica and request.method in SAFE_METHODS and getattr(view, 'read_from_replica', False) and not is_sticky(request):
+            read_from(replica)
+
+class ConnectionMetricsMiddleware:
+    """
+    Record how the connection of the request was got once it queries (see apps.core.connections).
+    with SERVER_TIMING or DEBUG the wait goes out in the Server-Timing header, for benchmark_connections
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = settings.SERVER_TIMING or settings.DEBUG
+
+    def __call__(self, request):
+        first_query = FirstQuery()
+        with first_query.connection.execute_wrapper(first_query):
+            response = self.get_response(request)
+        if self.server_timing and first_query.acquired:
+            wait, _, opened = first_query.acquired
+            response['Server-Timing'] = f'db-acquire;dur={wait * 1000:.2f};desc="{"new" if opened else "reused"}"'
+        return response
@@ -0,0 +1,82 @@
+from django.db import models, transaction
+from django.contrib.postgres.search import SearchVectorField
+from .forms import template_hash
+
+# versions never change once they're made, so their titles are kept for the life of the process
+_version_titles = {}
+# (template label, pk, content hash): the version of that content
+_current_versions = {}
+
+class ResponseSearchVector(models.Func):
+    """
+    The words of the text and numbers answered in a response, for a generated column so that postgres keeps it
+    up to date on every write. the simple config doesn't stem since the answers can be in any language
+    """
+    function = 'jsonb_to_tsvector'
+    template = """%(function)s('simple', %(expressions)s, '["string", "numeric"]')"""
+    output_field = SearchVectorField()
+
+class TemplateVersion(models.Model):
+    """
+    A snapshot of the questions of a template. responses are stored as the list of their answers
+    in the order of the questions of their version instead of repeating every title in every row
+    """
+    number = models.PositiveIntegerField()
+    definition = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"version {self.number}"
+
+    @property
+    def titles(self):
+        return [question['title'] for question in self.definition]
+
+    def pack(self, response):
+        return [response.get(title) for title in self.titles]
+
+    @classmethod
+    def get_titles(cls, pk):
+        key = (cls._meta.label_lower, pk)
+        if key not in _version_titles:
+            definition = cls.objects.filter(pk=pk).values_list('definition', flat=True).first() or []
+            _version_titles[key] = tuple(question['title'] for question in definition)
+        return _version_titles[key]
+
+    @classmethod
+    def expand(cls, pk, response):
+        """
+        the response as {title: answer}
+        """
+        if not isinstance(response, list):
+            return response
+        return dict(zip(cls.get_titles(pk), response))
+
+class VersionedTemplateMixin(models.Model):
+    """
+    For templates with a `versions` reverse relation to a TemplateVersion,
+    a new version is made whenever the questions in `definition_field` change
+    """
+    definition_field = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.get_version()
+
+    def get_version(self):
+        definition = getattr(self, self.definition_field)
+        key = (self._meta.label_lower, self.pk, template_hash(definition))
+        if key in _current_versions:
+            return _current_versions[key]
+        latest = self.versions.order_by('-number').first()
+        if latest is None or latest.definition != definition:
+            latest = self.versions.create(number=latest.number + 1 if latest else 1, definition=definition)
+        # not before it's committed, a version that got rolled back would stay in there
+        transaction.on_commit(lambda: _current_versions.setdefault(key, latest))
+        return latest
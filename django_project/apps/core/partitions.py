@@ -0,0 +1,231 @@
+import re
+from django.db import connections, transaction
+from django.dispatch import Signal
+
+# sent with the model and the value once the partition of that value is dropped, for whatever is derived from its rows
+partition_dropped = Signal()
+
+CONSTRAINTS_SQL = '''
+    SELECT c.conname, c.contype, pg_get_constraintdef(c.oid),
+           ARRAY(SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY k(attnum, i)
+                 JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum ORDER BY k.i)
+    FROM pg_constraint c
+    WHERE c.conrelid = %s::regclass AND c.contype IN ('p', 'u', 'f', 'c')
+    ORDER BY c.contype DESC
+'''
+# the indexes that don't back a primary key or unique constraint
+INDEXES_SQL = '''
+    SELECT i.relname, pg_get_indexdef(x.indexrelid)
+    FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid = %s::regclass AND NOT EXISTS (
+        SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.contype IN ('p', 'u')
+    )
+'''
+PARTITIONS_SQL = '''
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %s::regclass
+    ORDER BY c.relname
+'''
+ARCHIVED_SQL = '''
+    SELECT c.relname, obj_description(c.oid, 'pg_class')
+    FROM pg_class c
+    WHERE c.relkind = 'r' AND NOT c.relispartition AND c.relnamespace = current_schema()::regnamespace
+      AND c.relname LIKE %s AND obj_description(c.oid, 'pg_class') IS NOT NULL
+    ORDER BY c.relname
+'''
+NAME_RE = re.compile(r'\W')
+INDEX_TABLE_RE = re.compile(r' ON (ONLY )?\S+ USING ')
+BOUND_RE = re.compile(r"^FOR VALUES IN \('(.*)'\)$")
+
+def _literal(value):
+    # DDL takes no parameters
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _columns(cursor, table, qn):
+    # generated columns can't be written to, they are computed again
+    cursor.execute(
+        "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped "
+        "AND attgenerated = '' ORDER BY attnum",
+        [table],
+    )
+    return ', '.join(qn(row[0]) for row in cursor.fetchall())
+
+def partition_name(table, value):
+    if value is None:
+        return f'{table}_default'
+    return f"{table}_{NAME_RE.sub('_', str(value))}"
+
+def _rebuild(schema_editor, table, key, partitioned):
+    """
+    Swap a table for a copy of itself that is (or isn't anymore) partitioned by list of `key`, with the same
+    columns, constraints and indexes. a partitioned primary key has to include the key, every unique constraint
+    must already do so. postgres doesn't do identity columns on partitioned tables, the id is drawn from a sequence
+    """
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    old = f'{table}__old'
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = %s::regclass', [table])
+        referenced_by = [row[0] for row in cursor.fetchall() if row[0] != table]
+        if referenced_by:
+            raise ValueError(f'{table} is referenced by {", ".join(referenced_by)} and can not be rebuilt')
+
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(old)}')
+        cursor.execute(CONSTRAINTS_SQL, [old])
+        constraints = cursor.fetchall()
+        cursor.execute(INDEXES_SQL, [old])
+        indexes = cursor.fetchall()
+        pk = next(columns[0] for _, kind, _, columns in constraints if kind == 'p')
+        # the names go to the new table
+        for name, *_ in indexes:
+            cursor.execute(f'DROP INDEX {qn(name)}')
+        for name, *_ in constraints:
+            cursor.execute(f'ALTER TABLE {qn(old)} DROP CONSTRAINT {qn(name)}')
+        cursor.execute(
+            'SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = %s', [old, pk]
+        )
+        if cursor.fetchone()[0]:
+            cursor.execute(f'ALTER TABLE {qn(old)} ALTER {qn(pk)} DROP IDENTITY')
+        else:
+            cursor.execute(f'ALTER TABLE {qn(old)} ALTER {qn(pk)} DROP DEFAULT')
+
+        cursor.execute(
+            f'CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING GENERATED)'
+            + (f' PARTITION BY LIST ({qn(key)})' if partitioned else '')
+        )
+        for name, kind, definition, columns in constraints:
+            if kind == 'p':
+                columns = [pk, key] if partitioned else [pk]
+                definition = f'PRIMARY KEY ({", ".join(qn(column) for column in columns)})'
+            elif kind == 'u' and partitioned and key not in columns:
+                raise ValueError(f'the unique constraint {name} of {table} has to include {key}')
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+        for name, definition in indexes:
+            cursor.execute(INDEX_TABLE_RE.sub(f' ON {qn(table)} USING ', definition, count=1))
+
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {qn(partition_name(table, None))} PARTITION OF {qn(table)} DEFAULT')
+            cursor.execute(f'SELECT DISTINCT {qn(key)} FROM {qn(old)}')
+            for (value,) in cursor.fetchall():
+                cursor.execute(
+                    f'CREATE TABLE {qn(partition_name(table, value))} PARTITION OF {qn(table)} '
+                    f'FOR VALUES IN ({_literal(value)})'
+                )
+        # deferred foreign key checks would keep the table from being altered below
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        columns = _columns(cursor, old, qn)
+        cursor.execute(f'INSERT INTO {qn(table)} ({columns}) SELECT {columns} FROM {qn(old)}')
+        cursor.execute(f'DROP TABLE {qn(old)} CASCADE')
+
+        if partitioned:
+            sequence = f'{table}_{pk}_seq'
+            cursor.execute(f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.{qn(pk)}')
+            cursor.execute(f'ALTER TABLE {qn(table)} ALTER {qn(pk)} SET DEFAULT nextval(%s::regclass)', [sequence])
+        else:
+            cursor.execute(f'ALTER TABLE {qn(table)} ALTER {qn(pk)} ADD GENERATED BY DEFAULT AS IDENTITY')
+        cursor.execute(
+            f'SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({qn(pk)}), 0) + 1, false) FROM {qn(table)}',
+            [table, pk],
+        )
+
+def partition_table(schema_editor, table, key):
+    """
+    Turn a table into one partitioned by list of `key` with a partition for every value it has
+    and a default one for the values to come. meant for a RunPython of a migration
+    """
+    _rebuild(schema_editor, table, key, partitioned=True)
+
+def unpartition_table(schema_editor, table, key):
+    _rebuild(schema_editor, table, key, partitioned=False)
+
+def get_partitions(model, using='default'):
+    """
+    The partitions attached to the table of a model as {value: (table, rows)}, the default one under None
+    """
+    table = model._meta.db_table
+    qn = connections[using].ops.quote_name
+    partitions = {}
+    with connections[using].cursor() as cursor:
+        cursor.execute(PARTITIONS_SQL, [table])
+        for name, bound in cursor.fetchall():
+            match = BOUND_RE.match(bound)
+            cursor.execute(f'SELECT COUNT(*) FROM {qn(name)}')
+            partitions[match.group(1).replace("''", "'") if match else None] = (name, cursor.fetchone()[0])
+    return partitions
+
+def get_archived_partitions(model, using='default'):
+    """
+    the tables that were detached from the table of a model as {value: table},
+    they carry their value in their comment
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(ARCHIVED_SQL, [model._meta.db_table.replace('_', r'\_') + r'\_%'])
+        return {value: name for name, value in cursor.fetchall()}
+
+def _invalidate(model, using):
+    from cachalot.api import invalidate
+    transaction.on_commit(lambda: invalidate(model._meta.db_table, db_alias=using), using=using)
+
+def create_partition(model, value, using='default'):
+    """
+    Give a value its own partition, the rows the default partition has for it are moved in.
+    the default partition is locked against writes meanwhile, reads go on
+    """
+    table = model._meta.db_table
+    key = model._meta.get_field(model.partition_key).column
+    name, default = partition_name(table, value), partition_name(table, None)
+    qn = connections[using].ops.quote_name
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(default)} IN EXCLUSIVE MODE')
+        cursor.execute(
+            f'CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)'
+        )
+        columns = _columns(cursor, table, qn)
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {qn(default)} WHERE {qn(key)} = %s RETURNING {columns}) '
+            f'INSERT INTO {qn(name)} ({columns}) SELECT {columns} FROM moved',
+            [value],
+        )
+        moved = cursor.rowcount
+        cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES IN ({_literal(value)})')
+    return name, moved
+
+def archive_partition(model, value, using='default'):
+    """
+    Detach the partition of a value, its rows leave the table at once but stay in a table of their own
+    """
+    table = model._meta.db_table
+    name = partition_name(table, value)
+    qn = connections[using].ops.quote_name
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+        cursor.execute(f'COMMENT ON TABLE {qn(name)} IS {_literal(value)}')
+        _invalidate(model, using)
+    return name
+
+def restore_partition(model, value, using='default'):
+    """
+    attach an archived partition back, the default partition must not have any row of its value by then
+    """
+    table = model._meta.db_table
+    name = partition_name(table, value)
+    qn = connections[using].ops.quote_name
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES IN ({_literal(value)})')
+        _invalidate(model, using)
+    return name
+
+def drop_partition(model, value, using='default'):
+    """
+    Drop the partition of a value, attached or archived, with every row in it.
+    nothing is collected and no signal is sent for the rows, only partition_dropped
+    """
+    table = model._meta.db_table
+    name = partition_name(table, value)
+    qn = connections[using].ops.quote_name
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DROP TABLE {qn(name)}')
+        partition_dropped.send(sender=model, value=value, using=using)
+        _invalidate(model, using)
+    return name
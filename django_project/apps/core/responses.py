@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models import Max
+
+def pack_responses(model, template_model, version_model, definition_field, template_field=None, batch_size=1000, using='default'):
+    """
+    Turn the {title: answer} responses of `model` into lists of answers against a version of their template,
+    a batch per transaction so that a failed run picks up where it stopped.
+    without a template_field every row belongs to the (singleton) template.
+    answers to questions that aren't in the template anymore get a version with those questions appended,
+    so nothing is lost. the templates make a version of their current questions the next time it's asked for
+    """
+    templates = {template.pk: getattr(template, definition_field) or [] for template in template_model.objects.using(using)}
+    versions = {}
+
+    def get_version(template_id, extra):
+        if (template_id, extra) not in versions:
+            definition = list(templates.get(template_id, [])) + [
+                {'title': title, 'type': 'text', 'required': False} for title in extra
+            ]
+            number = version_model.objects.using(using).filter(template_id=template_id).aggregate(n=Max('number'))['n']
+            versions[(template_id, extra)] = version_model.objects.using(using).create(
+                template_id=template_id if template_id in templates else None, number=(number or 0) + 1, definition=definition,
+            )
+        return versions[(template_id, extra)]
+
+    default_template = next(iter(templates), None)
+    last = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(model.objects.using(using).filter(pk__gt=last, version__isnull=True).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for obj in batch:
+                template_id = getattr(obj, f'{template_field}_id') if template_field else default_template
+                response = obj.response if isinstance(obj.response, dict) else {'response': obj.response}
+                titles = {question['title'] for question in templates.get(template_id, [])}
+                obj.version = get_version(template_id, tuple(title for title in response if title not in titles))
+                obj.response = [response.get(question['title']) for question in obj.version.definition]
+            model.objects.using(using).bulk_update(batch, ['response', 'version'])
+            last = batch[-1].pk
+
+def unpack_responses(model, batch_size=1000, using='default'):
+    """
+    back to {title: answer}, for going back over the migration
+    """
+    last = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(model.objects.using(using).filter(pk__gt=last, version__isnull=False)
+                         .select_related('version').order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for obj in batch:
+                obj.response = {question['title']: answer for question, answer in zip(obj.version.definition, obj.response)}
+                obj.version = None
+            model.objects.using(using).bulk_update(batch, ['response', 'version'])
+            last = batch[-1].pk
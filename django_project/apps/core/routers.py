@@ -0,0 +1,48 @@
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# the database the reads of the current request go to, set by ReplicaMiddleware for the views that only read
+_read_from = ContextVar('read_from', default=None)
+# the cache and the sessions are written by every request, a replica would hand them back stale
+PRIMARY_ONLY_APPS = {'sessions', 'django_cache'}
+STICKY_SESSION_KEY = 'primary_until'
+
+def get_replica():
+    """
+    the alias of the replica, none when there is no replica configured
+    """
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias in settings.DATABASES else None
+
+def read_from(alias):
+    """
+    send the reads that follow to `alias`, none for the default database
+    """
+    _read_from.set(alias)
+
+def is_sticky(request):
+    # the replica may not have the write of a request yet, the session reads its own writes for a while
+    return request.session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+def make_sticky(request):
+    request.session[STICKY_SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+class ReplicaRouter:
+    """
+    The reads of the requests ReplicaMiddleware marks go to the replica, everything else goes to the default database.
+    the writes always go to the default one, even for the objects that were read from the replica
+    """
+    def db_for_read(self, model, **hints):
+        alias = _read_from.get()
+        if alias and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # they are the same rows on both
+        return True
@@ -0,0 +1,102 @@
+from typing import NamedTuple, Any
+from django.db.models import Q, Case, When
+from django.db.models.functions import Length
+from django.urls import reverse, NoReverseMatch
+
+# a shorter text has no trigram for the index to look up
+MIN_LENGTH = 3
+MAX_WORDS = 5
+
+class Searchable(NamedTuple):
+    """
+    A model the global search looks into, the fields are the ones with a trigram index on their UPPER(),
+    which is what icontains and istartswith compare
+    """
+    model: Any
+    fields: tuple
+    related: tuple = ()
+    exclude: Q = None
+
+def get_searchables():
+    from apps.users.models import User, Student
+    from apps.academic.models import Class, Course, Classroom
+    return [
+        # the students are listed apart, like in the lists
+        Searchable(User, ('first_name', 'last_name', 'email'), exclude=Q(student__isnull=False)),
+        Searchable(Student, ('user__first_name', 'user__last_name', 'user__email'), related=('user',)),
+        Searchable(Class, ('name',)),
+        Searchable(Course, ('name',)),
+        Searchable(Classroom, ('name',)),
+    ]
+
+def search_fields(model):
+    """
+    the fields a text is looked for in when picking an object of `model`, none when it has nothing to search by
+    """
+    for searchable in get_searchables():
+        if searchable.model is model:
+            return searchable.fields
+    if any(field.name == 'name' for field in model._meta.get_fields()):
+        return ('name',)
+    return None
+
+def _any_field(fields, lookup, value):
+    return Q(*[Q(**{f'{field}__{lookup}': value}) for field in fields], _connector=Q.OR)
+
+def search_filter(fields, words):
+    """
+    every word has to be in one of the fields, the trigram indexes answer that without reading the table.
+    a word too short to have a trigram of its own has to start the field, the padding of its start makes one
+    """
+    return Q(*[
+        _any_field(fields, 'icontains' if len(word) >= MIN_LENGTH else 'istartswith', word) for word in words
+    ])
+
+def rank(queryset, fields, text, words):
+    """
+    Best match first: a field that is the whole text, then every word starting one of the fields, then the rest.
+    the shortest wins a tie, it's the closest to what was typed
+    """
+    return queryset.annotate(rank=Case(
+        When(_any_field(fields, 'iexact', text), then=0),
+        When(Q(*[_any_field(fields, 'istartswith', word) for word in words]), then=1),
+        default=2,
+    )).order_by('rank', Length(fields[0]), fields[0])
+
+def _object_url(model, permissions):
+    # to the form when they may change it, to the list otherwise
+    app_label, model_name = model._meta.app_label, model._meta.model_name
+    try:
+        if f'change_{model_name}' in permissions:
+            return lambda obj: reverse(f'{app_label}:change_{model_name}', args=[obj.pk])
+        url = reverse(f'{app_label}:view_{model_name}')
+        return lambda obj: url
+    except NoReverseMatch:
+        return lambda obj: None
+
+def global_search(request, text, limit=5):
+    """
+    The best `limit` matches of every searchable model the user may list, within the RLS scope.
+    grouped the way select2 takes them: [{text: <model>, children: [{id, text, url}]}]
+    """
+    text = ' '.join(text.split())
+    words = text.split()[:MAX_WORDS]
+    if len(text) < MIN_LENGTH:
+        return []
+    permissions = request.session.get('permissions', [])
+    results = []
+    for searchable in get_searchables():
+        model = searchable.model
+        model_name = model._meta.model_name
+        if not any(f'{action}_{model_name}' in permissions for action in ['view', 'change', 'delete']):
+            continue
+        # the RLS filter of some models joins to many rows
+        queryset = model.objects.get_queryset(request=request).filter(search_filter(searchable.fields, words)).distinct()
+        if searchable.exclude is not None:
+            queryset = queryset.exclude(searchable.exclude)
+        objects = rank(queryset.select_related(*searchable.related), searchable.fields, text, words)[:limit]
+        url = _object_url(model, permissions)
+        children = [{'id': f'{model_name}:{obj.pk}', 'text': str(obj), 'url': url(obj)} for obj in objects]
+        if children:
+            results.append({'text': str(model._meta.verbose_name_plural), 'children': children})
+    return results
@@ -0,0 +1,18 @@
+import datetime
+from django.utils import timezone
+
+def current_term(date=None):
+    """
+    The term a date falls in, there are two a year: 2025-1 from january to june and 2025-2 from july to december
+    """
+    date = date or timezone.localdate()
+    return f'{date.year}-{1 if date.month <= 6 else 2}'
+
+def term_range(term):
+    """
+    the first day of a term and the first day after it
+    """
+    year, half = map(int, term.split('-'))
+    start = datetime.date(year, 1 if half == 1 else 7, 1)
+    end = datetime.date(year, 7, 1) if half == 1 else datetime.date(year + 1, 1, 1)
+    return start, end
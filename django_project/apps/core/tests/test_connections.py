@@ -0,0 +1,13 @@
+import time
+from types import SimpleNamespace
+from apps.core.connections import time_connects
+
+def test_time_connects():
+    connection = SimpleNamespace(connect=lambda: time.sleep(0.02))
+    time_connects(connection)
+    time_connects(connection)
+    before = time.monotonic()
+    connection.connect()
+    # only the connect, timed once
+    assert 0.02 <= connection.connect_seconds < 0.04
+    assert before < connection.connected_at <= time.monotonic()
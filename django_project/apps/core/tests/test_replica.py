@@ -0,0 +1,96 @@
+import time
+from unittest import mock
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections
+from django.http import JsonResponse
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.views.generic import View
+from cachalot.api import cachalot_disabled
+from apps.organization.models import Faculty
+from apps.core.generic_views import ReadOnlyViewMixin
+from apps.core.routers import ReplicaRouter, read_from
+
+def answer():
+    return JsonResponse({'faculties': Faculty._base_manager.count(), 'atomic': connections['default'].in_atomic_block})
+
+class ReadView(ReadOnlyViewMixin, View):
+    def get(self, request):
+        return answer()
+
+    def post(self, request):
+        return answer()
+
+    put = post
+
+class WriteView(View):
+    def get(self, request):
+        return answer()
+
+urlpatterns = [path('read/', ReadView.as_view()), path('write/', WriteView.as_view())]
+
+def test_router():
+    router = ReplicaRouter()
+    cache = DatabaseCache('cache_table', {}).cache_model_class
+    read_from('replica')
+    try:
+        assert router.db_for_read(Faculty) == 'replica'
+        # written by every request, they'd come back stale
+        assert router.db_for_read(Session) is None
+        assert router.db_for_read(cache) is None
+        assert router.db_for_write(Faculty) == 'default'
+    finally:
+        read_from(None)
+    assert router.db_for_read(Faculty) is None
+
+@override_settings(ROOT_URLCONF=__name__)
+class ReplicaTest(TransactionTestCase):
+    # the replica mirrors default, its connection only sees what was committed
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        Faculty.objects.create(name='faculty')
+
+    def request(self, method, url):
+        """
+        the response, and whether the faculties were read from the default database and from the replica
+        """
+        table = Faculty._meta.db_table
+        # cachalot would answer the reads of default that are repeated without a query
+        with cachalot_disabled(), CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url)
+        self.assertEqual(response.json()['faculties'], 1)
+        read = lambda queries: any(table in query['sql'] for query in queries)
+        return response.json(), read(default), read(replica)
+
+    def test_safe_requests_of_read_only_views_read_from_the_replica(self):
+        data, default, replica = self.request('get', '/read/')
+        self.assertEqual((default, replica), (False, True))
+        # outside of ATOMIC_REQUESTS
+        self.assertFalse(data['atomic'])
+
+    def test_other_views_read_from_default(self):
+        data, default, replica = self.request('get', '/write/')
+        self.assertEqual((default, replica), (True, False))
+        self.assertTrue(data['atomic'])
+
+    def test_unsafe_requests_go_to_default_in_a_transaction(self):
+        for method in ['post', 'put']:
+            with self.subTest(method=method):
+                data, default, replica = self.request(method, '/read/')
+                self.assertEqual((default, replica), (True, False))
+                self.assertTrue(data['atomic'])
+
+    def test_the_session_sticks_to_default_after_a_write(self):
+        self.request('post', '/read/')
+        _, default, replica = self.request('get', '/read/')
+        self.assertEqual((default, replica), (True, False))
+        # and goes back to the replica once it's over
+        later = time.time() + settings.REPLICA_STICKY_SECONDS + 1
+        with mock.patch('apps.core.routers.time.time', return_value=later):
+            _, default, replica = self.request('get', '/read/')
+        self.assertEqual((default, replica), (False, True))
@@ -0,0 +1,34 @@
+from django.test import RequestFactory
+from django.contrib.auth.models import Permission
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from apps.organization.models import Faculty, Program
+from apps.users.models import User
+
+def make_org():
+    """
+    a faculty, a program of it and a staff user of both to make the requests with
+    """
+    faculty = Faculty.objects.create(name='faculty')
+    program = Program.objects.create(name='program', faculty=faculty)
+    user = User.objects.create(first_name='ad', last_name='min', email='admin@example.com', is_staff=True)
+    user.faculties.add(faculty)
+    user.programs.add(program)
+    return faculty, program, user
+
+def make_session(faculty, program, permissions=None):
+    """
+    the session the home page and the affiliation picker leave, with every permission unless told otherwise
+    """
+    session = SessionStore()
+    session['permissions'] = list(Permission.objects.values_list('codename', flat=True)) if permissions is None else permissions
+    session['selected_faculty'] = faculty.pk
+    session['selected_program'] = program.pk
+    return session
+
+def make_request(method, user, session, data=None, path='/'):
+    request = getattr(RequestFactory(), method)(path, data or {})
+    request.user = user
+    request.session = session
+    request._messages = FallbackStorage(request)
+    return request
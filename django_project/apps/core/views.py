@@ -5,6 +5,7 @@ from django.shortcuts import redirect, render
 from django.urls import reverse, NoReverseMatch
 from django.apps import apps
 from apps.organization.models import Program
+from .search import global_search
 
 def home_view(request):
     user = request.user
@@ -144,4 +145,12 @@ def set_group(request):
     except:
         s['selected_group'] = "None"
         s['permissions'] = []
-    return redirect(request.META.get('HTTP_REFERER', '/'))
\ No newline at end of file
+    return redirect(request.META.get('HTTP_REFERER', '/'))
+
+def search(request):
+    """
+    Typeahead over the people, classes, courses and classrooms the user can see.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Not logged in'}, status=403)
+    return JsonResponse({'results': global_search(request, request.GET.get('q', ''))})
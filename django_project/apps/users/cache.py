@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.db import transaction
+
+GROUP_MASKS_KEY = 'users:group_permission_masks'
+
+def _load_group_masks():
+    from django.contrib.auth.models import Group
+    masks = {}
+    for group_id, permission_id in Group.permissions.through.objects.values_list('group_id', 'permission_id'):
+        masks[group_id] = masks.get(group_id, 0) | 1 << permission_id
+    return masks
+
+def get_group_masks():
+    """
+    The permissions of every group as {group id: bitmask}, bit n being the permission of id n.
+    the groups without any permission aren't in it
+    """
+    return cache.get_or_set(GROUP_MASKS_KEY, _load_group_masks, timeout=None)
+
+def get_permission_mask(group_ids, masks=None):
+    masks = get_group_masks() if masks is None else masks
+    mask = 0
+    for group_id in group_ids:
+        mask |= masks.get(group_id, 0)
+    return mask
+
+def forget_group_masks():
+    # only once it's committed, or a request in between would cache the old permissions again
+    transaction.on_commit(lambda: cache.delete(GROUP_MASKS_KEY))
@@ -1,10 +1,13 @@
 import random
 from django.db import models
 from django.db.models import Q
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser, Group
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from apps.organization.models import Faculty, Program
 from apps.core.managers import RLSManager
 from .managers import UserRLSManager
+from .queryset import StudentQuerySet
 
 class User(AbstractUser):
     first_name = models.CharField("first name", max_length=30)
@@ -52,12 +55,18 @@ class User(AbstractUser):
             ("access_faculty_wide", "Faculty Wide Access"),
             ("access_program_wide", "Program Wide Access"),
         ]
+        # for the global search, see apps.core.search
+        indexes = [
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='users_user_first_name_trgm'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='users_user_last_name_trgm'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='users_user_email_trgm'),
+        ]
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.PROTECT, editable=False)
     _class = models.ForeignKey('academic.Class', on_delete=models.SET_NULL, related_name="students", null=True, blank=True)
     
-    objects = RLSManager(field_with_affiliation='_class')
+    objects = RLSManager.from_queryset(StudentQuerySet)(field_with_affiliation='_class')
     
     class Meta:
         unique_together = ('_class', 'user')
@@ -79,16 +88,7 @@ class Student(models.Model):
         if the user is not in any other group, then delete the user
         else, remove the student group from the user
         """
-        if self.user.groups.count() == 1:
-            # do this to bypass the on_delete protection
-            Student._meta.get_field('user').remote_field.on_delete = models.CASCADE
-            self.user.delete()
-            Student._meta.get_field('user').remote_field.on_delete = models.PROTECT
-        else:
-            student_group, _ = Group.objects.get_or_create(name="STUDENT")
-            self.user.groups.remove(student_group)
-
-        super().delete(*args, **kwargs)
+        return Student.objects.get_queryset(request=None).filter(pk=self.pk).graduate()
     
     def get_user_rls_filter(self, user):
         """
@@ -1,15 +1,79 @@
-from django.db import models
-from django.db.models import Count, Q, F
-from django.contrib.auth.models import Permission
+from collections import Counter
+from django.db import models, connections, transaction
+from django.contrib.auth.models import Group
+from .cache import get_group_masks, get_permission_mask
 
 class GroupQuerySet(models.QuerySet):    
     def for_user(self, user):
         """
         Returns groups where all permissions are a subset of the user's group permissions.
+        it's checked on the cached permission masks, so only the groups of the user are read
         """
-        user_group_perm_ids = set(Permission.objects.filter(group__user=user).values_list('id', flat=True))
-        
-        return self.annotate(
-            total_permissions=Count('permissions'),
-            user_has_permissions=Count('permissions', filter=Q(permissions__id__in=user_group_perm_ids))
-        ).filter(Q(total_permissions=0) | Q(total_permissions=F('user_has_permissions')))
\ No newline at end of file
+        masks = get_group_masks()
+        user_mask = get_permission_mask(user.groups.values_list('pk', flat=True), masks)
+        return self.exclude(pk__in=[group_id for group_id, mask in masks.items() if mask & ~user_mask])
+
+class StudentQuerySet(models.QuerySet):
+    def move_to_generation(self, generation):
+        """
+        Move these students to the class with the same name, faculty and program in another generation
+        with one update, the classes that generation doesn't have yet are created first.
+        returns the ids of the students that got moved
+        """
+        from apps.academic.models import Class, StudentScoreSummary
+        classes = Class.objects.get_queryset(request=None)
+        sources = set(classes.filter(pk__in=self.values('_class')).values_list('faculty_id', 'program_id', 'name'))
+        existing = set(
+            classes.filter(generation=generation, name__in={name for *_, name in sources})
+            .values_list('faculty_id', 'program_id', 'name')
+        )
+        classes.bulk_create([
+            Class(faculty_id=faculty_id, program_id=program_id, name=name, generation=generation)
+            for faculty_id, program_id, name in sources - existing
+        ])
+
+        students, params = self.values('pk').query.sql_with_params()
+        table, class_table = self.model._meta.db_table, Class._meta.db_table
+        sql = f'''
+            UPDATE {table} s SET _class_id = t.id
+            FROM {class_table} c
+            JOIN (
+                -- nothing keeps a generation from having the same class twice, the first one is used
+                SELECT DISTINCT ON (faculty_id, program_id, name) id, faculty_id, program_id, name
+                FROM {class_table} WHERE generation = %s
+                ORDER BY faculty_id, program_id, name, id
+            ) t ON t.name = c.name
+                AND t.faculty_id IS NOT DISTINCT FROM c.faculty_id AND t.program_id IS NOT DISTINCT FROM c.program_id
+            WHERE s._class_id = c.id AND s.id IN ({students})
+            RETURNING s.id
+        '''
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [generation, *params])
+            moved = [row[0] for row in cursor.fetchall()]
+        # the summaries are ranked within the class
+        StudentScoreSummary.objects.refresh(moved)
+        return moved
+
+    def graduate(self, delete_scores=False):
+        """
+        Remove these students with a handful of statements whatever their number: their STUDENT membership
+        goes, then the students, then the users that were in no other group.
+        their scores protect them unless delete_scores. returns what was deleted like delete() does
+        """
+        from .models import User
+        from apps.academic.models import Score
+        student_group, _ = Group.objects.get_or_create(name="STUDENT")
+        with transaction.atomic(using=self.db):
+            user_ids = list(self.values_list('user_id', flat=True))
+            users = User.objects.get_queryset(request=None).filter(pk__in=user_ids)
+            orphans = list(
+                users.filter(groups=student_group).exclude(groups__in=Group.objects.exclude(pk=student_group.pk))
+                .values_list('pk', flat=True)
+            )
+            User.groups.through.objects.filter(user_id__in=user_ids, group=student_group).delete()
+            deleted = Counter()
+            if delete_scores:
+                deleted.update(Score.objects.filter(student__in=self).delete()[1])
+            deleted.update(self.delete()[1])
+            deleted.update(users.filter(pk__in=orphans).delete()[1])
+        return sum(deleted.values()), dict(deleted)
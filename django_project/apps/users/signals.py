@@ -0,0 +1,16 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+from .cache import forget_group_masks
+
+# bulk writes to the through table don't send these signals so they have to forget the masks themselves
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        forget_group_masks()
+
+# its rows in the through table go with it without any signal
+@receiver(post_delete, sender=Permission)
+def permission_deleted(sender, instance, **kwargs):
+    forget_group_masks()
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.db.models import ProtectedError
+from django.test import TestCase
+from apps.core.tests.utils import make_org
+from apps.users.models import User, Student
+from apps.academic.models import Class, Course, Score, StudentScoreSummary
+
+class GenerationTest(TestCase):
+    def setUp(self):
+        self.faculty, self.program, _ = make_org()
+        self.organization = {'faculty': self.faculty, 'program': self.program}
+        self.a1, self.b1 = [Class.objects.create(generation=1, name=name, **self.organization) for name in 'AB']
+        self.a2 = Class.objects.create(generation=2, name='A', **self.organization)
+        self.a3 = Class.objects.create(generation=3, name='A', **self.organization)
+        self.count = 0
+
+    def student(self, _class, *groups):
+        self.count += 1
+        user = User.objects.create(first_name='s', last_name=str(self.count), email=f's{self.count}@example.com')
+        user.groups.add(*groups)
+        return Student.objects.create(user=user, _class=_class)
+
+    def students(self, *pks):
+        return Student.objects.get_queryset(request=None).filter(pk__in=pks)
+
+    def test_move_to_generation(self):
+        a, b, other = self.student(self.a1), self.student(self.b1), self.student(self.a3)
+        course = Course.objects.create(name='math', year='1', **self.organization)
+        Score.objects.create(student=a, course=course, score=8)
+        StudentScoreSummary.objects.refresh([a.pk])
+
+        moved = self.students(a.pk, b.pk).move_to_generation(2)
+        self.assertEqual(sorted(moved), sorted([a.pk, b.pk]))
+        b2 = Class.objects.get(generation=2, name='B')
+        self.assertEqual((b2.faculty, b2.program), (self.faculty, self.program))
+        self.assertEqual(dict(Student.objects.values_list('pk', '_class')), {a.pk: self.a2.pk, b.pk: b2.pk, other.pk: self.a3.pk})
+        # the summary follows the student
+        self.assertEqual(StudentScoreSummary.objects.get(student=a)._class_id, self.a2.pk)
+
+    def test_move_to_the_first_of_duplicated_classes(self):
+        student = self.student(self.b1)
+        # a class twice in a generation takes dropping the unique key, the test transaction puts it back
+        with connection.cursor() as cursor:
+            constraint, = [name for name, c in connection.introspection.get_constraints(cursor, Class._meta.db_table).items()
+                           if c['unique'] and not c['primary_key']]
+            # the foreign keys of setUp are still deferred, they'd keep the table from being altered
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(f'ALTER TABLE {Class._meta.db_table} DROP CONSTRAINT {connection.ops.quote_name(constraint)}')
+        first, second = [Class.objects.create(generation=2, name='B', **self.organization) for _ in range(2)]
+        self.assertEqual(self.students(student.pk).move_to_generation(2), [student.pk])
+        student.refresh_from_db()
+        self.assertEqual(student._class_id, min(first.pk, second.pk))
+        self.assertEqual(Class.objects.filter(generation=2, name='B').count(), 2)
+
+    def test_graduate(self):
+        staff = Group.objects.create(name='STAFF')
+        alone, staffed, other = self.student(self.a1), self.student(self.a1, staff), self.student(self.a2)
+        total, deleted = self.students(alone.pk, staffed.pk).graduate()
+        self.assertEqual(deleted[Student._meta.label], 2)
+        self.assertEqual(deleted[User._meta.label], 1)
+        self.assertEqual(total, sum(deleted.values()))
+        self.assertFalse(User.objects.filter(pk=alone.user_id).exists())
+        # the user in another group stays, without the STUDENT one
+        self.assertEqual(list(User.objects.get(pk=staffed.user_id).groups.values_list('name', flat=True)), ['STAFF'])
+        self.assertEqual(list(Student.objects.values_list('pk', flat=True)), [other.pk])
+
+    def test_scores_protect_the_students(self):
+        student = self.student(self.a1)
+        course = Course.objects.create(name='math', year='1', **self.organization)
+        Score.objects.create(student=student, course=course, score=8)
+        with self.assertRaises(ProtectedError):
+            self.students(student.pk).graduate()
+        self.assertTrue(Student.objects.filter(pk=student.pk).exists())
+
+        total, deleted = self.students(student.pk).graduate(delete_scores=True)
+        self.assertEqual((deleted[Score._meta.label], deleted[Student._meta.label], deleted[User._meta.label]), (1, 1, 1))
+
+    def test_student_delete(self):
+        student = self.student(self.a1)
+        self.assertEqual(student.delete()[1][Student._meta.label], 1)
+        self.assertFalse(User.objects.filter(pk=student.user_id).exists())
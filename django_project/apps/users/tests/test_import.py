@@ -0,0 +1,87 @@
+import json
+from django.test import TestCase
+from apps.core.tests.utils import make_org, make_session, make_request
+from apps.users.models import User
+from apps.users.views import UserImportView
+
+def grid(response):
+    return json.loads(response.content.decode().split('id="grid-data" type="application/json">')[1].split('</script>')[0])
+
+class UserImportTest(TestCase):
+    def setUp(self):
+        self.faculty, self.program, self.admin = make_org()
+        self.session = make_session(self.faculty, self.program)
+        self.existing = User.objects.create(first_name='old', last_name='name', email='old@example.com')
+        self.existing.faculties.add(self.faculty)
+        self.existing.programs.add(self.program)
+
+    def post(self, data):
+        return UserImportView.as_view()(make_request('post', self.admin, self.session, data))
+
+    def start(self, first_names, last_names, emails):
+        # the default values, one line per row
+        response = self.post({'first_name': '\n'.join(first_names), 'last_name': '\n'.join(last_names),
+                              'email': '\n'.join(emails), 'faculties': [self.faculty.pk], 'programs': [self.program.pk]})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def submit(self, changes=None, confirm=False):
+        data = {'grid_changes': json.dumps(changes or {})}
+        if confirm:
+            data['confirm_import'] = '1'
+        return self.post(data)
+
+    def test_dry_run_then_confirm(self):
+        self.start(['new', 'fresh'], ['name', 'face'], ['old@example.com', 'fresh@example.com'])
+        response = self.submit()
+        self.assertContains(response, '1 to insert, 1 to update, 0 unchanged')
+        self.assertFalse(User.objects.filter(email='fresh@example.com').exists())
+
+        response = self.submit(confirm=True)
+        self.assertEqual(response.status_code, 302)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.first_name, self.existing.last_name), ('new', 'name'))
+        # bulk_update skips save(), the username has to follow the names anyway
+        self.assertEqual(self.existing.username, 'newname')
+        self.assertTrue(User.objects.filter(email='fresh@example.com', username='freshface').exists())
+
+    def test_unchanged_rows_are_not_updated(self):
+        self.start(['old'], ['name'], ['old@example.com'])
+        self.assertContains(self.submit(), '0 to insert, 0 to update, 1 unchanged')
+
+    def test_duplicate_keys_are_row_errors(self):
+        self.start(['a', 'b', 'c'], ['x', 'y', 'z'], ['a@example.com', 'b@example.com', 'a@example.com'])
+        response = self.submit(confirm=True)
+        self.assertEqual(grid(response)['errors'], {'2': {'email': ['this is already on row 1']}})
+        self.assertFalse(User.objects.filter(email__in=['a@example.com', 'b@example.com']).exists())
+
+    def test_total_is_checked(self):
+        self.start(['a'], ['x'], ['a@example.com'])
+        for total in ['many', -1, 10 ** 9]:
+            with self.subTest(total=total):
+                response = self.submit({'total': total}, confirm=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(grid(response)['non_form_errors'])
+                self.assertEqual(len(grid(response)['rows']), 1)
+        self.assertFalse(User.objects.filter(email='a@example.com').exists())
+
+    def test_added_and_deleted_rows(self):
+        self.start(['a', 'b'], ['x', 'y'], ['a@example.com', 'b@example.com'])
+        columns = self.session['import_users_user']['columns']
+        added = {'first_name': 'c', 'last_name': 'z', 'email': 'c@example.com',
+                 'faculties': [str(self.faculty.pk)], 'programs': [str(self.program.pk)]}
+        response = self.submit({'cells': {'2': {c: v for c, v in added.items() if c in columns}}, 'deleted': [0], 'total': 3})
+        self.assertContains(response, '2 to insert, 0 to update')
+        self.assertEqual(self.submit(confirm=True).status_code, 302)
+        self.assertEqual(set(User.objects.filter(email__in=['a@example.com', 'b@example.com', 'c@example.com'])
+                             .values_list('email', flat=True)), {'b@example.com', 'c@example.com'})
+
+    def test_rows_edited_on_the_review_are_diffed_again(self):
+        self.start(['a'], ['x'], ['a@example.com'])
+        self.submit()
+        response = self.submit({'cells': {'0': {'last_name': 'edited'}}}, confirm=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1 to insert')
+        self.assertFalse(User.objects.filter(email='a@example.com').exists())
+        self.assertEqual(self.submit(confirm=True).status_code, 302)
+        self.assertEqual(User.objects.get(email='a@example.com').last_name, 'edited')
@@ -16,4 +16,5 @@ urlpatterns = [
     path('students/create/', views.StudentCreateView.as_view(), name='add_student'),
     path('students/change/<int:pk>/', views.StudentUpdateView.as_view(), name='change_student'),
     path('students/delete/<int:pk>/', views.StudentDeleteView.as_view(), name='delete_student'),
+    path('students/move/', views.StudentMoveView.as_view(), name='move_student'),
 ]
@@ -1,4 +1,5 @@
-from apps.core.generic_views import BaseListView, BaseCreateView, BaseUpdateView, BaseDeleteView, BaseImportView
+from apps.core.generic_views import BaseListView, BaseCreateView, BaseUpdateView, BaseDeleteView, BaseImportView, BaseSelectedUpdateView
+from apps.academic.models import StudentScoreSummary
 from .models import Student, User
 from .forms import UserForm, StudentForm
 
@@ -16,6 +17,10 @@ class UserImportView(BaseImportView):
     model = User
     form_class = UserForm
     flat_fields = ['first_name', 'last_name', 'email']
+    match_field = 'email'
+    update_fields = ['first_name', 'last_name']
+    # the username is made of the names
+    derived_fields = ['username']
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -47,12 +52,31 @@ class StudentListView(BaseListView):
     ]
     actions = [('+', 'users:add_student', None),
                ('import', 'users:import_student', 'add_student')]
+    selection_actions = [('move', 'users:move_student', 'change_student')]
+
+class StudentMoveView(BaseSelectedUpdateView):
+    """
+    Move the selected students to another class (or out of any with none)
+    """
+    model = Student
+    fields = ['_class']
+    verb = 'move'
+    done = 'moved'
+
+    def perform(self, selected, form):
+        students = list(selected.values_list('pk', flat=True))
+        moved = super().perform(Student.objects.get_queryset(request=None).filter(pk__in=students), form)
+        # the summaries are ranked within the class
+        StudentScoreSummary.objects.refresh(students)
+        return moved
 
 class StudentImportView(BaseImportView):
     model = Student
     form_class = StudentForm
     flat_fields = ['first_name', 'last_name', 'email']
-    
+    match_field = 'user__email'
+    update_fields = ['_class']
+
 class StudentCreateView(BaseCreateView):
     model = Student
     form_class = StudentForm
@@ -1,3 +1,4 @@
+import multiprocessing
 from pathlib import Path
 from decouple import config
 
@@ -14,6 +15,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # 3rd party
     'allauth',
     'allauth.account',
@@ -34,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first to time from the start of the request, it doesn't touch the database itself
+    'apps.core.middleware.ConnectionMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +49,7 @@ MIDDLEWARE = [
     "allauth.account.middleware.AccountMiddleware",
     'auditlog.middleware.AuditlogMiddleware',
     # mine
+    'apps.core.middleware.ReplicaMiddleware',
     'apps.core.middleware.GlobalExceptionHandlingMiddleware',
 ]
 
@@ -81,8 +86,40 @@ DATABASES = {
         'HOST': config('DB_HOST'),
         'PORT': '5432',
         'ATOMIC_REQUESTS': True,
+        # kept open between the requests of a worker and checked before it's used again, 0 closes it after every request
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+# gunicorn's (see gunicorn.conf.py), every thread keeps a connection to each database, see core.W001
+WEB_WORKERS = config('WEB_CONCURRENCY', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+WEB_THREADS = config('WEB_THREADS', default=1, cast=int)
+# for the commands and the cron jobs
+SPARE_CONNECTIONS = config('DB_SPARE_CONNECTIONS', default=10, cast=int)
+CONNECTION_STATS_INTERVAL = config('CONNECTION_STATS_INTERVAL', default=1000, cast=int)
+# sends the connection wait of every request in a Server-Timing header, for benchmark_connections. always on with DEBUG
+SERVER_TIMING = config('SERVER_TIMING', default=False, cast=bool)
+# the connection stats are logged at info, the rest of the logs keep django's defaults
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'apps.core.connections': {'handlers': ['console'], 'level': 'INFO'}},
+}
+
+# the views that only read (see apps.core.generic_views.ReadOnlyViewMixin) read from this replica when there is one,
+# a session reads from the primary for REPLICA_STICKY_SECONDS after any request that may have written
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default='5432'),
+        'ATOMIC_REQUESTS': False,
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASE = 'replica'
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+DATABASE_ROUTERS = ['apps.core.routers.ReplicaRouter']
 
 # cache
 # we inject using .env to prevent migration conflict
@@ -146,6 +183,13 @@ ACCOUNT_LOGIN_METHODS = ["email", "username"]
 # crispy form
 CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
+# cachalot
+# what is read from the replica can't be cached, the invalidations follow the writes to the primary
+# and the replica may not have them yet
+CACHALOT_DATABASES = {'default'}
+# every submission at the end of the term would otherwise pay for an invalidation write to the cache
+CACHALOT_UNCACHABLE_TABLES = frozenset(('django_migrations', 'academic_evaluation', 'academic_evaluationstat'))
+
 # audit log
 AUDITLOG_INCLUDE_ALL_MODELS = True
 AUDITLOG_EXCLUDE_TRACKING_MODELS = (
@@ -154,7 +198,11 @@ AUDITLOG_EXCLUDE_TRACKING_MODELS = (
     "organization",
     "academic.evaluationtemplate",
     "academic.evaluation",
+    "academic.evaluationstat",
+    "academic.evaluationtemplateversion",
     "academic.course",
+    "academic.studentscoresummary",
+    "academic.timeslot",
 )
 
 # cron jobs
@@ -0,0 +1,12 @@
+from .base import *
+
+# the tests run on a test_ copy of the database of the environment, see conftest.py
+DEBUG = False
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# the replica is the primary in the tests, the reads the router sends to it still go through a connection of its own
+DATABASES['replica'] = {**DATABASES['default'], 'ATOMIC_REQUESTS': False, 'TEST': {'MIRROR': 'default'}}
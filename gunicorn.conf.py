@@ -0,0 +1,7 @@
+import multiprocessing
+from decouple import config
+
+bind = '0.0.0.0:8000'
+# settings.WEB_WORKERS and WEB_THREADS read the same variables, every thread keeps its database connections open
+workers = config('WEB_CONCURRENCY', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+threads = config('WEB_THREADS', default=1, cast=int)